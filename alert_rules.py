@@ -0,0 +1,114 @@
+"""The S/R-test and MA-crossover alert rules of m1ain.py as pure functions.
+
+``auto_loop`` calls the scalar forms on its ring window every cycle; the
+array forms evaluate the same rules at every bar of a long series at once
+for ``replay``:
+
+* supports/resistances = the previous bar's pivots (``pivot_levels``) plus
+  the swing levels of the last ``lookback`` bars (``swings.swing_levels``);
+* a level is tested when ``pct_diff(price, level) <= tol`` (NEAR_TOL);
+* a golden/death cross is the MA fast/slow crossing on the last bar, and it
+  is reported only when it differs from the last cross reported.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from swings import swing_indices
+
+
+# ===== LIVE (one window) =====
+def pivot_levels(h, l, c):
+    H1, L1, C1 = h[-2], l[-2], c[-2]
+    pp = (H1 + L1 + C1)/3
+    r1 = 2*pp - L1
+    s1 = 2*pp - H1
+    r2 = pp + (H1 - L1)
+    s2 = pp - (H1 - L1)
+    return [s1, s2], [r1, r2]
+
+
+def sr_levels(h, l, c, swing_highs, swing_lows):
+    """(supports, resistances), ascending: pivots of the previous bar + swing levels."""
+    sup_piv, res_piv = pivot_levels(h, l, c)
+    return sorted(set(sup_piv + list(swing_lows))), sorted(set(res_piv + list(swing_highs)))
+
+
+def cross_event(prev_fast, prev_slow, fast, slow, last_state):
+    """("golden" | "death" | None, new last_state) for the last two MA values."""
+    if prev_fast <= prev_slow and fast > slow and last_state != "bull":
+        return "golden", "bull"
+    if prev_fast >= prev_slow and fast < slow and last_state != "bear":
+        return "death", "bear"
+    return None, last_state
+
+
+# ===== SERIES (every bar) =====
+def sma(x, n):
+    """Simple moving average, NaN for the first n-1 bars."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if 0 < n <= len(x):
+        out[n - 1:] = sliding_window_view(x, n).mean(axis=1)
+    return out
+
+
+def cross_events(fast, slow, min_bar=0, last_state=None):
+    """Bars where ``cross_event`` reports, and the kinds ("golden"/"death").
+
+    ``min_bar``: first bar the live loop would check (it waits for three
+    slow MA values).
+    """
+    pf, ps, f, s = fast[:-1], slow[:-1], fast[1:], slow[1:]
+    up = np.r_[False, (pf <= ps) & (f > s)]
+    dn = np.r_[False, (pf >= ps) & (f < s)]
+    up[:min_bar] = dn[:min_bar] = False
+    bars = np.flatnonzero(up | dn)
+    code = up[bars].astype(np.int8)  # 1 = golden (bull), 0 = death (bear)
+    # a cross is dropped when the last one reported went the same way
+    prev = np.r_[np.int8({"bull": 1, "bear": 0}.get(last_state, -1)), code[:-1]]
+    bars, code = bars[code != prev], code[code != prev]
+    return bars, np.where(code == 1, "golden", "death")
+
+
+def pivot_series(h, l, c):
+    """Pivot supports/resistances in force at every bar (from the bar before): (S, 2) arrays."""
+    H1, L1, C1 = (np.r_[np.nan, np.asarray(x, dtype=np.float64)[:-1]] for x in (h, l, c))
+    pp = (H1 + L1 + C1)/3
+    return np.column_stack([2*pp - H1, pp - (H1 - L1)]), np.column_stack([2*pp - L1, pp + (H1 - L1)])
+
+
+def _near(price, level, tol):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (level != 0) & (np.abs(price - level) / level <= tol) | (level == 0)
+
+
+def level_hits(h, l, c, tol, lookback=300, window=5):
+    """Every (bar, level) the S/R rules would test, per side.
+
+    Returns {"SUP": (bars, levels), "RES": (bars, levels)}, sorted by bar then
+    level, with the exact duplicates ``sr_levels`` removes already removed.
+    A swing at bar i is in the window of bars i+window ... i+lookback-1-window.
+    """
+    h, l, c = (np.asarray(x, dtype=np.float64) for x in (h, l, c))
+    span = lookback - 2 * window
+    padded = np.r_[c, np.full(span, np.nan)]
+    windows = sliding_window_view(padded, span)
+    hi_idx, lo_idx = swing_indices(h, l, window)
+    piv_sup, piv_res = pivot_series(h, l, c)
+    out = {}
+    for side, idx, src, piv in (("SUP", lo_idx, l, piv_sup), ("RES", hi_idx, h, piv_res)):
+        levels = src[idx]
+        near = _near(windows[idx + window], levels[:, None], tol)
+        point, offset = np.nonzero(near)
+        bars = [idx[point] + window + offset]
+        vals = [levels[point]]
+        for k in range(piv.shape[1]):
+            ok = np.flatnonzero(_near(c, piv[:, k], tol) & ~np.isnan(piv[:, k]))
+            bars.append(ok)
+            vals.append(piv[ok, k])
+        bars, vals = np.concatenate(bars), np.concatenate(vals)
+        order = np.lexsort((vals, bars))
+        bars, vals = bars[order], vals[order]
+        uniq = np.r_[True, (bars[1:] != bars[:-1]) | (vals[1:] != vals[:-1])]
+        out[side] = (bars[uniq], vals[uniq])
+    return out
@@ -0,0 +1,142 @@
+"""Bounded alert de-duplication for S/R level alerts.
+
+A level alert fires once, then stays quiet until price has moved away from
+the level by more than ``rearm_tol`` (hysteresis) or ``ttl`` seconds have
+passed. A level within ``tol`` of one that already fired counts as the same
+level, so pivots that drift a little every bar do not alert again. Fired
+levels are kept per symbol and kind in a sorted list, so re-arming, the
+near-level lookup and eviction are binary searches instead of scans over
+every level ever touched. Total entries are capped at
+``max_entries`` (oldest first).
+"""
+import time
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+
+
+def pct_diff(a, b):
+    return abs(a - b) / b if b != 0 else 0
+
+
+def _window(price, tol):
+    # pct_diff(price, b) <= tol  <=>  price/(1+tol) <= b <= price/(1-tol)  (b > 0);
+    # widened a hair so the exact pct_diff check below decides the edges
+    lo = price / (1 + tol)
+    hi = price / (1 - tol) if tol < 1 else float("inf")
+    return lo * (1 - 1e-12), hi * (1 + 1e-12)
+
+
+def near_levels(sorted_levels, price, tol):
+    """Levels with pct_diff(price, level) <= tol from an ascending list."""
+    lo, hi = _window(price, tol)
+    i, j = bisect_left(sorted_levels, lo), bisect_right(sorted_levels, hi)
+    return [b for b in sorted_levels[i:j] if pct_diff(price, b) <= tol]
+
+
+def level_key(level):
+    """Levels recomputed each bar wobble in the last digits; 6 significant
+    digits decide whether two of them are the same level."""
+    return float(f"{level:.6g}")
+
+
+class AlertState:
+    def __init__(self, ttl=24 * 3600, rearm_tol=0.006, max_entries=10000, key=level_key):
+        self.ttl = ttl
+        self.rearm_tol = rearm_tol
+        self.max_entries = max_entries
+        self.key = key
+        self._fired = {}              # symbol -> {kind: sorted [level_key]}
+        self._when = OrderedDict()    # (symbol, kind, level_key) -> fired_at, oldest first
+        self._lock = threading.Lock()
+        self.fires = 0
+        self.suppressed = 0
+        self.rearmed = 0
+        self.expired = 0
+
+    def _drop(self, symbol, kind, k):
+        kinds = self._fired.get(symbol, {})
+        keys = kinds.get(kind)
+        if keys:
+            i = bisect_left(keys, k)
+            if i < len(keys) and keys[i] == k:
+                del keys[i]
+        self._prune(symbol, kind)
+
+    def _prune(self, symbol, kind):
+        kinds = self._fired.get(symbol)
+        if kinds is not None and not kinds.get(kind, True):
+            del kinds[kind]
+        if kinds is not None and not kinds:
+            del self._fired[symbol]
+
+    def _expire(self, now):
+        while self._when:
+            (symbol, kind, k), fired_at = next(iter(self._when.items()))
+            if now - fired_at <= self.ttl and len(self._when) <= self.max_entries:
+                break
+            self._when.popitem(last=False)
+            self._drop(symbol, kind, k)
+            self.expired += 1
+
+    def _rearm(self, symbol, price):
+        # everything fired outside the hysteresis window around price re-arms
+        lo, hi = _window(price, self.rearm_tol)
+        for kind, keys in list(self._fired.get(symbol, {}).items()):
+            i, j = bisect_left(keys, lo), bisect_right(keys, hi)
+            if i == 0 and j == len(keys):
+                continue
+            for k in keys[:i] + keys[j:]:
+                self._when.pop((symbol, kind, k), None)
+                self.rearmed += 1
+            keys[:] = keys[i:j]
+            self._prune(symbol, kind)
+
+    def observe(self, symbol, price, now=None):
+        """Feed a price without checking levels (re-arms and expires only)."""
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            self._rearm(symbol, price)
+
+    def check(self, symbol, kind, levels, price, tol, now=None):
+        """Levels (ascending) within ``tol`` of ``price`` that should alert now.
+
+        Returned levels are marked fired; call once per price update.
+        """
+        now = time.time() if now is None else now
+        out = []
+        with self._lock:
+            self._expire(now)
+            self._rearm(symbol, price)
+            fired = self._fired.setdefault(symbol, {}).setdefault(kind, [])
+            for level in near_levels(levels, price, tol):
+                k = self.key(level)
+                lo, hi = _window(k, tol)
+                if bisect_right(fired, hi) > bisect_left(fired, lo):  # same level, already told
+                    self.suppressed += 1
+                    continue
+                insort(fired, k)
+                self._when[(symbol, kind, k)] = now
+                self.fires += 1
+                out.append(level)
+            self._prune(symbol, kind)
+            self._expire(now)  # enforce max_entries after inserting
+        return out
+
+    def reset(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._fired.clear()
+                self._when.clear()
+                return
+            self._fired.pop(symbol, None)
+            for key in [k for k in self._when if k[0] == symbol]:
+                del self._when[key]
+
+    def __len__(self):
+        return len(self._when)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._when), "symbols": len(self._fired), "fires": self.fires,
+                    "suppressed": self.suppressed, "rearmed": self.rearmed, "expired": self.expired}
@@ -0,0 +1,86 @@
+"""Alert state: near-level lookup vs the old linear scan + growth over a long run.
+
+    python bench/bench_alert_state.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alert_state import AlertState, near_levels, pct_diff  # noqa: E402
+
+TOL = 0.003
+
+
+def check_linear(last_alerts, symbol, kind, levels, price):
+    # old m1ain rule: linear scan over every level, an ever-growing set of ids
+    out = []
+    for v in levels:
+        if pct_diff(price, v) <= TOL:
+            aid = f"{symbol}-{kind}-{v:.2f}"
+            if aid not in last_alerts:
+                last_alerts.add(aid)
+                out.append(v)
+    return out
+
+
+def random_walk(rng, n, start=100.0):
+    p, out = start, []
+    for _ in range(n):
+        p *= 1 + rng.gauss(0, 0.002)
+        out.append(p)
+    return out
+
+
+def main():
+    rng = random.Random(0)
+
+    # near_levels must pick exactly what the linear pct_diff scan picks
+    for _ in range(20000):
+        levels = sorted(rng.uniform(1, 200) for _ in range(rng.randint(0, 60)))
+        price, tol = rng.uniform(1, 200), rng.choice((0.001, TOL, 0.01, 0.2))
+        assert near_levels(levels, price, tol) == [v for v in levels if pct_diff(price, v) <= tol]
+    print("near_levels == linear scan: ok")
+
+    for n_levels in (10, 1000, 10000):
+        levels = sorted(rng.uniform(50, 150) for _ in range(n_levels))
+        prices = random_walk(rng, 2000)
+        t0 = time.perf_counter()
+        for p in prices:
+            [v for v in levels if pct_diff(p, v) <= TOL]
+        t_lin = (time.perf_counter() - t0) / len(prices) * 1e6
+        t0 = time.perf_counter()
+        for p in prices:
+            near_levels(levels, p, TOL)
+        t_bis = (time.perf_counter() - t0) / len(prices) * 1e6
+        print(f"levels {n_levels:6d}: linear {t_lin:9.2f} us  bisect {t_bis:6.2f} us  ({t_lin / t_bis:.1f}x)")
+
+    # long run: 300 symbols, one level drifting every bar (like pivots), ~1 week of 5m bars
+    symbols = [f"SYM{i}USDT" for i in range(300)]
+    bars = []
+    walks = {s: random_walk(rng, 2000) for s in symbols}
+    for bar in range(2000):
+        row = []
+        for s in symbols:
+            p = walks[s][bar]
+            row.append((s, sorted((p * (1 - 0.002 + rng.uniform(-5e-4, 5e-4)), p * 0.98, p * 1.02)), p))
+        bars.append(row)
+    for name in ("set (old)", "AlertState"):
+        last_alerts, state = set(), AlertState(ttl=24 * 3600, rearm_tol=2 * TOL)
+        fired = 0
+        t0 = time.perf_counter()
+        for bar, row in enumerate(bars):
+            now = bar * 300
+            for s, levels, p in row:
+                if name == "AlertState":
+                    fired += len(state.check(s, "SUP", levels, p, TOL, now=now))
+                else:
+                    fired += len(check_linear(last_alerts, s, "SUP", levels, p))
+        elapsed = (time.perf_counter() - t0) / (len(bars) * len(symbols)) * 1e6
+        entries = len(last_alerts) if name == "set (old)" else len(state)
+        print(f"{name:11s}: {fired:7d} alerts  {entries:7d} entries kept  {elapsed:5.2f} us/check")
+
+
+if __name__ == "__main__":
+    main()
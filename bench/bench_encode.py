@@ -0,0 +1,78 @@
+"""Chart encodings (bytes, encode time) + upload volume of a broadcast.
+
+    python bench/bench_encode.py [chats]
+
+Part 1 rasterizes each chart once and encodes the same pixels in every
+CHART_FORMAT. Part 2 sends one chart to ``chats`` chats through the outbox
+(offline Telegram) with and without file_id reuse.
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+import charts  # noqa: E402
+import telegram_outbox  # noqa: E402
+from offline import install, load_fixture  # noqa: E402
+from kline_parse import parse_klines, klines_frame  # noqa: E402
+from indicators import sma, rsi_wilder, macd  # noqa: E402
+
+FORMATS = ("png", "png8", "jpeg", "webp")
+
+
+def pixels(kind, df, **options):
+    fmt = charts.CHART_FORMAT
+    charts.CHART_FORMAT = "png"
+    try:
+        png = charts.render(kind, df, **options)
+    finally:
+        charts.CHART_FORMAT = fmt
+    return Image.open(io.BytesIO(png)).convert("RGB")
+
+
+def main():
+    chats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    df = klines_frame(parse_klines(load_fixture("klines_BTCUSDT_4h.json"))).tail(300)
+    close = df["close"]
+    m, s, h = macd(close, 12, 26, 9)
+    ind = {"ma_fast": sma(close, 50).to_numpy(), "ma_slow": sma(close, 200).to_numpy(),
+           "rsi": rsi_wilder(close, 14).to_numpy(), "macd": m.to_numpy(),
+           "macd_signal": s.to_numpy(), "macd_hist": h.to_numpy()}
+
+    for kind, d, options in (("ma", df.tail(200), {"title": "BTCUSDT 1h"}),
+                             ("sr_fib", df, {"title": "BTCUSDT 4H", "indicators": ind})):
+        img = pixels(kind, d, **options)
+        print(f"{kind} {img.size[0]}x{img.size[1]}")
+        for fmt in FORMATS:
+            times = []
+            for _ in range(3):
+                t0 = time.perf_counter()
+                out = charts.encode(img, fmt)
+                times.append(time.perf_counter() - t0)
+            print(f"  {fmt:5s} {len(out):8d} B  {np.median(times) * 1e3:6.1f} ms")
+
+    adapter = install()
+    telegram_outbox.CHAT_RATE = 1000
+    png = charts.render("sr_fib", df, title="BTCUSDT 4H", indicators=ind)
+    for name, file_ids in (("upload every send", 0), ("file_id reuse", telegram_outbox.FILE_IDS)):
+        telegram_outbox.FILE_IDS = file_ids
+        outbox = telegram_outbox.Outbox("https://api.telegram.org/botx", global_rate=1000)
+        adapter.calls.clear()
+        t0 = time.perf_counter()
+        for chat in range(chats):
+            outbox.send_photo(chat, png, caption="broadcast")
+        outbox.flush()
+        elapsed = time.perf_counter() - t0
+        st = outbox.stats()
+        print(f"{name:17s}: {chats} chats  {st['uploads']:3d} uploads  "
+              f"{sum(c['bytes'] for c in adapter.calls) / 1024:8.1f} KiB sent  {elapsed * 1e3:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Kline parsing: equivalence check + time / peak allocation vs the old DataFrame path.
+
+    python bench/bench_kline_parse.py
+"""
+import os
+import sys
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kline_parse import parse_klines, klines_frame  # noqa: E402
+
+
+# old path (main.py / m1ain.py _fetch_klines after r.json())
+def frame_old(body):
+    data = json.loads(body)
+    df = pd.DataFrame(data, columns=[
+        "open_time","open","high","low","close","volume",
+        "close_time","qav","trades","tbbav","tbqav","ignore"
+    ])
+    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
+    df.set_index("open_time", inplace=True)
+    for col in ["open","high","low","close","volume"]:
+        df[col] = df[col].astype(float)
+    return df[["open","high","low","close","volume"]]
+
+
+def frame_new(body):
+    return klines_frame(parse_klines(body))
+
+
+def arrays_new(body):
+    return parse_klines(body)
+
+
+def arrays_f32(body):
+    return parse_klines(body, dtype=np.float32)
+
+
+def payload(n, seed=0):
+    """Body shaped like /api/v3/klines (prices as strings, counts as ints)."""
+    rng = np.random.default_rng(seed)
+    c = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    t0 = 1_700_000_000_000
+    rows = []
+    for i in range(n):
+        o, cl = c[i - 1] if i else c[0], c[i]
+        hi, lo = max(o, cl) + abs(rng.normal(0, .2)), min(o, cl) - abs(rng.normal(0, .2))
+        rows.append([t0 + i * 300_000, f"{o:.8f}", f"{hi:.8f}", f"{lo:.8f}", f"{cl:.8f}",
+                     f"{abs(rng.normal(1000, 300)):.8f}", t0 + i * 300_000 + 299_999,
+                     f"{rng.random() * 1e6:.8f}", int(rng.integers(1, 5000)),
+                     f"{rng.random() * 500:.8f}", f"{rng.random() * 5e4:.8f}", "0"])
+    return json.dumps(rows, separators=(",", ":")).encode()
+
+
+def measure(fn, body, reps):
+    fn(body)
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn(body)
+    elapsed = (time.perf_counter() - t0) / reps
+    tracemalloc.start()
+    fn(body)
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    body = payload(1000)
+    old, new = frame_old(body), frame_new(body)
+    pd.testing.assert_frame_equal(old, new, check_exact=True)
+    assert old.index.equals(new.index)
+    print("equivalent: frame_new == frame_old (values, dtypes, index)")
+
+    for n in (200, 1000):
+        body = payload(n, seed=n)
+        print(f"\nn={n} rows, body {len(body) / 1024:.0f} KiB")
+        base = None
+        for fn in (frame_old, frame_new, arrays_new, arrays_f32):
+            t, peak = measure(fn, body, reps=50)
+            base = base or t
+            print(f"  {fn.__name__:11s} {t * 1e3:7.3f} ms  x{base / t:5.1f}   peak {peak / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
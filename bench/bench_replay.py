@@ -0,0 +1,86 @@
+"""Alert replay: equivalence check vs a bar-by-bar auto_loop + benchmark.
+
+    python bench/bench_replay.py [symbols] [days]
+
+Part 1 replays a few random series with ``replay.replay_symbol`` and with
+the live path (ring window, SwingTracker, sr_levels, AlertState.check,
+cross_event once per bar) and requires identical alert logs. Part 2 writes
+``symbols`` x ``days`` of synthetic 5m candles to a temporary HISTORY_DIR
+and times ``python replay.py`` over all of them.
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["HISTORY_DIR"] = tempfile.mkdtemp(prefix="replay-bench-")
+import replay  # noqa: E402
+from alert_rules import sma, sr_levels, cross_event  # noqa: E402
+from alert_state import AlertState  # noqa: E402
+from swings import SwingTracker  # noqa: E402
+from kline_history import KlineHistory  # noqa: E402
+
+
+def random_candles(n, seed=0, vol=0.0015):
+    rng = np.random.default_rng(seed)
+    c = np.round(100 * np.exp(np.cumsum(rng.normal(0, vol, n))), 2)
+    o = np.r_[c[0], c[:-1]]
+    h = np.maximum(o, c) + np.round(np.abs(rng.normal(0, vol * 50, n)), 2)
+    l = np.minimum(o, c) - np.round(np.abs(rng.normal(0, vol * 50, n)), 2)
+    t = 1_600_000_000_000 + np.arange(n, dtype=np.int64) * 300_000
+    return {"open_time": t, "open": o, "high": h, "low": l, "close": c, "volume": np.ones(n)}
+
+
+def replay_loop(a, lookback=replay.LOOKBACK):
+    """What m1ain's check_pair_alerts would have sent, one bar at a time."""
+    t, h, l, c = a["open_time"], a["high"], a["low"], a["close"]
+    state = AlertState(ttl=replay.ALERT_TTL, rearm_tol=replay.REARM_TOL, max_entries=10**9)
+    tracker = SwingTracker(window=replay.SWING_WINDOW)
+    fast, slow = sma(c, replay.SMA_FAST), sma(c, replay.SMA_SLOW)
+    out, cross_state = [], None
+    for i in range(1, len(c)):
+        w = slice(max(0, i - lookback + 1), i + 1)
+        swing_res, swing_sup = tracker.update(t[w], h[w], l[w])
+        supports, resistances = sr_levels(h[w], l[w], c[w], swing_res, swing_sup)
+        for kind, levels in (("SUP", supports), ("RES", resistances)):
+            for v in state.check("X", kind, levels, c[i], replay.NEAR_TOL, now=t[i] // 1000):
+                out.append((int(t[i]), "support" if kind == "SUP" else "resistance", float(v)))
+        if i > replay.SMA_SLOW:
+            kind, cross_state = cross_event(fast[i - 1], slow[i - 1], fast[i], slow[i], cross_state)
+            if kind:
+                out.append((int(t[i]), f"{kind}_cross", float(c[i])))
+    return sorted(out)
+
+
+def check_equivalence():
+    for seed, vol in enumerate((0.0005, 0.0015, 0.004)):
+        a = random_candles(3000, seed, vol)
+        t0 = time.perf_counter()
+        want = replay_loop(a)
+        t_loop = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        alerts, _ = replay.replay_symbol("X", a)
+        t_replay = time.perf_counter() - t0
+        got = sorted((ts, kind, level) for ts, _, kind, level, _, _ in alerts)
+        assert got == want, (seed, len(got), len(want))
+        print(f"vol {vol}: {len(got)} alerts identical  bar loop {t_loop * 1e3:.0f} ms  replay {t_replay * 1e3:.1f} ms")
+
+
+def main():
+    symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    days = float(sys.argv[2]) if len(sys.argv) > 2 else 365
+    check_equivalence()
+    bars = int(days * 288)
+    t0 = time.perf_counter()
+    for i in range(symbols):
+        KlineHistory(f"SYM{i:03d}USDT", "5m", offline=True).append(random_candles(bars, 100 + i))
+    print(f"wrote {symbols} x {bars} candles in {time.perf_counter() - t0:.1f}s")
+    replay.main(["--days", str(days), "--out", os.path.join(os.environ["HISTORY_DIR"], "alerts.csv")])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Watchlist scanner: equivalence check vs the per-symbol m1ain rules + benchmark.
+
+    python bench/bench_scanner.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scanner import scan, hits  # noqa: E402
+from swings import swing_levels  # noqa: E402
+
+FAST, SLOW, TOL = 50, 200, 0.003
+
+
+# per-symbol rules as in m1ain.check_pair_alerts
+def pivot_levels(h, l, c):
+    H1, L1, C1 = h[-2], l[-2], c[-2]
+    pp = (H1 + L1 + C1)/3
+    return [2*pp - H1, pp - (H1 - L1)], [2*pp - L1, pp + (H1 - L1)]
+
+
+def pct_diff(a, b):
+    return abs(a - b) / b if b != 0 else 0
+
+
+def scan_loop(symbols, close, high, low):
+    out = set()
+    for i, sym in enumerate(symbols):
+        c, h, l = close[i], high[i], low[i]
+        price = c[-1]
+        sup_piv, res_piv = pivot_levels(h, l, c)
+        swing_res, swing_sup = swing_levels(h, l, 5)
+        for kind, levels in (("support", sup_piv + swing_sup), ("resistance", res_piv + swing_res)):
+            near = [v for v in levels if pct_diff(price, v) <= TOL]
+            if near:
+                out.add((sym, kind, round(min(near, key=lambda v: pct_diff(price, v)), 9)))
+        f = [c[-FAST-1:-1].mean(), c[-FAST:].mean()]
+        s = [c[-SLOW-1:-1].mean(), c[-SLOW:].mean()]
+        if f[0] <= s[0] and f[1] > s[1]:
+            out.add((sym, "golden_cross", round(price, 9)))
+        if f[0] >= s[0] and f[1] < s[1]:
+            out.add((sym, "death_cross", round(price, 9)))
+    return out
+
+
+def random_panel(S, n, seed=0):
+    rng = np.random.default_rng(seed)
+    c = 100 + np.cumsum(rng.normal(0, 0.3, (S, n)), axis=1)
+    spread = np.abs(rng.normal(0, 0.2, (S, n)))
+    return [f"SYM{i}USDT" for i in range(S)], c, c + spread, c - spread
+
+
+def main():
+    symbols, c, h, l = random_panel(300, 300)
+    got = {(s, k, round(float(v), 9)) for s, k, v in hits(scan(symbols, c, h, l, FAST, SLOW, TOL))}
+    want = scan_loop(symbols, c, h, l)
+    assert got == want, (got ^ want)
+    print(f"equivalent: {len(got)} hits over {len(symbols)} symbols")
+
+    for S in (50, 300, 1000):
+        symbols, c, h, l = random_panel(S, 300, seed=S)
+        t0 = time.perf_counter()
+        scan_loop(symbols, c, h, l)
+        t_loop = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for _ in range(10):
+            scan(symbols, c, h, l, FAST, SLOW, TOL)
+        t_vec = (time.perf_counter() - t0) / 10
+        print(f"S={S:5d}  loop {t_loop*1e3:8.2f} ms   vectorized {t_vec*1e3:7.2f} ms   x{t_loop / t_vec:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Cold-start benchmark: import time and time-to-first-response per entry point.
+
+Each run starts a fresh interpreter that loads the entry point, starts the
+background warmup (as its __main__ does) and binds Flask on a free port. The
+parent measures from process start until POST /<token> with an empty update
+answers. setWebhook and the alert loops are skipped: they are network-bound
+and identical in both layouts.
+
+    python bench/bench_startup.py [--runs 5] [--json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ("main.py", "m1ain.py", "m....ain.py", "m.ain.py")
+TOKEN = "bench"
+HEAVY = ("numpy", "pandas", "matplotlib", "mplfinance")
+
+CHILD = r"""
+import sys, time, importlib.util
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location("entry", sys.argv[1])
+mod = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mod)
+t_import = time.perf_counter() - t0
+heavy = [m for m in %r if m in sys.modules]
+print("IMPORT", t_import, ",".join(heavy), flush=True)
+if hasattr(mod, "start_warmup"):
+    mod.start_warmup()
+mod.app.run(host="127.0.0.1", port=int(sys.argv[2]))
+""" % (HEAVY,)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_first_response(port, deadline):
+    req_body = json.dumps({"update_id": 0}).encode()
+    while time.perf_counter() < deadline:
+        try:
+            req = urllib.request.Request(f"http://127.0.0.1:{port}/{TOKEN}", data=req_body,
+                                         headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(req, timeout=1) as r:
+                r.read()
+                return True
+        except OSError:
+            time.sleep(0.005)
+    return False
+
+
+def run_once(entry, warmup):
+    port = free_port()
+    env = dict(os.environ, TELEGRAM_TOKEN=TOKEN, RAILWAY_URL="http://127.0.0.1", TELEGRAM_CHAT_ID="0",
+               WARMUP="1" if warmup else "0", PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", CHILD, os.path.join(ROOT, entry), str(port)],
+                            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        line = proc.stdout.readline().split()
+        ok = wait_first_response(port, t0 + 30)
+        ttfr = time.perf_counter() - t0
+    finally:
+        proc.kill()
+        proc.wait()
+    if not ok or not line or line[0] != "IMPORT":
+        raise RuntimeError(f"{entry}: no response")
+    return {"import_s": float(line[1]), "ttfr_s": ttfr, "heavy_loaded": line[2].split(",") if len(line) > 2 else []}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--json", action="store_true", help="one JSON object per entry point")
+    args = ap.parse_args()
+
+    for entry in ENTRY_POINTS:
+        for warmup in (False, True):
+            runs = [run_once(entry, warmup) for _ in range(args.runs)]
+            result = {
+                "entry": entry, "warmup": warmup, "runs": args.runs,
+                "import_s_median": statistics.median(r["import_s"] for r in runs),
+                "ttfr_s_median": statistics.median(r["ttfr_s"] for r in runs),
+                "heavy_loaded_at_import": runs[0]["heavy_loaded"],
+            }
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{entry:12s} warmup={'on ' if warmup else 'off'}  import {result['import_s_median'] * 1e3:6.0f} ms"
+                      f"  first response {result['ttfr_s_median'] * 1e3:6.0f} ms"
+                      f"  heavy at import: {','.join(result['heavy_loaded_at_import']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
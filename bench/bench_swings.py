@@ -0,0 +1,97 @@
+"""Swing detection: equivalence check + benchmark vs the old Python loops.
+
+    python bench/bench_swings.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from swings import swing_levels, SwingTracker  # noqa: E402
+
+
+# old implementations (m1ain.swing_levels / m....ain.find_swings)
+def swing_levels_loop(h, l, window=5):
+    highs, lows = [], []
+    for i in range(window, len(h)-window):
+        if h[i] == max(h[i-window:i+window+1]): highs.append(h[i])
+        if l[i] == min(l[i-window:i+window+1]): lows.append(l[i])
+    return sorted(set(highs)), sorted(set(lows))
+
+
+def find_swings_loop(highs, lows, window=5):
+    highs_idx = []
+    lows_idx = []
+    n = len(highs)
+    for i in range(window, n-window):
+        if highs[i] == max(highs[i-window:i+window+1]):
+            highs_idx.append(i)
+        if lows[i] == min(lows[i-window:i+window+1]):
+            lows_idx.append(i)
+    highs_vals = [highs[i] for i in highs_idx]
+    lows_vals = [lows[i] for i in lows_idx]
+    return sorted(set(highs_vals)), sorted(set(lows_vals))
+
+
+def random_bars(n, seed=0, ticks=False):
+    rng = np.random.default_rng(seed)
+    c = 100 + np.cumsum(rng.normal(0, 1, n))
+    if ticks:  # coarse prices -> lots of equal highs/lows
+        c = np.round(c)
+    h = c + np.abs(rng.normal(0, 0.5, n)).round(0 if ticks else 6)
+    l = c - np.abs(rng.normal(0, 0.5, n)).round(0 if ticks else 6)
+    return h, l
+
+
+def check_equivalence():
+    for n in (0, 5, 11, 12, 300, 2000):
+        for window in (1, 3, 5, 10):
+            for ticks in (False, True):
+                h, l = random_bars(n, seed=n + window, ticks=ticks)
+                expected = swing_levels_loop(h, l, window)
+                assert find_swings_loop(h, l, window) == expected
+                assert swing_levels(h, l, window) == expected, (n, window, ticks)
+
+    # incremental: rolling 300-bar window, appends + in-place revisions
+    h, l = random_bars(3000, seed=7, ticks=True)
+    keys = np.arange(3000) * 300_000
+    tracker = SwingTracker(window=5)
+    for end in range(300, 3000, 1):
+        sl = slice(end - 300, end)
+        hh, ll = h[sl].copy(), l[sl].copy()
+        if end % 3 == 0:  # forming candle revised before the next append
+            hh[-1] += 1
+            assert tracker.update(keys[sl], hh, ll) == swing_levels_loop(hh, ll)
+            hh[-1] -= 1
+        assert tracker.update(keys[sl], hh, ll) == swing_levels_loop(hh, ll), end
+    print("equivalence: ok")
+
+
+def timeit(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    check_equivalence()
+    for n in (1000, 100_000):
+        h, l = random_bars(n, seed=1)
+        t_loop = timeit(swing_levels_loop, h, l, repeat=1 if n > 10_000 else 5)
+        t_vec = timeit(swing_levels, h, l)
+        tracker = SwingTracker()
+        keys = np.arange(n + 1)
+        tracker.update(keys[:-1], h, l)
+        h2, l2 = np.append(h[1:], h[-1]), np.append(l[1:], l[-1])
+        t_inc = timeit(tracker.update, keys[1:], h2, l2, repeat=1)
+        print(f"n={n:>6}  loop {t_loop*1e3:9.2f} ms   numpy {t_vec*1e3:8.2f} ms "
+              f"({t_loop/t_vec:6.1f}x)   incremental append {t_inc*1e3:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Offline stand-ins for the Binance and Telegram HTTP APIs.
+
+``install()`` mounts a requests transport adapter on the pooled
+``http_client`` sessions, so the entry points run unchanged while:
+
+* api.binance.com answers /api/v3/klines from bench/fixtures (honouring
+  symbol/interval/limit/startTime/endTime) and /api/v3/ticker/price from
+  the recorded ticker;
+* api.telegram.org answers every method with ``{"ok": true}`` and records
+  the call (method, chat_id, payload size) in ``calls``.
+"""
+import os
+import json
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+from requests.adapters import BaseAdapter
+
+import http_client
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BINANCE = "https://api.binance.com"
+TELEGRAM = "https://api.telegram.org"
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as fh:
+        return fh.read()
+
+
+class OfflineAdapter(BaseAdapter):
+    def __init__(self, fixtures=FIXTURES):
+        super().__init__()
+        self.fixtures = fixtures
+        self._klines = {}  # (symbol, interval) -> decoded rows
+        self._lock = threading.Lock()
+        self.calls = []
+
+    # ----- Binance -----
+    def _rows(self, symbol, interval):
+        key = (symbol, interval)
+        with self._lock:
+            if key not in self._klines:
+                exact = os.path.join(self.fixtures, f"klines_{symbol}_{interval}.json")
+                if not os.path.exists(exact):  # any recorded symbol for this interval
+                    names = sorted(n for n in os.listdir(self.fixtures) if n.endswith(f"_{interval}.json"))
+                    if not names:
+                        return None
+                    exact = os.path.join(self.fixtures, names[0])
+                with open(exact, "rb") as fh:
+                    self._klines[key] = json.loads(fh.read())
+            return self._klines[key]
+
+    def _binance(self, path, query):
+        if path == "/api/v3/ticker/price":
+            return 200, load_fixture("ticker_price.json")
+        if path == "/api/v3/klines":
+            q = {k: v[0] for k, v in query.items()}
+            rows = self._rows(q.get("symbol", "").upper(), q.get("interval", ""))
+            if rows is None:
+                return 400, b'{"code":-1120,"msg":"Invalid interval."}'
+            if "startTime" in q:
+                rows = [r for r in rows if r[0] >= int(q["startTime"])]
+            if "endTime" in q:
+                rows = [r for r in rows if r[0] <= int(q["endTime"])]
+            limit = int(q.get("limit", 500))
+            rows = rows[:limit] if "startTime" in q else rows[-limit:]
+            return 200, json.dumps(rows, separators=(",", ":")).encode()
+        return 404, b'{"code":-1,"msg":"not recorded"}'
+
+    # ----- Telegram -----
+    def _telegram(self, path, request):
+        method = path.rsplit("/", 1)[-1]
+        body = request.body or b""
+        self.calls.append({"method": method, "bytes": len(body)})
+        result = {"message_id": len(self.calls)}
+        if method == "sendPhoto":
+            result["photo"] = [{"file_id": f"offline-{len(self.calls)}", "width": 1200, "height": 900}]
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        if parts.netloc == "api.binance.com":
+            status, content = self._binance(parts.path, parse_qs(parts.query))
+        else:
+            status, content = self._telegram(parts.path, request)
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = content
+        resp.headers["Content-Type"] = "application/json"
+        resp.url = request.url
+        resp.request = request
+        resp.encoding = "utf-8"
+        return resp
+
+    def close(self):
+        pass
+
+
+def install(fixtures=FIXTURES):
+    """Route Binance/Telegram traffic of ``http_client`` to an OfflineAdapter."""
+    adapter = OfflineAdapter(fixtures)
+    for base in (BINANCE, TELEGRAM):
+        http_client.session_for(base).mount(base, adapter)
+    return adapter
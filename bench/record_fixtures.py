@@ -0,0 +1,82 @@
+"""Record the Binance fixtures used by the offline benchmark suite.
+
+    python bench/record_fixtures.py             # live Binance (needs network)
+    python bench/record_fixtures.py --synthetic # deterministic random walk, no network
+
+Writes bench/fixtures/klines_<SYMBOL>_<interval>.json (raw /api/v3/klines
+bodies) and bench/fixtures/ticker_price.json (raw /api/v3/ticker/price).
+"""
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SERIES = (("BTCUSDT", "1h", 500), ("BTCUSDT", "4h", 500), ("LTCUSDT", "5m", 500))
+STEP_MS = {"5m": 300_000, "1h": 3_600_000, "4h": 14_400_000}
+TICKER_SYMBOLS = 400
+
+
+def record_live():
+    import http_client
+    out = {}
+    for symbol, interval, limit in SERIES:
+        r = http_client.get("https://api.binance.com/api/v3/klines",
+                            params={"symbol": symbol, "interval": interval, "limit": limit})
+        r.raise_for_status()
+        out[f"klines_{symbol}_{interval}.json"] = r.content
+    r = http_client.get("https://api.binance.com/api/v3/ticker/price")
+    r.raise_for_status()
+    out["ticker_price.json"] = r.content
+    return out
+
+
+def _klines(n, step, start_price, seed):
+    rng = np.random.default_rng(seed)
+    t0 = 1_735_689_600_000  # 2025-01-01 00:00 UTC
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    rows = []
+    prev = close[0]
+    for i in range(n):
+        o, c = prev, close[i]
+        hi = max(o, c) * (1 + abs(rng.normal(0, 0.002)))
+        lo = min(o, c) * (1 - abs(rng.normal(0, 0.002)))
+        vol = abs(rng.normal(900, 250))
+        t = t0 + i * step
+        rows.append([t, f"{o:.8f}", f"{hi:.8f}", f"{lo:.8f}", f"{c:.8f}", f"{vol:.8f}",
+                     t + step - 1, f"{vol * c:.8f}", int(rng.integers(200, 9000)),
+                     f"{vol / 2:.8f}", f"{vol * c / 2:.8f}", "0"])
+        prev = c
+    return json.dumps(rows, separators=(",", ":")).encode()
+
+
+def record_synthetic():
+    out = {}
+    for k, (symbol, interval, limit) in enumerate(SERIES):
+        start = 95_000.0 if symbol == "BTCUSDT" else 110.0
+        out[f"klines_{symbol}_{interval}.json"] = _klines(limit, STEP_MS[interval], start, seed=k)
+    rng = np.random.default_rng(99)
+    names = ["BTCUSDT", "ETHUSDT", "LTCUSDT", "BNBUSDT", "SOLUSDT"]
+    names += [f"C{i:03d}USDT" for i in range(TICKER_SYMBOLS - len(names))]
+    ticker = [{"symbol": s, "price": f"{float(rng.lognormal(2, 2)):.8f}"} for s in names]
+    out["ticker_price.json"] = json.dumps(ticker, separators=(",", ":")).encode()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", action="store_true")
+    args = ap.parse_args()
+    files = record_synthetic() if args.synthetic else record_live()
+    os.makedirs(FIXTURES, exist_ok=True)
+    for name, body in files.items():
+        with open(os.path.join(FIXTURES, name), "wb") as fh:
+            fh.write(body)
+        print(f"{name}: {len(body) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Offline benchmark suite: every stage of the chart/alert path, no network.
+
+Binance answers from bench/fixtures and Telegram is a local stub
+(bench/offline.py). Each stage is timed several times; results are written
+as JSON so two runs can be compared.
+
+    python bench/run_bench.py                        # print + bench/results/<time>.json
+    python bench/run_bench.py --out base.json
+    python bench/run_bench.py --compare base.json    # exit 1 if a stage got slower
+    python bench/run_bench.py --only render          # stages whose name contains "render"
+
+Charts render inline (RENDER_WORKERS=0) so render stages measure CPU time,
+not pool overhead; pass --pool to go through the render pool instead.
+"""
+import io
+import os
+import sys
+import json
+import time
+import contextlib
+import argparse
+import platform
+import statistics
+import subprocess
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+RESULTS = os.path.join(ROOT, "bench", "results")
+TOKEN = "bench"
+
+
+def load_entry(filename):
+    spec = importlib.util.spec_from_file_location(filename.replace(".", "_"), os.path.join(ROOT, filename))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def timeit(fn, setup=None, min_runs=5, min_time=0.5, max_runs=200):
+    """Run ``fn`` until both min_runs and min_time are reached; ms per run."""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):  # handlers log every Telegram reply
+        if setup is not None:
+            setup()
+        fn()  # warm-up run, not recorded
+        t_total = time.perf_counter()
+        while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() - t_total < min_time):
+            if setup is not None:
+                setup()
+            t0 = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - t0) * 1e3)
+    times.sort()
+    return {"median_ms": statistics.median(times), "min_ms": times[0],
+            "p90_ms": times[min(len(times) - 1, int(len(times) * 0.9))], "runs": len(times)}
+
+
+def build_stages(adapter):
+    import numpy as np
+    from offline import load_fixture
+    from kline_cache import kline_cache
+    from chart_cache import chart_cache
+    from kline_parse import parse_klines, klines_frame
+    from swings import swing_levels, find_swings, SwingTracker
+    from indicators import sma, rsi_wilder, macd, IndicatorEngine
+    from charts import fibonacci_levels, pick_sr_from_swings, fib_levels
+    from resample import resample, Resampler
+    from alert_rules import pivot_levels
+    from replay import replay_symbol
+
+    main = load_entry("main.py")
+    mx = load_entry("m....ain.py")
+    mp = load_entry("m.ain.py")
+
+    body = load_fixture("klines_BTCUSDT_4h.json")
+    df = klines_frame(parse_klines(body))
+    h, l, c = df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy()
+    keys = df.index.asi8
+    base = parse_klines(load_fixture("klines_LTCUSDT_5m.json"))
+    client_main = main.app.test_client()
+
+    def cold():
+        kline_cache.clear()
+        chart_cache.clear()
+
+    def engine_feed():
+        IndicatorEngine(sma_periods=(50, 200)).feed(keys, c)
+
+    warm_engine = IndicatorEngine(sma_periods=(50, 200))
+    warm_engine.feed(keys, c)
+
+    def engine_tick():
+        warm_engine.update(int(keys[-1]), c[-1] * 1.0001)
+
+    tracker = SwingTracker(window=5)
+    tracker.update(keys, h, l)
+
+    def tracker_tick():
+        h2 = h.copy()
+        h2[-1] *= 1.0001
+        tracker.update(keys, h2, l)
+
+    def indicators_pandas():
+        close = df["close"]
+        sma(close, 50), sma(close, 200), rsi_wilder(close, 14), macd(close, 12, 26, 9)
+
+    def update(text):
+        return {"update_id": time.monotonic_ns(), "message": {"chat": {"id": 1}, "text": text}}
+
+    # replies go out through the Telegram outbox; wait for delivery so the stub really got them
+    def chart_main():
+        client_main.post(f"/{TOKEN}", json=update("/chart btc"))
+        main.outbox.flush()
+
+    def now_main():
+        client_main.post(f"/{TOKEN}", json=update("/now btc"))
+        main.outbox.flush()
+
+    def chart_mx():
+        mx.process_update_async(update("/chart btc 4h"))
+        mx.outbox.flush()
+
+    def price_mx():
+        mx.process_update_async(update("/price btc eth ltc"))
+        mx.outbox.flush()
+
+    def render_check():
+        # the e2e stages must really reach Telegram with a photo
+        adapter.calls.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            chart_mx()
+        assert any(call["method"] == "sendPhoto" for call in adapter.calls), adapter.calls
+
+    def indicators_check():
+        # the engine must give the pandas formulas' numbers for whatever window it is fed,
+        # also after a longer history (/chart with a short bars) and when the window slides
+        eng = IndicatorEngine(sma_periods=(50, 200))
+        for w in (df, df.tail(50), df.iloc[:-1].tail(300), df.tail(300), df.tail(120), df):
+            close = w["close"]
+            eng.feed(w.index.asi8, close.to_numpy())
+            m, s, hist = macd(close, 12, 26, 9)
+            want = {"sma50": sma(close, 50), "sma200": sma(close, 200), "rsi": rsi_wilder(close, 14),
+                    "macd": m, "macd_signal": s, "macd_hist": hist}
+            for name, series in want.items():
+                got = eng.history(name, len(w))
+                assert len(got) == len(w) and np.allclose(got, series.to_numpy(), equal_nan=True), (name, len(w))
+
+    render_check()
+    indicators_check()
+    ring_df = df.tail(200)
+
+    def resample_tick():
+        # one new closed 5m candle into a warm 1h resampler
+        r = Resampler("5m", "1h")
+        r.update({k: v[:-1] for k, v in base.items()})
+        r.update(base, live={k: v[-1:] for k, v in base.items()})
+        return r.arrays(tail=300)
+
+    return [
+        # parsing
+        ("parse.parse_klines", lambda: parse_klines(body), None),
+        ("parse.parse_klines+frame", lambda: klines_frame(parse_klines(body)), None),
+        ("parse.get_klines_main", lambda: main.get_klines("BTCUSDT", "1h", 220), cold),
+        ("parse.binance_get_klines_mx", lambda: mx.binance_get_klines("BTCUSDT", "4h", 300), cold),
+        ("parse.get_candle_data_m_ain", lambda: mp.get_candle_data("LTCUSDT", "5m", 50), None),
+        # timeframes derived from 5m candles
+        ("resample.5m_to_1h", lambda: resample(base, "1h"), None),
+        ("resample.5m_to_4h", lambda: resample(base, "4h"), None),
+        ("resample.tick", resample_tick, None),
+        # swings / levels
+        ("swings.swing_levels", lambda: swing_levels(h, l, 5), None),
+        ("swings.find_swings", lambda: find_swings(h, l, window=5), None),
+        ("swings.tracker_tick", tracker_tick, None),
+        ("levels.fibonacci_levels", lambda: fibonacci_levels(df), None),
+        ("levels.fib_levels", lambda: fib_levels(*pick_sr_from_swings(*find_swings(h, l, window=5))), None),
+        ("levels.pivot_levels", lambda: pivot_levels(h, l, c), None),
+        ("levels.replay_symbol", lambda: replay_symbol("LTCUSDT", base), None),
+        # indicators
+        ("indicators.pandas", indicators_pandas, None),
+        ("indicators.engine_feed", engine_feed, None),
+        ("indicators.engine_tick", engine_tick, None),
+        # rendering
+        ("render.make_chart_png", lambda: main.make_chart_png(ring_df, title="BTCUSDT 1h"), None),
+        ("render.make_fibo_chart", lambda: main.make_fibo_chart("BTCUSDT", "1h", 200, df=ring_df), None),
+        ("render.make_chart_png_bytes", lambda: mx.make_chart_png_bytes(df.tail(300), title="BTCUSDT 4H"), None),
+        ("render.fast.make_chart_png", lambda: main.make_chart_png(ring_df, title="BTCUSDT 1h", engine="fast"), None),
+        ("render.fast.make_fibo_chart",
+         lambda: main.make_fibo_chart("BTCUSDT", "1h", 200, df=ring_df, engine="fast"), None),
+        ("render.fast.make_chart_png_bytes",
+         lambda: mx.make_chart_png_bytes(df.tail(300), title="BTCUSDT 4H", chart_engine="fast"), None),
+        # end to end (webhook/update -> Telegram stub)
+        ("e2e.main_chart_cold", chart_main, cold),
+        ("e2e.main_now_cold", now_main, cold),
+        ("e2e.mx_chart_cold", chart_mx, cold),
+        ("e2e.mx_chart_cached", chart_mx, None),
+        ("e2e.mx_price", price_mx, None),
+    ]
+
+
+def git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def meta():
+    import numpy
+    import pandas
+    import matplotlib
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": git_rev(),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "numpy": numpy.__version__, "pandas": pandas.__version__, "matplotlib": matplotlib.__version__,
+            "render_workers": int(os.environ["RENDER_WORKERS"])}
+
+
+def compare(current, baseline, threshold, metric="median_ms"):
+    """Print per-stage change vs ``baseline``; True if any stage regressed."""
+    regressed = False
+    for name, res in current["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            print(f"  {name:34s} new")
+            continue
+        change = res[metric] / old[metric] - 1
+        flag = ""
+        if change > threshold:
+            flag, regressed = "  REGRESSION", True
+        print(f"  {name:34s} {old[metric]:9.3f} -> {res[metric]:9.3f} ms  {change * 100:+6.1f}%{flag}")
+    return regressed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", help="result file (default bench/results/<timestamp>.json)")
+    ap.add_argument("--compare", help="baseline result file")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    ap.add_argument("--metric", default="median_ms", choices=("median_ms", "min_ms", "p90_ms"))
+    ap.add_argument("--only", help="run stages whose name contains this")
+    ap.add_argument("--pool", action="store_true", help="render through the process pool")
+    args = ap.parse_args()
+
+    os.environ.update(TELEGRAM_TOKEN=TOKEN, RAILWAY_URL="http://127.0.0.1", TELEGRAM_CHAT_ID="1",
+                      RENDER_WORKERS=os.environ.get("RENDER_WORKERS", "2") if args.pool else "0",
+                      WARMUP="0", TG_CHAT_RATE="1000", TG_GLOBAL_RATE="1000",  # measure work, not pacing
+                      RESAMPLE_BASE="")  # fixtures are historical: timeframes come from the Binance stub
+    sys.path.insert(0, os.path.join(ROOT, "bench"))
+    import offline
+    adapter = offline.install()
+
+    result = {"meta": meta(), "stages": {}}
+    for name, fn, setup in build_stages(adapter):
+        if args.only and args.only not in name:
+            continue
+        res = timeit(fn, setup)
+        result["stages"][name] = res
+        print(f"{name:36s} {res['median_ms']:9.3f} ms  (min {res['min_ms']:.3f}, runs {res['runs']})", flush=True)
+
+    out = args.out or os.path.join(RESULTS, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump(result, fh, indent=1)
+    print("results:", out)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        print(f"vs {args.compare} ({baseline['meta'].get('git')}):")
+        if compare(result, baseline, args.threshold, args.metric):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
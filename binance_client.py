@@ -0,0 +1,139 @@
+"""Rate-limit-aware GET for the Binance REST API.
+
+Binance counts request weight per IP per minute and answers 429 (then 418,
+an IP ban) once the limit is crossed. Every market-data call goes through
+``get`` here:
+
+* a token bucket holding ``WEIGHT_BUDGET`` of the per-minute limit paces
+  requests by their weight, and is pulled down to whatever
+  ``X-MBX-USED-WEIGHT-1M`` says is left, so other bots on the same IP are
+  accounted for too;
+* after a 429/418 nothing is sent until ``Retry-After`` has passed; callers
+  that would wait longer than ``MAX_WAIT`` in all (ban plus pacing) get
+  ``RateLimited`` instead;
+* identical concurrent requests (same path and params) are coalesced: one
+  goes out, the others wait for it and share its response.
+"""
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+
+import http_client
+import metrics
+from ratelimit import TokenBucket
+
+WEIGHT_LIMIT = int(os.getenv("BINANCE_WEIGHT_LIMIT", 6000))       # REQUEST_WEIGHT per minute
+WEIGHT_BUDGET = float(os.getenv("BINANCE_WEIGHT_BUDGET", 0.8))    # share of it this process may use
+MAX_WAIT = float(os.getenv("BINANCE_MAX_WAIT", 30))               # seconds a caller may be held back
+WEIGHT_HEADER = "X-MBX-USED-WEIGHT-1M"
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Binance rate limit, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def request_weight(path, params=None):
+    """Weight Binance charges for ``path`` (the used-weight header corrects drift)."""
+    params = params or {}
+    if path == "/api/v3/klines":
+        return 2
+    if path in ("/api/v3/ticker/price", "/api/v3/ticker/bookTicker"):
+        return 2 if "symbol" in params else 4
+    if path == "/api/v3/ticker/24hr":
+        return 2 if "symbol" in params else 80
+    return 1
+
+
+# ===== CLIENT =====
+class _Call:
+    __slots__ = ("done", "response", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class BinanceClient:
+    def __init__(self, weight_limit=WEIGHT_LIMIT, budget=WEIGHT_BUDGET, max_wait=MAX_WAIT):
+        self.weight_limit = weight_limit
+        self.max_wait = max_wait
+        self.bucket = TokenBucket(weight_limit * budget)
+        self._blocked_until = 0.0   # monotonic; set by 429/418
+        self._inflight = {}         # (url, params) -> _Call
+        self._lock = threading.Lock()
+        self.used_weight = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.rejected = 0
+
+    def get(self, url, params=None, timeout=None):
+        key = (url, tuple(sorted((params or {}).items())))
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.response
+        try:
+            call.response = self._send(url, params, timeout)
+            return call.response
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def _send(self, url, params, timeout):
+        wait = self._blocked_until - time.monotonic()
+        if wait > self.max_wait:
+            self.rejected += 1
+            raise RateLimited(wait)
+        weight = request_weight(urlsplit(url).path, params)
+        wait = max(wait, self.bucket.reserve(weight))
+        if wait > self.max_wait:
+            # e.g. the used-weight header pulled the bucket far below zero
+            self.bucket.release(weight)
+            self.rejected += 1
+            raise RateLimited(wait)
+        if wait > 0:
+            self.throttled += 1
+            metrics.observe("ratelimit", wait)
+            time.sleep(wait)
+
+        r = http_client.get(url, params=params, timeout=timeout)
+        self.requests += 1
+        used = r.headers.get(WEIGHT_HEADER) or r.headers.get("X-MBX-USED-WEIGHT")
+        if used is not None:
+            self.used_weight = int(used)
+            self.bucket.sync(self.used_weight, self.weight_limit)
+        if r.status_code in (418, 429):
+            retry_after = float(r.headers.get("Retry-After") or 60)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            print(f"Binance {r.status_code}: paused for {retry_after:.0f}s")
+        return r
+
+    def stats(self):
+        return {"requests": self.requests, "coalesced": self.coalesced, "throttled": self.throttled,
+                "rejected": self.rejected, "used_weight": self.used_weight,
+                "tokens": round(self.bucket.tokens, 1),
+                "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 1)}
+
+
+client = BinanceClient()
+
+
+def get(url, params=None, timeout=None):
+    return client.get(url, params=params, timeout=timeout)
@@ -0,0 +1,177 @@
+"""In-memory candle store backed by fixed-size numpy ring buffers.
+
+Each (symbol, interval) series is backfilled once and afterwards only the
+candles from the last stored ``open_time`` onward are requested, so a
+5-minute alert cycle pulls one or two rows instead of the full window.
+"""
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import binance_client
+
+from kline_cache import interval_ms
+
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+MAX_LIMIT = 1000
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def fetch_kline_rows(symbol, interval, limit=500, start_time=None):
+    """Raw /api/v3/klines rows, optionally starting at ``start_time`` (ms)."""
+    params = {"symbol": symbol.upper(), "interval": interval, "limit": min(int(limit), MAX_LIMIT)}
+    if start_time is not None:
+        params["startTime"] = int(start_time)
+    r = binance_client.get(BINANCE_KLINES_URL, params=params, timeout=20)
+    r.raise_for_status()
+    return r.json()
+
+
+# ===== RING BUFFER =====
+class CandleRing:
+    """Fixed-capacity OHLCV series in chronological order.
+
+    Every row is written twice (at ``i`` and ``i + capacity``) so the latest
+    ``capacity`` candles are always one contiguous slice and the column
+    properties are zero-copy views.
+    """
+
+    def __init__(self, capacity):
+        import numpy as np
+        self.capacity = capacity
+        self._time = np.zeros(2 * capacity, dtype=np.int64)
+        self._cols = {f: np.zeros(2 * capacity, dtype=np.float64) for f in FIELDS}
+        self._head = 0   # next write position in [0, capacity)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _window(self):
+        start = self._head + self.capacity - self.size
+        return slice(start, self._head + self.capacity)
+
+    @property
+    def last_open_time(self):
+        return int(self._time[self._head + self.capacity - 1]) if self.size else None
+
+    @property
+    def open_time(self):
+        return self._time[self._window()]
+
+    def column(self, name):
+        return self._cols[name][self._window()]
+
+    open = property(lambda self: self.column("open"))
+    high = property(lambda self: self.column("high"))
+    low = property(lambda self: self.column("low"))
+    close = property(lambda self: self.column("close"))
+    volume = property(lambda self: self.column("volume"))
+
+    def _write(self, pos, row):
+        for p in (pos, pos + self.capacity):
+            self._time[p] = int(row[0])
+            for j, f in enumerate(FIELDS, start=1):
+                self._cols[f][p] = float(row[j])
+
+    def update(self, rows):
+        """Merge kline rows; the still-open candle is overwritten in place."""
+        appended = 0
+        for row in rows:
+            t = int(row[0])
+            last = self.last_open_time
+            if last is not None and t < last:
+                continue
+            if last is not None and t == last:
+                self._write((self._head - 1) % self.capacity, row)
+                continue
+            self._write(self._head, row)
+            self._head = (self._head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            appended += 1
+        return appended
+
+    def reset(self):
+        self._head = 0
+        self.size = 0
+
+    def snapshot(self):
+        """Independent copy, for handing the ring to another thread."""
+        snap = object.__new__(CandleRing)
+        snap.__dict__.update(self.__dict__)
+        snap._time = self._time.copy()
+        snap._cols = {f: c.copy() for f, c in self._cols.items()}
+        return snap
+
+    def to_frame(self, tail=None):
+        """DataFrame copy (open_time index) for charting code."""
+        import pandas as pd
+        sl = self._window()
+        if tail is not None:
+            sl = slice(max(sl.start, sl.stop - tail), sl.stop)
+        idx = pd.to_datetime(self._time[sl], unit="ms")
+        idx.name = "open_time"
+        return pd.DataFrame({f: self._cols[f][sl].copy() for f in FIELDS}, index=idx)
+
+
+# ===== STORE =====
+class CandleStore:
+    """Registry of CandleRing per (symbol, interval), LRU-bounded."""
+
+    def __init__(self, capacity=300, max_series=64, fetch=fetch_kline_rows, concurrency=8):
+        self.capacity = capacity
+        self.max_series = max_series
+        self.fetch = fetch
+        self.concurrency = concurrency
+        self._rings = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get(self, symbol, interval):
+        key = (symbol.upper(), interval)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = CandleRing(self.capacity)
+                while len(self._rings) > self.max_series:
+                    self._rings.popitem(last=False)
+            self._rings.move_to_end(key)
+            return ring
+
+    def refresh(self, symbol, interval):
+        """Bring the series up to date and return its ring."""
+        ring = self.get(symbol, interval)
+        last = ring.last_open_time
+        step = interval_ms(interval)
+        now_ms = int(time.time() * 1000)
+        # empty, or too far behind to be worth paging forward: full backfill
+        if last is None or (now_ms - last) // step >= self.capacity:
+            ring.reset()
+            ring.update(self.fetch(symbol, interval, limit=self.capacity))
+        else:
+            ring.update(self.fetch(symbol, interval, limit=(now_ms - last) // step + 2, start_time=last))
+        return ring
+
+    def refresh_many(self, symbols, interval):
+        """Refresh several series concurrently (at most ``concurrency`` requests
+        in flight). Returns ({symbol: ring}, {symbol: error}) in input order."""
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="candles")
+        futures = {s: self._executor.submit(self.refresh, s, interval) for s in symbols}
+        rings, errors = {}, {}
+        for s, fut in futures.items():
+            try:
+                rings[s] = fut.result()
+            except Exception as e:
+                errors[s] = e
+        return rings, errors
+
+    def stats(self):
+        with self._lock:
+            return {"series": len(self._rings), "capacity": self.capacity,
+                    "bytes": sum(r._time.nbytes + 5 * r._cols["close"].nbytes
+                                 for r in self._rings.values())}
+
@@ -0,0 +1,164 @@
+"""Cache of rendered chart PNG bytes.
+
+Keyed by (renderer, symbol, timeframe, last candle time, options): everyone
+asking for the same chart inside one candle gets the same bytes, and
+concurrent requests for a key that is still rendering wait for that render
+instead of starting their own. When a newer candle is rendered for the same
+(renderer, symbol, timeframe, options) the older entry is dropped. With
+SHARED_CACHE set, a render done by one gunicorn worker is reused by the
+others through ``shared_cache``.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from shared_cache import shared_cache
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ChartCache:
+    """Byte-capped LRU of rendered charts with single-flight rendering."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_age=60, shared=None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.shared = shared
+        self._data = OrderedDict()  # key -> (created, png)
+        self._latest = {}           # key without candle -> candle
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+    @staticmethod
+    def _base(key):
+        renderer, symbol, tf, _candle, options = key
+        return renderer, symbol, tf, options
+
+    def _drop(self, key):
+        _, png = self._data.pop(key)
+        self.bytes -= len(png)
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if self.max_age and time.time() - entry[0] > self.max_age:
+            self._drop(key)
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def _put(self, key, png):
+        base = self._base(key)
+        old_candle = self._latest.get(base)
+        if old_candle is not None and old_candle != key[3]:
+            old = base[:3] + (old_candle, base[3])
+            if old in self._data:
+                self._drop(old)
+        self._latest[base] = key[3]
+        if key in self._data:
+            self._drop(key)
+        if len(png) > self.max_bytes:
+            return
+        self._data[key] = (time.time(), png)
+        self.bytes += len(png)
+        while self.bytes > self.max_bytes:
+            old_key, _ = next(iter(self._data.items()))
+            self._drop(old_key)
+            self.evictions += 1
+
+    def get_or_render(self, key, render):
+        """Return cached PNG for ``key`` or produce it with ``render()`` once."""
+        with self._lock:
+            png = self._get(key)
+            if png is not None:
+                self.hits += 1
+                return png
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.waits += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = self._shared_get(key)
+            if flight.value is None:
+                flight.value = render()
+                self._shared_put(key, flight.value)
+            with self._lock:
+                self._put(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _shared_get(self, key):
+        if self.shared is None:
+            return None
+        png = self.shared.get(f"chart:{key!r}")
+        if png is not None:
+            with self._lock:
+                self.shared_hits += 1
+        return png
+
+    def _shared_put(self, key, png):
+        if self.shared is not None:
+            # the key already changes with every candle; max_age bounds the rest
+            self.shared.set(f"chart:{key!r}", png, (time.time() + (self.max_age or 300)) * 1000)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._latest.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses + self.waits
+            return {
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "evictions": self.evictions,
+                "shared_hits": self.shared_hits,
+                "hit_rate": (self.hits + self.waits) / total if total else 0.0,
+            }
+
+
+chart_cache = ChartCache(
+    max_bytes=int(os.getenv("CHART_CACHE_BYTES", 32 * 1024 * 1024)),
+    max_age=float(os.getenv("CHART_CACHE_MAX_AGE", 60)),
+    shared=shared_cache,
+)
+
+
+def cached_chart(renderer, symbol, timeframe, df, render, **options):
+    """Render through the shared cache, keyed on ``df``'s last candle."""
+    key = (renderer, symbol.upper(), timeframe, df.index[-1].value,
+           tuple(sorted(options.items())))
+    return chart_cache.get_or_render(key, render)
@@ -0,0 +1,279 @@
+"""Chart renderers shared by the entry points and the render worker pool.
+
+Each renderer takes an OHLCV DataFrame (lowercase columns, open_time index)
+plus plain options and returns image bytes, encoded as CHART_FORMAT.
+``pack_ohlc``/``render_packed`` move the data across a process boundary as
+compact numpy arrays.
+``render(kind, df, engine="fast")`` uses the direct-Agg versions in
+fast_charts instead of mplfinance.
+"""
+import io
+import os
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import mplfinance as mpf
+
+from swings import find_swings
+
+FIELDS = ("open", "high", "low", "close", "volume")
+CHART_ENGINE = os.getenv("CHART_ENGINE", "mpf")  # "fast": fast_charts (direct Agg, no mplfinance)
+# output encoding. Default png: lossless, what the charts always were. Opt in to trade
+# fidelity for size/speed (bench/bench_encode.py, 1800x1350 sr_fib chart):
+#   png8  256-colour palette, ~1/3 the bytes and ~2x faster to encode; antialiased
+#         candle edges, MA lines and fib fills are quantized, so colours shift slightly
+#   jpeg  fastest to encode, but lossy ringing around thin lines and text
+#   webp  lossy at CHART_QUALITY, slightly smaller than png
+CHART_FORMAT = os.getenv("CHART_FORMAT", "png").lower()
+CHART_QUALITY = int(os.getenv("CHART_QUALITY", 85))   # jpeg/webp
+CHART_MAX_SIDE = int(os.getenv("CHART_MAX_SIDE", 0))  # px; lowers the dpi of bigger charts, 0 = off
+_timing = threading.local()  # rasterize + encode time of the last render in this thread
+
+
+# ===== TRANSPORT =====
+def pack_ohlc(df):
+    """DataFrame -> dict of contiguous arrays (int64 ns index + float64 columns)."""
+    arrays = {"t": np.ascontiguousarray(df.index.values.astype("datetime64[ns]").view(np.int64))}
+    for f in FIELDS:
+        arrays[f] = np.ascontiguousarray(df[f].to_numpy(dtype=np.float64))
+    return arrays
+
+
+def unpack_ohlc(arrays):
+    idx = pd.DatetimeIndex(arrays["t"].astype("datetime64[ns]"), name="open_time")
+    return pd.DataFrame({f: arrays[f] for f in FIELDS}, index=idx)
+
+
+# ===== ENCODING =====
+def chart_dpi(figsize, dpi):
+    """``dpi``, lowered so the long side stays within CHART_MAX_SIDE pixels."""
+    if CHART_MAX_SIDE > 0:
+        return min(dpi, CHART_MAX_SIDE / max(figsize))
+    return dpi
+
+
+def encode(img, fmt=None):
+    """RGB PIL image -> bytes in ``fmt`` (default CHART_FORMAT)."""
+    fmt = fmt or CHART_FORMAT
+    buf = io.BytesIO()
+    if fmt == "png8":
+        img.quantize(256, method=Image.Quantize.FASTOCTREE).save(buf, format="png")
+    elif fmt in ("jpeg", "jpg"):
+        img.save(buf, format="jpeg", quality=CHART_QUALITY)
+    elif fmt == "webp":
+        img.save(buf, format="webp", quality=CHART_QUALITY, method=0)
+    else:
+        img.save(buf, format="png")
+    return buf.getvalue()
+
+
+def _rgb(canvas):
+    """The drawn Agg canvas as an RGB image (opaque: drop alpha).
+
+    convert() drops the alpha in one pass; fromarray() on a [..., :3] view
+    first copies the strided array with tobytes(), ~4x slower at chart size.
+    """
+    return Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba(),
+                            "raw", "RGBA", 0, 1).convert("RGB")
+
+
+def _png(fig, dpi):
+    t0 = time.perf_counter()
+    fig.set_dpi(chart_dpi(fig.get_size_inches(), dpi))
+    fig.canvas.draw()
+    img = _rgb(fig.canvas)
+    plt.close(fig)
+    out = encode(img)
+    _timing.encode = time.perf_counter() - t0
+    return out
+
+
+# ===== CHART MA =====
+def render_ma(df, title="", mav=(50, 200)):
+    """Candles + moving averages (main.py / m1ain.py /chart)."""
+    fig, ax = mpf.plot(
+        df,
+        columns=FIELDS,  # lowercase columns as-is, no copy/rename
+        type="candle",
+        mav=tuple(mav),
+        volume=False,
+        style="binance",
+        title=title,
+        returnfig=True,
+        figsize=(10, 5),
+        tight_layout=True,
+    )
+    return _png(fig, 160)
+
+
+# ===== FIBONACCI CHART =====
+def fibonacci_levels(df):
+    high = df["high"].max()
+    low = df["low"].min()
+    diff = high - low
+    levels = {
+        "0.236": high - diff * 0.236,
+        "0.382": high - diff * 0.382,
+        "0.5":   high - diff * 0.5,
+        "0.618": high - diff * 0.618,
+        "0.786": high - diff * 0.786,
+    }
+    return high, low, levels
+
+
+def render_fibo(df, title=""):
+    """Candles + BUY/SELL Fibonacci retracement lines (main.py /now)."""
+    high, low, levels = fibonacci_levels(df)
+
+    mc = mpf.make_marketcolors(up="g", down="r", inherit=True)
+    s  = mpf.make_mpf_style(marketcolors=mc)
+    fig, ax = mpf.plot(
+        df, type="candle", style=s, figsize=(10,5),
+        returnfig=True, title=title
+    )
+
+    x_last = len(df) - 1  # mplfinance x axis is the candle number
+    for label, lvl in levels.items():
+        if lvl < (high + low)/2:  # support (buy)
+            ax[0].axhline(lvl, color="green", linestyle="--", alpha=0.8)
+            ax[0].text(x_last, lvl, f" BUY {label}", color="green")
+        else:  # resistance (sell)
+            ax[0].axhline(lvl, color="red", linestyle="--", alpha=0.8)
+            ax[0].text(x_last, lvl, f" SELL {label}", color="red")
+
+    return _png(fig, 150)
+
+
+# ===== S/R + FIB + RSI/MACD CHART =====
+def pick_sr_from_swings(highs_vals, lows_vals):
+    support = min(lows_vals) if lows_vals else None
+    resistance = max(highs_vals) if highs_vals else None
+    return support, resistance
+
+
+def fib_levels(support, resistance):
+    low = support
+    high = resistance
+    diff = high - low
+    retr = {
+        "0.0": high,
+        "0.236": high - diff * 0.236,
+        "0.382": high - diff * 0.382,
+        "0.5": high - diff * 0.5,
+        "0.618": high - diff * 0.618,
+        "1.0": low
+    }
+    ext = {
+        "1.272": high + diff * 0.272,
+        "1.618": high + diff * 0.618
+    }
+    return retr, ext
+
+
+def render_sr_fib(df, title=None, swing_win=5, indicators=None):
+    """Candles + MA/RSI/MACD panels + swing S/R + Fib (m....ain.py /chart).
+
+    indicators: dict of arrays aligned with ``df`` -- ma_fast, ma_slow, rsi,
+    macd, macd_signal, macd_hist -- computed by the caller.
+    """
+    plot_df = df.rename(columns={"open":"Open","high":"High","low":"Low","close":"Close","volume":"Volume"})
+    ind = {k: pd.Series(v, index=plot_df.index) for k, v in indicators.items()}
+
+    highs = plot_df["High"].to_numpy()
+    lows = plot_df["Low"].to_numpy()
+    highs_sw, lows_sw = find_swings(highs, lows, window=swing_win)
+    support, resistance = pick_sr_from_swings(highs_sw, lows_sw)
+
+    retr, ext = {}, {}
+    if support is not None and resistance is not None and support < resistance:
+        retr, ext = fib_levels(support, resistance)
+
+    addplots = [
+        mpf.make_addplot(ind["ma_fast"], color='tab:blue'),
+        mpf.make_addplot(ind["ma_slow"], color='tab:red'),
+        mpf.make_addplot(ind["rsi"], panel=1, ylabel='RSI'),
+        mpf.make_addplot(ind["macd"], panel=2, color='fuchsia'),
+        mpf.make_addplot(ind["macd_signal"], panel=2, color='green'),
+        mpf.make_addplot(ind["macd_hist"], type='bar', panel=2, color='dimgray', width=0.7)
+    ]
+
+    fig, axes = mpf.plot(plot_df, type='candle', style='binance',
+                         addplot=addplots, volume=False, returnfig=True,
+                         figsize=(12,9), tight_layout=True, panel_ratios=(6,2,2),
+                         warn_too_much_data=len(plot_df) + 1)  # long history windows are intentional
+
+    ax_main = axes[0]
+    # mplfinance plots candles at x = 0 .. n-1 (show_nontrading=False), not at the timestamps
+    x0, x1 = 0, len(plot_df) - 1
+
+    # draw S/R lines
+    if support is not None:
+        ax_main.hlines(support, x0, x1, colors='green', linestyles='--', linewidth=1.2, alpha=0.9)
+        ax_main.text(x1, support, f"  S {support:.6f}", color='green', fontsize=8, ha='right', va='bottom')
+    if resistance is not None:
+        ax_main.hlines(resistance, x0, x1, colors='red', linestyles='--', linewidth=1.2, alpha=0.9)
+        ax_main.text(x1, resistance, f"  R {resistance:.6f}", color='red', fontsize=8, ha='right', va='bottom')
+
+    # draw fib retracement lines
+    if retr:
+        colors = {'0.236':'#cc9900','0.382':'#cc6600','0.5':'#888888','0.618':'#009900'}
+        for k,v in retr.items():
+            ax_main.hlines(v, x0, x1, colors=colors.get(k,'#999999'), linestyles=':', linewidth=1)
+            ax_main.text(x1, v, f" {k} {v:.6f}", color=colors.get(k,'#999999'), fontsize=7, ha='right', va='bottom')
+
+    # fib extension (sell zone)
+    if ext and "1.618" in ext:
+        ax_main.hlines(ext["1.618"], x0, x1, colors='purple', linestyles='-.', linewidth=1.2)
+        ax_main.text(x1, ext["1.618"], f"  EXT 1.618 {ext['1.618']:.6f}", color='purple', fontsize=8, ha='right', va='bottom')
+
+    if title:
+        ax_main.set_title(title)
+
+    return _png(fig, 150)
+
+
+# ===== DISPATCH =====
+RENDERERS = {
+    "ma": render_ma,
+    "fibo": render_fibo,
+    "sr_fib": render_sr_fib,
+}
+
+
+def render(kind, df, engine=None, **options):
+    if (engine or CHART_ENGINE) == "fast":
+        import fast_charts
+        return fast_charts.RENDERERS[kind](df, **options)
+    return RENDERERS[kind](df, **options)
+
+
+def render_timed(kind, df, **options):
+    """(image, render_s, encode_s): figure building vs rasterize + encode."""
+    _timing.encode = 0.0
+    t0 = time.perf_counter()
+    png = render(kind, df, **options)
+    total = time.perf_counter() - t0
+    return png, total - _timing.encode, _timing.encode
+
+
+def render_packed(kind, arrays, options):
+    """Worker-side entry point: arrays from pack_ohlc -> render_timed result."""
+    return render_timed(kind, unpack_ohlc(arrays), **options)
+
+
+def prewarm():
+    """Render a throwaway chart so fonts, styles and caches are loaded."""
+    n = 30
+    c = np.linspace(100, 110, n)
+    idx = pd.date_range("2024-01-01", periods=n, freq="h", name="open_time")
+    df = pd.DataFrame({"open": c, "high": c + 1, "low": c - 1, "close": c, "volume": 1.0}, index=idx)
+    render_ma(df, title="warmup", mav=(5, 10))
+    if CHART_ENGINE == "fast":
+        import fast_charts
+        fast_charts.prewarm()
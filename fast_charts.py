@@ -0,0 +1,398 @@
+"""Direct-Agg chart renderers: the charts of ``charts`` without mplfinance.
+
+Each chart kind owns one Figure on a FigureCanvasAgg with a fixed layout
+(no tight_layout), built once per process. A render removes the artists of
+the previous call, draws the candles as one PolyCollection (bodies) plus
+one LineCollection (wicks) and the indicator lines with ``Axes.plot``; the
+Agg renderer and its pixel buffer are reused because the size never
+changes. matplotlib's axis machinery and text layout were most of the time
+left after dropping mplfinance, so the axes are switched off: grid lines
+are drawn from precomputed tick positions, and every label (ticks, S/R
+values, titles) is written onto the finished buffer with PIL, with rendered
+glyph masks cached. Figures are shared, so renders of one kind take turns.
+
+Select with ``charts.render(kind, df, engine="fast")`` or CHART_ENGINE=fast.
+"""
+import math
+import time
+import threading
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from matplotlib import font_manager
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba, to_rgb
+from matplotlib.patches import Rectangle
+from matplotlib.ticker import MaxNLocator
+from matplotlib.transforms import blended_transform_factory
+
+from swings import find_swings
+from charts import _rgb, _timing, chart_dpi, encode, fibonacci_levels, pick_sr_from_swings, fib_levels
+
+# look of the mplfinance styles the mpf renderers use ("binance" and the default)
+BINANCE = {"up": "#70a800", "down": "#ea0070", "alpha": 0.9, "grid": "#d0d0d0", "edge": "#e6e6e6",
+           "edge_width": 1.5, "text": "#262626", "fontsize": 12, "ylabel_bold": True,
+           "mav": ("#ffc201", "#ff10ff", "#cd0468", "#1f77b4")}
+CLASSIC = {"up": "g", "down": "r", "alpha": 1.0, "grid": None, "edge": "black", "edge_width": 1.0,
+           "text": "black", "fontsize": 10, "ylabel_bold": False}
+XTICKS = 10
+_ANCHOR = {"left": "l", "center": "m", "right": "r", "top": "t", "bottom": "d", "baseline": "s"}
+
+
+# ===== TEXT =====
+class _Glyphs:
+    """Label masks rendered with PIL, cached by (text, size, bold, rotation)."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._fonts = {}
+        self._masks = {}
+        self._lock = threading.Lock()
+
+    def font(self, size_px, bold=False):
+        key = (size_px, bold)
+        f = self._fonts.get(key)
+        if f is None:
+            path = font_manager.findfont(font_manager.FontProperties(
+                family="DejaVu Sans", weight="bold" if bold else "normal"))
+            f = self._fonts[key] = ImageFont.truetype(path, size_px)
+        return f
+
+    def mask(self, text, size_px, bold, rotation, anchor):
+        """(L-mode mask, (dx, dy)) with the anchor point at mask offset (dx, dy)."""
+        key = (text, size_px, bold, rotation, anchor)
+        with self._lock:
+            hit = self._masks.get(key)
+        if hit is not None:
+            return hit
+        font = self.font(size_px, bold)
+        left, top, right, bottom = font.getbbox(text, anchor=anchor)
+        img = Image.new("L", (right - left + 2, bottom - top + 2), 0)
+        ImageDraw.Draw(img).text((1 - left, 1 - top), text, fill=255, font=font, anchor=anchor)
+        ax, ay = 1 - left, 1 - top  # where the anchor point sits in img
+        if rotation:
+            w, h = img.size
+            img = img.rotate(rotation, resample=Image.BICUBIC, expand=True)
+            # PIL rotates counter-clockwise about the centre; follow the anchor point
+            rad = math.radians(rotation)
+            dx, dy = ax - w / 2, ay - h / 2
+            ax = img.size[0] / 2 + math.cos(rad) * dx + math.sin(rad) * dy
+            ay = img.size[1] / 2 - math.sin(rad) * dx + math.cos(rad) * dy
+        hit = (img, (ax, ay))
+        with self._lock:
+            if len(self._masks) >= self.maxsize:
+                self._masks.clear()
+            self._masks[key] = hit
+        return hit
+
+
+_glyphs = _Glyphs()
+
+
+# ===== LAYOUT =====
+class _Layout:
+    """A figure built once; ``axes`` stay, ``artists`` and ``labels`` are per render."""
+
+    def __init__(self, figsize, dpi, rects, style, ylabels=()):
+        self.fig = Figure(figsize=figsize, dpi=chart_dpi(figsize, dpi), facecolor="white")
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.width, self.height = self.canvas.get_width_height()
+        self.style = style
+        self.axes = []
+        self.artists = []
+        self.static_labels = []
+        self.labels = []
+        self.lock = threading.Lock()
+        for i, rect in enumerate(rects):
+            ax = self.fig.add_axes(rect)
+            ax.set_axis_off()
+            ax.add_patch(Rectangle((0, 0), 1, 1, transform=ax.transAxes, fill=False, clip_on=False,
+                                   edgecolor=style["edge"], linewidth=style["edge_width"], zorder=3))
+            self.axes.append(ax)
+            if i < len(ylabels) and ylabels[i]:
+                left, bottom, _w, height = rect
+                self.static_labels.append(self._label(
+                    (left - 0.075 * 10 / figsize[0]) * self.width, (bottom + height / 2) * self.height,
+                    ylabels[i], style["fontsize"], style["text"], rotation=90, bold=style["ylabel_bold"]))
+
+    def _label(self, x, y, text, size_pt, color, ha="center", va="center", rotation=0, bold=False):
+        # display coords (origin bottom left) -> PIL pixel coords
+        size_px = max(1, round(size_pt * self.fig.dpi / 72))
+        rgb = tuple(round(v * 255) for v in to_rgb(color))
+        return (x, self.height - y, text, size_px, rgb, _ANCHOR[ha] + _ANCHOR[va], rotation, bold)
+
+    def text(self, ax, x, y, text, size_pt, color, coords="data", **kw):
+        """Queue a label at (x, y) in ``coords``: "data", "axes", "xaxes" (axes x, data y)
+        or "yaxes" (data x, axes y). Labels outside the axes vertically are dropped."""
+        trans = {"data": ax.transData, "axes": ax.transAxes,
+                 "xaxes": blended_transform_factory(ax.transAxes, ax.transData),
+                 "yaxes": blended_transform_factory(ax.transData, ax.transAxes)}[coords]
+        px, py = trans.transform((x, y))
+        if coords in ("data", "xaxes"):
+            bottom, top = ax.transAxes.transform([(0, 0), (0, 1)])[:, 1]
+            if not bottom - 0.5 <= py <= top + 0.5:
+                return
+        self.labels.append(self._label(px, py, text, size_pt, color, **kw))
+
+    def title(self, y, text, size_pt, bold=False):
+        if text:
+            self.labels.append(self._label(self.width / 2, y * self.height, text, size_pt,
+                                           self.style["text"], va="top", bold=bold))
+
+    def add(self, artist):
+        self.artists.append(artist)
+        return artist
+
+    def reset(self):
+        for artist in self.artists:
+            artist.remove()
+        self.artists = []
+        self.labels = []
+
+    def png(self):
+        self.canvas.draw()
+        img = _rgb(self.canvas)
+        for x, y, text, size_px, rgb, anchor, rotation, bold in self.static_labels + self.labels:
+            mask, (ax, ay) = _glyphs.mask(text, size_px, bold, rotation, anchor)
+            img.paste(rgb, (round(x - ax), round(y - ay)), mask)
+        t0 = time.perf_counter()
+        out = encode(img)
+        _timing.encode = time.perf_counter() - t0
+        return out
+
+
+_layouts = {}
+_layouts_lock = threading.Lock()
+
+
+def _layout(kind):
+    with _layouts_lock:
+        lay = _layouts.get(kind)
+        if lay is None:
+            lay = _layouts[kind] = LAYOUTS[kind]()
+        return lay
+
+
+# ===== DRAWING =====
+def _candles(lay, ax, o, h, l, c, width=0.6):
+    style = lay.style
+    n = len(c)
+    x = np.arange(n, dtype=np.float64)
+    up = (c >= o)[:, None]
+    colors = np.where(up, to_rgba(style["up"], style["alpha"]), to_rgba(style["down"], style["alpha"]))
+
+    wicks = np.empty((n, 2, 2))
+    wicks[:, 0, 0] = wicks[:, 1, 0] = x
+    wicks[:, 0, 1], wicks[:, 1, 1] = l, h
+    lay.add(ax.add_collection(LineCollection(wicks, colors=colors, linewidths=0.8 if n < 400 else 0.5),
+                              autolim=False))
+
+    half = width / 2
+    bodies = np.empty((n, 4, 2))
+    bodies[:, 0, 0] = bodies[:, 1, 0] = x - half
+    bodies[:, 2, 0] = bodies[:, 3, 0] = x + half
+    bodies[:, 0, 1] = bodies[:, 3, 1] = o
+    bodies[:, 1, 1] = bodies[:, 2, 1] = c
+    lay.add(ax.add_collection(PolyCollection(bodies, facecolors=colors, edgecolors=colors, linewidths=0.5),
+                              autolim=False))
+    return np.nanmin(l), np.nanmax(h)
+
+
+def _bars(lay, ax, y, color, width=0.7):
+    n = len(y)
+    x = np.arange(n, dtype=np.float64)
+    y = np.nan_to_num(y)
+    half = width / 2
+    verts = np.empty((n, 4, 2))
+    verts[:, 0, 0] = verts[:, 1, 0] = x - half
+    verts[:, 2, 0] = verts[:, 3, 0] = x + half
+    verts[:, 0, 1] = verts[:, 3, 1] = 0.0
+    verts[:, 1, 1] = verts[:, 2, 1] = y
+    lay.add(ax.add_collection(PolyCollection(verts, facecolors=color, linewidths=0), autolim=False))
+
+
+def _line(lay, ax, y, color, lw=1.5):
+    lay.add(ax.plot(np.arange(len(y)), y, color=color, linewidth=lw, scalex=False, scaley=False)[0])
+
+
+def _level(lay, ax, y, label, color, linestyle, lw=1.2, fontsize=8, alpha=1.0):
+    trans = blended_transform_factory(ax.transAxes, ax.transData)
+    lay.add(ax.plot((0, 1), (y, y), transform=trans, color=color, linestyle=linestyle, linewidth=lw,
+                    alpha=alpha, scalex=False, scaley=False)[0])
+    lay.text(ax, 0.995, y, label, fontsize, color, coords="xaxes", ha="right", va="bottom")
+
+
+def _span(*series):
+    vals = np.concatenate([np.asarray(s, dtype=np.float64).ravel() for s in series])
+    vals = vals[np.isfinite(vals)]
+    return (vals.min(), vals.max()) if len(vals) else (0.0, 1.0)
+
+
+def _decimals(step):
+    d = 0
+    while d < 12 and abs(step * 10 ** d - round(step * 10 ** d)) > 1e-6:
+        d += 1
+    return d
+
+
+def _yaxis(lay, ax, lo, hi, nbins=6):
+    """Set the y range (5% margin), draw its grid lines and queue tick labels."""
+    style = lay.style
+    pad = (hi - lo) * 0.05 or abs(hi) * 0.01 or 1.0
+    lo, hi = lo - pad, hi + pad
+    ax.set_ylim(lo, hi)
+    ticks = [t for t in MaxNLocator(nbins=nbins).tick_values(lo, hi) if lo <= t <= hi]
+    if not ticks:
+        return
+    d = _decimals(ticks[1] - ticks[0]) if len(ticks) > 1 else 0
+    if style["grid"]:
+        trans = blended_transform_factory(ax.transAxes, ax.transData)
+        lay.add(ax.add_collection(LineCollection([((0, t), (1, t)) for t in ticks], transform=trans,
+                                                 colors=style["grid"], linestyles="--", linewidths=0.8,
+                                                 zorder=0.5), autolim=False))
+    for t in ticks:
+        lay.text(ax, -0.01, t, f"{t:.{d}f}", style["fontsize"], style["text"], coords="xaxes",
+                 ha="right", va="center")
+
+
+def _xaxis(lay, index):
+    """x range and grid for every panel, date labels under the bottom one."""
+    style = lay.style
+    n = len(index)
+    pos = np.unique(np.linspace(0, n - 1, min(XTICKS, n)).round().astype(int))
+    for ax in lay.axes:
+        ax.set_xlim(-1, n)
+        if style["grid"]:
+            trans = blended_transform_factory(ax.transData, ax.transAxes)
+            lay.add(ax.add_collection(LineCollection([((p, 0), (p, 1)) for p in pos], transform=trans,
+                                                     colors=style["grid"], linestyles="--", linewidths=0.8,
+                                                     zorder=0.5), autolim=False))
+    bottom = lay.axes[-1]
+    for p, label in zip(pos, index[pos].strftime("%b %d, %H:%M")):
+        lay.text(bottom, p, -0.02, label, style["fontsize"], style["text"], coords="yaxes",
+                 ha="right", va="top", rotation=45)
+
+
+def _sma(close, window):
+    out = np.full(len(close), np.nan)
+    if 0 < window <= len(close):
+        cs = np.cumsum(np.insert(close, 0, 0.0))
+        out[window - 1:] = (cs[window:] - cs[:-window]) / window
+    return out
+
+
+def _ohlc(df):
+    return tuple(df[f].to_numpy(dtype=np.float64) for f in ("open", "high", "low", "close"))
+
+
+# ===== CHARTS =====
+def _ma_layout():
+    return _Layout((10, 5), 160, [(0.11, 0.2, 0.865, 0.77)], BINANCE, ylabels=("Price",))
+
+
+def render_ma(df, title="", mav=(50, 200)):
+    """Candles + moving averages, like charts.render_ma."""
+    o, h, l, c = _ohlc(df)
+    lay = _layout("ma")
+    with lay.lock:
+        lay.reset()
+        ax = lay.axes[0]
+        _xaxis(lay, df.index)
+        _yaxis(lay, ax, *_candles(lay, ax, o, h, l, c))
+        for i, w in enumerate(mav):
+            _line(lay, ax, _sma(c, int(w)), BINANCE["mav"][i % len(BINANCE["mav"])], lw=1.0)
+        lay.title(0.95, title, 18, bold=True)
+        return lay.png()
+
+
+def _fibo_layout():
+    return _Layout((10, 5), 150, [(0.18, 0.18, 0.72, 0.70)], CLASSIC, ylabels=("Price",))
+
+
+def render_fibo(df, title=""):
+    """Candles + BUY/SELL Fibonacci retracement lines, like charts.render_fibo."""
+    high, low, levels = fibonacci_levels(df)
+    lay = _layout("fibo")
+    with lay.lock:
+        lay.reset()
+        ax = lay.axes[0]
+        _xaxis(lay, df.index)
+        _yaxis(lay, ax, *_candles(lay, ax, *_ohlc(df)))
+        for label, lvl in levels.items():
+            if lvl < (high + low) / 2:  # support (buy)
+                _level(lay, ax, lvl, f"BUY {label}", "green", "--", lw=1.5, fontsize=9, alpha=0.8)
+            else:  # resistance (sell)
+                _level(lay, ax, lvl, f"SELL {label}", "red", "--", lw=1.5, fontsize=9, alpha=0.8)
+        lay.title(0.99, title, 12)
+        return lay.png()
+
+
+def _sr_fib_layout():
+    # panel_ratios (6, 2, 2) between y=0.12 and y=0.96
+    left, width, bottom, height = 0.11, 0.865, 0.12, 0.84
+    unit = height / 10
+    rects = [(left, bottom + 4 * unit, width, 6 * unit),
+             (left, bottom + 2 * unit, width, 2 * unit),
+             (left, bottom, width, 2 * unit)]
+    return _Layout((12, 9), 150, rects, BINANCE, ylabels=("Price", "RSI"))
+
+
+def render_sr_fib(df, title=None, swing_win=5, indicators=None):
+    """Candles + MA/RSI/MACD panels + swing S/R + Fib, like charts.render_sr_fib."""
+    o, h, l, c = _ohlc(df)
+    highs_sw, lows_sw = find_swings(h, l, window=swing_win)
+    support, resistance = pick_sr_from_swings(highs_sw, lows_sw)
+    retr, ext = {}, {}
+    if support is not None and resistance is not None and support < resistance:
+        retr, ext = fib_levels(support, resistance)
+    ind = {k: np.asarray(v, dtype=np.float64) for k, v in indicators.items()}
+
+    lay = _layout("sr_fib")
+    with lay.lock:
+        lay.reset()
+        ax_main, ax_rsi, ax_macd = lay.axes
+        _xaxis(lay, df.index)
+        _yaxis(lay, ax_main, *_candles(lay, ax_main, o, h, l, c))
+        _line(lay, ax_main, ind["ma_fast"], "tab:blue")
+        _line(lay, ax_main, ind["ma_slow"], "tab:red")
+
+        if support is not None:
+            _level(lay, ax_main, support, f"S {support:.6f}", "green", "--")
+        if resistance is not None:
+            _level(lay, ax_main, resistance, f"R {resistance:.6f}", "red", "--")
+        colors = {"0.236": "#cc9900", "0.382": "#cc6600", "0.5": "#888888", "0.618": "#009900"}
+        for k, v in retr.items():
+            if v in (support, resistance):  # 0 and 1 are the S/R lines themselves
+                continue
+            _level(lay, ax_main, v, f"{k} {v:.6f}", colors.get(k, "#999999"), ":", lw=1, fontsize=7)
+        if "1.618" in ext:
+            _level(lay, ax_main, ext["1.618"], f"EXT 1.618 {ext['1.618']:.6f}", "purple", "-.")
+
+        _line(lay, ax_rsi, ind["rsi"], "tab:blue")
+        _yaxis(lay, ax_rsi, *_span(ind["rsi"]), nbins=3)
+        _bars(lay, ax_macd, ind["macd_hist"], "dimgray")
+        _line(lay, ax_macd, ind["macd"], "fuchsia")
+        _line(lay, ax_macd, ind["macd_signal"], "green")
+        _yaxis(lay, ax_macd, *_span(ind["macd"], ind["macd_signal"], ind["macd_hist"]), nbins=3)
+
+        lay.title(0.995, title, 16)
+        return lay.png()
+
+
+LAYOUTS = {"ma": _ma_layout, "fibo": _fibo_layout, "sr_fib": _sr_fib_layout}
+RENDERERS = {"ma": render_ma, "fibo": render_fibo, "sr_fib": render_sr_fib}
+
+
+def prewarm():
+    """Build every layout and draw it once (fonts, Agg buffers)."""
+    import pandas as pd
+    n = 30
+    c = np.linspace(100, 110, n)
+    idx = pd.date_range("2024-01-01", periods=n, freq="h", name="open_time")
+    df = pd.DataFrame({"open": c, "high": c + 1, "low": c - 1, "close": c, "volume": 1.0}, index=idx)
+    render_ma(df, title="warmup", mav=(5, 10))
+    render_fibo(df, title="warmup")
+    ind = {k: c for k in ("ma_fast", "ma_slow", "rsi", "macd", "macd_signal", "macd_hist")}
+    render_sr_fib(df, title="warmup", indicators=ind)
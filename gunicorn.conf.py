@@ -0,0 +1,49 @@
+"""gunicorn settings for main.py (Procfile: gunicorn -c gunicorn.conf.py main:app).
+
+Every worker serves the webhook; the shared cache lets them reuse each
+other's klines and charts, and the leader lease picks the one worker that
+runs auto_loop / the kline stream / setWebhook (another takes over within
+LEADER_TTL seconds if it dies). Binance weight and Telegram rates are
+split evenly between the workers, and /metrics sums all of them.
+``python main.py`` still runs everything in one process with none of this.
+"""
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", 4))
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+graceful_timeout = 10
+
+# read by shared_cache / leader / metrics when the workers import main
+_run_dir = os.getenv("RUN_DIR", tempfile.gettempdir())
+os.environ.setdefault("SHARED_CACHE", os.path.join(_run_dir, "autocut-cache.sqlite"))
+os.environ.setdefault("LEADER_DB", os.path.join(_run_dir, "autocut-leader.sqlite"))
+os.environ.setdefault("METRICS_DB", os.path.join(_run_dir, "autocut-metrics.sqlite"))
+
+
+def _per_worker(name, default):
+    # the limiters are per process: give each worker its share of the
+    # whole-service value (kept in <name>_TOTAL so a config reload does not divide twice)
+    total = float(os.environ.setdefault(f"{name}_TOTAL", os.getenv(name, str(default))))
+    os.environ[name] = str(total / workers)
+
+
+_per_worker("BINANCE_WEIGHT_BUDGET", 0.8)  # binance_client: share of the IP weight limit
+_per_worker("TG_GLOBAL_RATE", 25)          # telegram_outbox: messages/s for the whole bot
+_per_worker("TG_CHAT_RATE", 1)             # telegram_outbox: messages/s per chat
+_per_worker("TG_GROUP_RATE", 20 / 60)      # telegram_outbox: messages/s per group
+
+
+def post_worker_init(worker):
+    import main
+    main.start_background()
+
+
+def worker_exit(server, worker):
+    import main
+    main.metrics.flush()  # last counts of this worker stay in the totals
+    if main.lease is not None:
+        main.lease.release()  # successor does not wait for the lease to expire
@@ -0,0 +1,59 @@
+"""Shared keep-alive HTTP sessions for the Binance and Telegram APIs.
+
+One ``requests.Session`` per scheme+host with a pooled adapter, so alerts and
+replies reuse open TCP/TLS connections instead of handshaking on every call.
+Calls without an explicit timeout get HTTP_TIMEOUT.
+"""
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 20))
+# metrics stage per API host: market data in, replies/charts out
+STAGE_BY_HOST = {"api.binance.com": "fetch", "api.telegram.org": "upload"}
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def session_for(url):
+    """Pooled session for the host of ``url``."""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    s = _sessions.get(key)
+    if s is None:
+        with _lock:
+            s = _sessions.get(key)
+            if s is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+                s.mount(key, adapter)
+                s.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+                _sessions[key] = s
+    return s
+
+
+def request(method, url, timeout=None, **kwargs):
+    with metrics.timer(STAGE_BY_HOST.get(urlsplit(url).netloc, "http")):
+        return session_for(url).request(method, url, timeout=timeout or HTTP_TIMEOUT, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def close_all():
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
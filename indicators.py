@@ -0,0 +1,241 @@
+"""SMA / EMA / Wilder RSI / MACD, full-series and incremental.
+
+The full-series functions are the pandas formulas the charts have always
+used. ``IndicatorEngine`` produces the same numbers one candle at a time in
+O(1): appending a candle advances every indicator, and re-sending the
+still-open candle (same key) revises the last value instead of appending.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ===== FULL SERIES (pandas) =====
+def sma(close, n):
+    return close.rolling(n).mean()
+
+
+def ema(close, span):
+    return close.ewm(span=span, adjust=False).mean()
+
+
+def rsi_wilder(close, period=14):
+    delta = close.diff()
+    up = delta.clip(lower=0)
+    down = -delta.clip(upper=0)
+    ma_up = up.ewm(alpha=1/period, adjust=False).mean()
+    ma_down = down.ewm(alpha=1/period, adjust=False).mean()
+    rs = ma_up / ma_down.replace(0, np.nan)
+    return 100 - (100 / (1 + rs))
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    macd_line = ema(close, fast) - ema(close, slow)
+    macd_sig = macd_line.ewm(span=signal, adjust=False).mean()
+    return macd_line, macd_sig, macd_line - macd_sig
+
+
+# ===== INCREMENTAL PRIMITIVES =====
+class _SMA:
+    def __init__(self, n):
+        self.n = n
+        self.buf = np.zeros(n)
+        self.sum = 0.0
+        self.count = 0
+        self._undo = None
+
+    def push(self, x):
+        slot = self.count % self.n
+        self._undo = (slot, self.buf[slot], self.sum, self.count)
+        old = self.buf[slot] if self.count >= self.n else 0.0
+        self.buf[slot] = x
+        self.sum += x - old
+        self.count += 1
+        if self.count % self.n == 0:
+            self.sum = float(self.buf.sum())  # amortised resync against drift
+        return self.sum / self.n if self.count >= self.n else np.nan
+
+    def revise(self, x):
+        slot, val, self.sum, self.count = self._undo
+        self.buf[slot] = val
+        return self.push(x)
+
+
+class _EMA:
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = None
+        self._undo = None
+
+    def push(self, x):
+        self._undo = self.value
+        self.value = x if self.value is None else (1 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+    def revise(self, x):
+        self.value = self._undo
+        return self.push(x)
+
+
+class _RSI:
+    def __init__(self, period):
+        self.up = _EMA(1 / period)
+        self.down = _EMA(1 / period)
+        self.prev = None
+        self._undo = None
+
+    def _step(self, x):
+        if self.prev is None:
+            self.prev = x
+            return np.nan
+        delta = x - self.prev
+        self.prev = x
+        mu = self.up.push(max(delta, 0.0))
+        md = self.down.push(max(-delta, 0.0))
+        if md == 0:
+            return np.nan
+        return 100 - 100 / (1 + mu / md)
+
+    def push(self, x):
+        self._undo = (self.prev, self.up.value, self.down.value)
+        return self._step(x)
+
+    def revise(self, x):
+        self.prev, self.up.value, self.down.value = self._undo
+        return self._step(x)
+
+
+class _Series:
+    """Bounded output history, double-written so views are contiguous."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = np.full(2 * capacity, np.nan)
+        self.head = 0
+        self.size = 0
+
+    def append(self, v):
+        self.buf[self.head] = self.buf[self.head + self.capacity] = v
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def set_last(self, v):
+        i = (self.head - 1) % self.capacity
+        self.buf[i] = self.buf[i + self.capacity] = v
+
+    def tail(self, n=None):
+        n = self.size if n is None else min(n, self.size)
+        stop = self.head + self.capacity
+        return self.buf[stop - n:stop]
+
+
+# ===== ENGINE =====
+class IndicatorEngine:
+    """Stateful SMA/RSI/MACD for one (symbol, interval) close series.
+
+    Output names: ``sma<n>`` for each SMA period, ``rsi``, ``macd``,
+    ``macd_signal`` and ``macd_hist``.
+    """
+
+    def __init__(self, sma_periods=(50, 200), rsi_period=14, macd_spans=(12, 26, 9), capacity=1000):
+        self.sma_periods = tuple(sma_periods)
+        self.rsi_period = rsi_period
+        self.macd_spans = tuple(macd_spans)
+        self.capacity = capacity
+        self.names = [f"sma{n}" for n in self.sma_periods] + ["rsi", "macd", "macd_signal", "macd_hist"]
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._sma = {f"sma{n}": _SMA(n) for n in self.sma_periods}
+            self._rsi = _RSI(self.rsi_period)
+            fast, slow, sig = self.macd_spans
+            self._ema_fast = _EMA(2 / (fast + 1))
+            self._ema_slow = _EMA(2 / (slow + 1))
+            self._signal = _EMA(2 / (sig + 1))
+            self._out = {name: _Series(self.capacity) for name in self.names}
+            self.first_key = None
+            self.last_key = None
+            self.count = 0
+
+    def _compute(self, x, revise):
+        op = "revise" if revise else "push"
+        vals = {name: getattr(ind, op)(x) for name, ind in self._sma.items()}
+        vals["rsi"] = getattr(self._rsi, op)(x)
+        line = getattr(self._ema_fast, op)(x) - getattr(self._ema_slow, op)(x)
+        sig = getattr(self._signal, op)(line)
+        vals.update(macd=line, macd_signal=sig, macd_hist=line - sig)
+        return vals
+
+    def update(self, key, close):
+        """Apply one candle; a repeated ``key`` revises the last candle."""
+        close = float(close)
+        with self._lock:
+            if self.last_key is not None and key == self.last_key:
+                for name, v in self._compute(close, True).items():
+                    self._out[name].set_last(v)
+            elif self.last_key is None or key > self.last_key:
+                for name, v in self._compute(close, False).items():
+                    self._out[name].append(v)
+                if self.first_key is None:
+                    self.first_key = key
+                self.last_key = key
+                self.count += 1
+            # older candles are ignored
+
+    def feed(self, keys, closes):
+        """Sync with a candle window; only the new tail is processed.
+
+        EMA/RSI are seeded at the first candle and SMAs need ``n`` candles, so
+        the results equal the full formulas over ``keys`` only if the engine
+        started at the same candle. If the window starts elsewhere (a shorter
+        or slid window) or does not contain ``last_key`` (first call or a
+        gap), the engine restarts from the window.
+        """
+        keys = np.asarray(keys)
+        closes = np.asarray(closes, dtype=np.float64)
+        if not len(keys):
+            return self
+        with self._lock:
+            start = 0
+            if self.last_key is not None:
+                i = int(np.searchsorted(keys, self.last_key))
+                # the retained history must also cover the window before last_key
+                if (keys[0] == self.first_key and i < len(keys) and keys[i] == self.last_key
+                        and self._out["rsi"].size > i):
+                    start = i
+                else:
+                    self.reset()
+            for k, c in zip(keys[start:].tolist(), closes[start:].tolist()):
+                self.update(k, c)
+        return self
+
+    def latest(self, name):
+        s = self._out[name]
+        return s.tail(1)[0] if s.size else np.nan
+
+    def history(self, name, n=None):
+        """Last ``n`` values (all retained when None), oldest first."""
+        return self._out[name].tail(n).copy()
+
+
+# ===== REGISTRY =====
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+MAX_ENGINES = int(os.getenv("INDICATOR_MAX_ENGINES", 128))
+
+
+def indicator_engine(symbol, interval, **kw):
+    """Shared IndicatorEngine per (symbol, interval), LRU-bounded."""
+    key = (symbol.upper(), interval)
+    with _engines_lock:
+        eng = _engines.get(key)
+        if eng is None:
+            eng = _engines[key] = IndicatorEngine(**kw)
+            while len(_engines) > MAX_ENGINES:
+                _engines.popitem(last=False)
+        _engines.move_to_end(key)
+        return eng
@@ -0,0 +1,183 @@
+"""Process-wide kline cache shared by the bot entry points.
+
+Entries are keyed by (symbol, interval, limit) and live until the current
+candle of that interval closes, so every caller inside the same candle gets
+the same data and only the first one goes to Binance. With SHARED_CACHE set
+(several gunicorn workers) a miss also looks in ``shared_cache`` before
+fetching, so one worker's fetch serves the others too.
+"""
+import os
+import time
+import threading
+import calendar
+from collections import OrderedDict
+
+from shared_cache import shared_cache
+
+# ===== INTERVALS =====
+_MINUTE = 60_000
+INTERVAL_MS = {
+    "1m": _MINUTE, "3m": 3 * _MINUTE, "5m": 5 * _MINUTE, "15m": 15 * _MINUTE,
+    "30m": 30 * _MINUTE, "1h": 60 * _MINUTE, "2h": 120 * _MINUTE,
+    "4h": 240 * _MINUTE, "6h": 360 * _MINUTE, "8h": 480 * _MINUTE,
+    "12h": 720 * _MINUTE, "1d": 1440 * _MINUTE, "3d": 3 * 1440 * _MINUTE,
+    "1w": 7 * 1440 * _MINUTE,
+}
+# Binance weekly candles open on Monday 00:00 UTC, epoch 0 was a Thursday
+_WEEK_OFFSET_MS = 4 * 1440 * _MINUTE
+
+
+def interval_ms(interval):
+    """Length of one candle in ms (``1M`` is not fixed, use next_close_ms)."""
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Invalid timeframe: {interval}")
+    return INTERVAL_MS[interval]
+
+
+def next_close_ms(interval, now_ms=None):
+    """Epoch ms at which the candle that is open at ``now_ms`` closes."""
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    if interval == "1M":
+        t = time.gmtime(now_ms // 1000)
+        year, month = (t.tm_year + 1, 1) if t.tm_mon == 12 else (t.tm_year, t.tm_mon + 1)
+        return calendar.timegm((year, month, 1, 0, 0, 0)) * 1000
+    step = interval_ms(interval)
+    offset = _WEEK_OFFSET_MS if interval == "1w" else 0
+    return ((now_ms - offset) // step + 1) * step + offset
+
+
+# ===== CACHE =====
+class KlineCache:
+    """Thread-safe LRU of kline frames that expire on the next candle close.
+
+    ``max_age`` caps how long the still-open candle may be served stale on
+    long intervals (a 1d entry would otherwise live for up to a day).
+    """
+
+    def __init__(self, maxsize=256, max_age=60, shared=None):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.shared = shared
+        self._data = OrderedDict()  # key -> (expires_ms, value)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+    def _expiry(self, interval, now_ms):
+        expires = next_close_ms(interval, now_ms)
+        if self.max_age:
+            expires = min(expires, now_ms + int(self.max_age * 1000))
+        return expires
+
+    def _lookup(self, symbol, interval, limit, now_ms):
+        # exact key first, then any fresh entry with a wider window
+        key = (symbol, interval, limit)
+        entry = self._data.get(key)
+        if entry and entry[0] > now_ms:
+            self._data.move_to_end(key)
+            return entry[1]
+        for (s, i, lim), (expires, value) in reversed(self._data.items()):
+            if s == symbol and i == interval and lim > limit and expires > now_ms:
+                self._data.move_to_end((s, i, lim))
+                return value.tail(limit) if hasattr(value, "tail") else value[-limit:]
+        return None
+
+    def get(self, symbol, interval, limit):
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            value = self._lookup(symbol, interval, limit, now_ms)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, symbol, interval, limit, value):
+        now_ms = int(time.time() * 1000)
+        key = (symbol, interval, limit)
+        with self._lock:
+            self._data[key] = (self._expiry(interval, now_ms), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_fetch(self, symbol, interval, limit, fetch):
+        """Return cached klines or call ``fetch(symbol, interval, limit)`` once.
+
+        Concurrent misses on the same key wait for the first fetch instead of
+        each hitting Binance.
+        """
+        value = self.get(symbol, interval, limit)
+        if value is not None:
+            return value
+        key = (symbol, interval, limit)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            now_ms = int(time.time() * 1000)
+            with self._lock:
+                value = self._lookup(symbol, interval, limit, now_ms)
+                if value is not None:
+                    # another caller filled it while we waited
+                    self.misses -= 1
+                    self.hits += 1
+            if value is None:
+                value = self._shared_get(symbol, interval, limit)
+                if value is None:
+                    value = fetch(symbol, interval, limit)
+                    self._shared_put(symbol, interval, limit, value)
+                self.put(symbol, interval, limit, value)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def _shared_get(self, symbol, interval, limit):
+        if self.shared is None:
+            return None
+        raw = self.shared.get(f"klines:{symbol}:{interval}:{limit}")
+        if raw is None:
+            return None
+        from kline_parse import frame_from_bytes
+        with self._lock:
+            self.shared_hits += 1
+        return frame_from_bytes(raw)
+
+    def _shared_put(self, symbol, interval, limit, value):
+        if self.shared is None or not hasattr(value, "index"):
+            return
+        from kline_parse import frame_bytes
+        now_ms = int(time.time() * 1000)
+        self.shared.set(f"klines:{symbol}:{interval}:{limit}", frame_bytes(value), self._expiry(interval, now_ms))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "shared_hits": self.shared_hits,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+kline_cache = KlineCache(
+    maxsize=int(os.getenv("KLINE_CACHE_SIZE", 256)),
+    max_age=float(os.getenv("KLINE_CACHE_MAX_AGE", 60)),
+    shared=shared_cache,
+)
+
+
+def cached_klines(symbol, interval, limit, fetch):
+    """Read-through helper used by the entry points' get_klines functions."""
+    return kline_cache.get_or_fetch(symbol.upper(), interval, int(limit), fetch)
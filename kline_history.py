@@ -0,0 +1,306 @@
+"""On-disk, append-only kline history per (symbol, interval).
+
+Each series is a directory with one raw little-endian file per column
+(``open_time.i8``, ``open.f8`` ... ``volume.f8``). Closed candles are only
+ever appended, reads are zero-copy ``np.memmap`` slices, and long history is
+backfilled by paging ``startTime``/``endTime`` 1000 candles at a time. With
+``HISTORY_OFFLINE=1`` nothing is fetched and reads come from disk only, so a
+copied history directory is enough to run charts and S/R without Binance.
+
+    python kline_history.py backfill BTCUSDT 5m 50000
+    python kline_history.py import BTCUSDT 5m klines.json [more.json ...]
+    python kline_history.py info BTCUSDT 5m
+"""
+import os
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import binance_client
+
+from candle_store import BINANCE_KLINES_URL, MAX_LIMIT
+from kline_cache import INTERVAL_MS, next_close_ms
+from kline_parse import FIELDS, parse_klines, klines_frame
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", "data/klines")
+HISTORY_OFFLINE = os.getenv("HISTORY_OFFLINE", "0") == "1"
+HISTORY_MAX_SERIES = int(os.getenv("HISTORY_MAX_SERIES", 256))  # open series kept in the registry
+COLUMNS = (("open_time", np.dtype("<i8")),) + tuple((f, np.dtype("<f8")) for f in FIELDS)
+_MONTH_MS = 31 * 1440 * 60_000
+_SYMBOL = re.compile(r"^[A-Z0-9]{2,20}$")
+
+
+def valid_symbol(symbol):
+    """A plain Binance symbol name, safe to use as a directory name."""
+    return bool(_SYMBOL.match(symbol or ""))
+
+
+def stored(symbol, interval="", root=HISTORY_DIR):
+    """True when history exists for the symbol (or one series of it); no disk writes."""
+    return valid_symbol(symbol) and os.path.isdir(os.path.join(root, symbol, interval))
+
+
+def fetch_kline_page(symbol, interval, start_time, end_time=None, limit=MAX_LIMIT):
+    """One /api/v3/klines page as parse_klines arrays."""
+    params = {"symbol": symbol, "interval": interval, "limit": limit, "startTime": int(start_time)}
+    if end_time is not None:
+        params["endTime"] = int(end_time)
+    r = binance_client.get(BINANCE_KLINES_URL, params=params, timeout=20)
+    r.raise_for_status()
+    return parse_klines(r.content)
+
+
+def _empty():
+    return {name: np.empty(0, dtype) for name, dtype in COLUMNS}
+
+
+def _take(arrays, mask):
+    return {name: arrays[name][mask] for name, _ in COLUMNS}
+
+
+def _closed(interval, open_time, now_ms):
+    """Mask of candles that had closed by ``now_ms``."""
+    if interval in INTERVAL_MS:
+        return open_time + INTERVAL_MS[interval] <= now_ms
+    return np.array([next_close_ms(interval, int(t)) <= now_ms for t in open_time], dtype=bool)
+
+
+class KlineHistory:
+    """Append-only columnar store for one series; thread-safe."""
+
+    def __init__(self, symbol, interval, root=HISTORY_DIR, fetch=fetch_kline_page, offline=None):
+        # both end up as path components: refuse anything but plain names
+        if not valid_symbol(symbol.upper()):
+            raise ValueError(f"invalid symbol: {symbol!r}")
+        if interval not in INTERVAL_MS and interval != "1M":
+            raise ValueError(f"invalid interval: {interval!r}")
+        self.symbol = symbol.upper()
+        self.interval = interval
+        self.path = os.path.join(root, self.symbol, interval)
+        self.fetch = fetch
+        self.offline = HISTORY_OFFLINE if offline is None else offline
+        self._lock = threading.RLock()
+        self._maps = None
+        self._live = _empty()  # still-open candle from the last sync, never persisted
+        os.makedirs(self.path, exist_ok=True)
+        self._repair()
+
+    def _file(self, name, dtype):
+        return os.path.join(self.path, f"{name}.{dtype.kind}{dtype.itemsize}")
+
+    def _rows_on_disk(self, name, dtype):
+        f = self._file(name, dtype)
+        return os.path.getsize(f) // dtype.itemsize if os.path.exists(f) else 0
+
+    def _repair(self):
+        # _prepend swaps open_time in first: value columns shorter than it are
+        # still the old files, so drop the prepended prefix from the others
+        n = self._rows_on_disk(*COLUMNS[0])
+        short = min((self._rows_on_disk(name, dtype) for name, dtype in COLUMNS[1:]
+                     if os.path.exists(self._file(name, dtype))), default=n)
+        if short < n:
+            for name, dtype in COLUMNS:
+                rows = self._rows_on_disk(name, dtype)
+                if rows > short:
+                    f = self._file(name, dtype)
+                    with open(f + ".tmp", "wb") as fh:
+                        fh.write(np.fromfile(f, dtype=dtype)[rows - short:].tobytes())
+                    os.replace(f + ".tmp", f)
+            n = short
+        for name, dtype in COLUMNS:
+            if os.path.exists(self._file(name, dtype) + ".tmp"):
+                os.remove(self._file(name, dtype) + ".tmp")  # from an interrupted _prepend
+        # append writes open_time last, so its length is authoritative after a crash
+        for name, dtype in COLUMNS:
+            f = self._file(name, dtype)
+            if not os.path.exists(f) or self._rows_on_disk(name, dtype) != n:
+                with open(f, "ab") as fh:
+                    fh.truncate(n * dtype.itemsize)
+
+    # ----- reads -----
+    def _columns(self):
+        with self._lock:
+            if self._maps is None:
+                n = self._rows_on_disk(*COLUMNS[0])
+                if n == 0:
+                    self._maps = _empty()
+                else:
+                    self._maps = {name: np.memmap(self._file(name, dtype), dtype=dtype, mode="r", shape=(n,))
+                                  for name, dtype in COLUMNS}
+            return self._maps
+
+    def __len__(self):
+        return len(self._columns()["open_time"])
+
+    @property
+    def first_open_time(self):
+        t = self._columns()["open_time"]
+        return int(t[0]) if len(t) else None
+
+    @property
+    def last_open_time(self):
+        t = self._columns()["open_time"]
+        return int(t[-1]) if len(t) else None
+
+    def read(self, start=None, end=None, tail=None):
+        """Closed candles with start <= open_time < end (ms) as memmap views."""
+        cols = self._columns()
+        t = cols["open_time"]
+        lo = 0 if start is None else int(np.searchsorted(t, start, side="left"))
+        hi = len(t) if end is None else int(np.searchsorted(t, end, side="left"))
+        if tail is not None:
+            lo = max(lo, hi - tail)
+        return {name: cols[name][lo:hi] for name, _ in COLUMNS}
+
+    def frame(self, tail=None, start=None, end=None, live=True):
+        """DataFrame for charting; appends the still-open candle when known."""
+        arrays = self.read(start=start, end=end, tail=tail)
+        if live and end is None and len(self._live["open_time"]):
+            arrays = {name: np.concatenate([arrays[name], self._live[name]]) for name, _ in COLUMNS}
+            if tail is not None:
+                arrays = {name: a[-tail:] for name, a in arrays.items()}
+        return klines_frame(arrays)
+
+    def live(self):
+        """The still-open candle from the last sync (empty arrays if unknown)."""
+        return self._live
+
+    # ----- writes -----
+    def append(self, arrays):
+        """Append closed candles newer than the stored ones; returns rows written."""
+        with self._lock:
+            self._maps = None  # another instance of the series (evicted from the registry) may have appended
+            last = self.last_open_time
+            if last is not None:
+                arrays = _take(arrays, arrays["open_time"] > last)
+            n = len(arrays["open_time"])
+            if n:
+                for name, dtype in COLUMNS[1:] + COLUMNS[:1]:
+                    with open(self._file(name, dtype), "ab") as fh:
+                        fh.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+                self._maps = None
+            return n
+
+    def _prepend(self, arrays):
+        # extending further back is rare: rewrite every column once
+        with self._lock:
+            first = self.first_open_time
+            arrays = _take(arrays, arrays["open_time"] < first)
+            if not len(arrays["open_time"]):
+                return 0
+            old = self.read()
+            for name, dtype in COLUMNS:
+                tmp = self._file(name, dtype) + ".tmp"
+                with open(tmp, "wb") as fh:
+                    fh.write(np.concatenate([arrays[name], old[name]]).astype(dtype).tobytes())
+            self._maps = None
+            # open_time first: after a crash in between, _repair cuts the
+            # prefix off the columns already swapped instead of pairing
+            # prepended prices with the old timestamps
+            for name, dtype in COLUMNS:
+                os.replace(self._file(name, dtype) + ".tmp", self._file(name, dtype))
+            return len(arrays["open_time"])
+
+    def _page_forward(self, cursor, end, now_ms):
+        """Fetch [cursor, end) page by page; returns (closed arrays, live arrays)."""
+        closed, live = [], _empty()
+        while cursor < end:
+            page = self.fetch(self.symbol, self.interval, start_time=cursor, end_time=end - 1)
+            t = page["open_time"]
+            if not len(t):
+                break
+            is_closed = _closed(self.interval, t, now_ms)
+            closed.append(_take(page, is_closed))
+            if not is_closed.all():
+                live = _take(page, ~is_closed)
+            cursor = int(t[-1]) + 1
+            if len(t) < MAX_LIMIT:
+                break
+        if not closed:
+            return _empty(), live
+        return {name: np.concatenate([c[name] for c in closed]) for name, _ in COLUMNS}, live
+
+    def sync(self, bars=None):
+        """Make sure at least ``bars`` closed candles up to now are on disk.
+
+        Offline (or when Binance is unreachable) whatever is stored is kept.
+        Returns the number of rows added.
+        """
+        if self.offline:
+            return 0
+        now_ms = int(time.time() * 1000)
+        step = INTERVAL_MS.get(self.interval, _MONTH_MS)
+        added = 0
+        with self._lock:
+            try:
+                first, last = self.first_open_time, self.last_open_time
+                want = now_ms - ((bars or 0) + 1) * step
+                if bars and first is not None and len(self) < bars and want < first:
+                    older, _ = self._page_forward(want, first, now_ms)
+                    added += self._prepend(older)
+                cursor = want if last is None else last + 1
+                newer, self._live = self._page_forward(cursor, now_ms + step, now_ms)
+                added += self.append(newer)
+            except Exception as e:
+                print(f"kline_history sync error {self.symbol} {self.interval}:", e)
+        return added
+
+    def import_payload(self, payload):
+        """Merge a recorded /api/v3/klines body (only closed candles are kept)."""
+        arrays = parse_klines(payload)
+        arrays = _take(arrays, _closed(self.interval, arrays["open_time"], int(time.time() * 1000)))
+        if len(self) and len(arrays["open_time"]):
+            return self._prepend(arrays) + self.append(arrays)
+        return self.append(arrays)
+
+    def stats(self):
+        return {"symbol": self.symbol, "interval": self.interval, "rows": len(self),
+                "first_open_time": self.first_open_time, "last_open_time": self.last_open_time,
+                "bytes": sum(self._rows_on_disk(n, d) * d.itemsize for n, d in COLUMNS)}
+
+
+# ===== REGISTRY =====
+_histories = OrderedDict()  # LRU, at most HISTORY_MAX_SERIES open series
+_registry_lock = threading.Lock()
+
+
+def kline_history(symbol, interval):
+    """Shared KlineHistory for (symbol, interval) under HISTORY_DIR.
+
+    ValueError for names that are not plain symbols/intervals; callers that
+    take the symbol from a user should also check it is listed first.
+    """
+    key = (symbol.upper(), interval)
+    with _registry_lock:
+        h = _histories.get(key)
+        if h is None:
+            h = _histories[key] = KlineHistory(symbol, interval)
+            while len(_histories) > HISTORY_MAX_SERIES:
+                _histories.popitem(last=False)
+        _histories.move_to_end(key)
+        return h
+
+
+def main(argv):
+    if len(argv) < 3 or argv[0] not in ("backfill", "import", "info"):
+        print(__doc__)
+        return 2
+    cmd, symbol, interval = argv[0], argv[1], argv[2]
+    h = KlineHistory(symbol, interval, offline=False if cmd == "backfill" else None)
+    if cmd == "backfill":
+        bars = int(argv[3]) if len(argv) > 3 else MAX_LIMIT
+        t0 = time.time()
+        print(f"added {h.sync(bars)} rows in {time.time() - t0:.1f}s")
+    elif cmd == "import":
+        for path in argv[3:]:
+            with open(path, "rb") as fh:
+                print(f"{path}: added {h.import_payload(fh.read())} rows")
+    print(h.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
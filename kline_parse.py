@@ -0,0 +1,81 @@
+"""Binance kline payload -> numpy arrays, skipping the object DataFrame.
+
+A /api/v3/klines body is a JSON list of 12-field rows whose values are all
+numeric (prices as strings). ``parse_klines`` strips the brackets/quotes and
+lets numpy parse the whole body in one pass, keeping only open_time and the
+five OHLCV columns. ``klines_frame`` builds the DataFrame the chart code
+expects, and should only be called at the plotting boundary.
+"""
+import json
+
+import numpy as np
+
+import metrics
+
+KLINE_WIDTH = 12
+FIELDS = ("open", "high", "low", "close", "volume")
+_STRIP = b'[]" \t\r\n'
+
+
+def _table_from_bytes(raw):
+    body = raw.translate(None, _STRIP)
+    if not body:
+        return np.empty((0, KLINE_WIDTH))
+    flat = np.fromstring(body, dtype=np.float64, sep=",")
+    if flat.size % KLINE_WIDTH:
+        return None
+    return flat.reshape(-1, KLINE_WIDTH)
+
+
+def parse_klines(payload, dtype=np.float64):
+    """Raw response body (bytes/str) or decoded rows -> dict of arrays.
+
+    Returns {"open_time": int64 ms, "open" .. "volume": ``dtype``}; every
+    array is contiguous. Raises ValueError on a Binance error object.
+    """
+    with metrics.timer("parse"):
+        return _parse(payload, dtype)
+
+
+def _parse(payload, dtype):
+    table = None
+    if isinstance(payload, (bytes, bytearray, str)):
+        raw = payload.encode() if isinstance(payload, str) else bytes(payload)
+        if raw.lstrip()[:1] == b"{":
+            raise ValueError(f"Binance error: {json.loads(raw)}")
+        table = _table_from_bytes(raw)
+        if table is None:  # unexpected layout, take the slow but safe route
+            payload = json.loads(raw)
+    if table is None:
+        if isinstance(payload, dict):
+            raise ValueError(f"Binance error: {payload}")
+        table = np.array([row[:6] for row in payload], dtype=np.float64).reshape(-1, 6)
+
+    cols = table[:, :6].T.copy()  # one copy, each row is now a contiguous column
+    out = {"open_time": cols[0].astype(np.int64)}
+    for j, f in enumerate(FIELDS, start=1):
+        out[f] = cols[j] if dtype == np.float64 else cols[j].astype(dtype)
+    return out
+
+
+def klines_frame(arrays):
+    """Arrays from ``parse_klines`` -> OHLCV DataFrame with an open_time index."""
+    import pandas as pd
+    idx = pd.to_datetime(arrays["open_time"], unit="ms")
+    idx.name = "open_time"
+    return pd.DataFrame({f: arrays[f] for f in FIELDS}, index=idx)
+
+
+def frame_bytes(df):
+    """OHLCV DataFrame -> compact bytes (open_time ms, then each field, native order)."""
+    t = df.index.values.astype("datetime64[ms]").astype(np.int64)
+    return b"".join([t.tobytes()] + [np.ascontiguousarray(df[f].to_numpy(), dtype=np.float64).tobytes()
+                                     for f in FIELDS])
+
+
+def frame_from_bytes(raw):
+    n = len(raw) // (8 * (1 + len(FIELDS)))
+    cols = np.frombuffer(raw, dtype=np.float64).reshape(1 + len(FIELDS), n).copy()
+    arrays = {f: cols[i + 1] for i, f in enumerate(FIELDS)}
+    arrays["open_time"] = cols[0].view(np.int64)
+    return klines_frame(arrays)
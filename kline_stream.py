@@ -0,0 +1,288 @@
+"""Binance combined kline stream feeding a CandleStore.
+
+Optional replacement for the fixed ``time.sleep`` REST polling: every
+watched symbol is subscribed on one combined stream, each message updates the
+symbol's CandleRing in place, and on (re)connect or when a gap is detected
+the missing candles are backfilled over REST through ``store.refresh``.
+
+For offline testing, ``ReplayServer`` is a tiny local WebSocket stand-in that
+replays recorded frames:
+
+    python kline_stream.py record frames.jsonl ltcusdt,btcusdt 5m 200
+    python kline_stream.py replay frames.jsonl 8765
+    BINANCE_WS_URL=ws://127.0.0.1:8765 STREAM_MODE=1 python m1ain.py
+"""
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import hashlib
+import threading
+
+import websocket
+
+from kline_cache import interval_ms
+
+BINANCE_WS_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443")
+
+
+def stream_name(symbol, interval):
+    return f"{symbol.lower()}@kline_{interval}"
+
+
+def kline_to_row(k):
+    """Stream kline payload -> REST-style kline row."""
+    return [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"], k["T"]]
+
+
+# ===== STREAM CLIENT =====
+class KlineStream:
+    """Background thread that keeps ``store`` current from the kline stream.
+
+    ``on_update(symbol, ring, closed)`` is called on the stream thread after
+    every message, ``closed`` is True when the candle just closed.
+    """
+
+    def __init__(self, store, symbols, interval, on_update=None,
+                 base_url=BINANCE_WS_URL, recv_timeout=60, max_backoff=60):
+        self.store = store
+        self.interval = interval
+        self.symbols = {s.upper() for s in symbols}
+        self.on_update = on_update
+        self.base_url = base_url.rstrip("/")
+        self.recv_timeout = recv_timeout
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+        self.messages = 0
+        self._ws = None
+        self._next_id = 1
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        streams = "/".join(sorted(stream_name(s, self.interval) for s in self.symbols))
+        return f"{self.base_url}/stream?streams={streams}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def add_symbols(self, symbols):
+        """Watch more symbols; subscribes live if connected, else on reconnect."""
+        new = {s.upper() for s in symbols} - self.symbols
+        if not new:
+            return
+        with self._lock:
+            self.symbols |= new
+            ws = self._ws
+            msg_id = self._next_id
+            self._next_id += 1
+        for sym in new:
+            self.store.refresh(sym, self.interval)
+        if ws is not None:
+            try:
+                ws.send(json.dumps({"method": "SUBSCRIBE", "id": msg_id,
+                                    "params": [stream_name(s, self.interval) for s in new]}))
+            except Exception as e:
+                print("kline_stream subscribe error:", e)
+
+    def _backfill(self, symbols):
+        for sym in symbols:
+            try:
+                ring = self.store.refresh(sym, self.interval)
+                if self.on_update:
+                    self.on_update(sym, ring, False)
+            except Exception as e:
+                print("kline_stream backfill error:", sym, e)
+
+    def _handle(self, raw):
+        msg = json.loads(raw)
+        data = msg.get("data", msg)
+        k = data.get("k") if isinstance(data, dict) else None
+        if not k:
+            return  # subscribe acks etc.
+        sym = k["s"].upper()
+        ring = self.store.get(sym, self.interval)
+        last = ring.last_open_time
+        if last is None or k["t"] - last > interval_ms(self.interval):
+            # missed candles (first message, or messages dropped): REST backfill
+            self.store.refresh(sym, self.interval)
+        ring.update([kline_to_row(k)])
+        self.messages += 1
+        if self.on_update:
+            self.on_update(sym, ring, bool(k.get("x")))
+
+    def run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                ws = websocket.create_connection(self.url, timeout=self.recv_timeout)
+                with self._lock:
+                    self._ws = ws
+                print("kline_stream connected:", self.url)
+                self._backfill(sorted(self.symbols))
+                backoff = 1
+                while not self._stop.is_set():
+                    raw = ws.recv()
+                    if not raw:
+                        raise websocket.WebSocketConnectionClosedException("closed by server")
+                    self._handle(raw)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                print("kline_stream error:", e)
+            finally:
+                with self._lock:
+                    ws, self._ws = self._ws, None
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+
+# ===== LOCAL STAND-IN SERVER =====
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _ws_frame(text):
+    payload = text.encode()
+    n = len(payload)
+    if n < 126:
+        header = bytes([0x81, n])
+    elif n < 65536:
+        header = bytes([0x81, 126]) + n.to_bytes(2, "big")
+    else:
+        header = bytes([0x81, 127]) + n.to_bytes(8, "big")
+    return header + payload
+
+
+class ReplayServer:
+    """Minimal WebSocket server replaying recorded stream frames.
+
+    Each connection receives the frames (filtered to the symbols in the
+    requested ``streams=`` path when they are combined-stream messages), then
+    the server closes the socket so clients exercise their reconnect path.
+    """
+
+    def __init__(self, frames, host="127.0.0.1", port=0, delay=0.0):
+        self.frames = list(frames)
+        self.delay = delay
+        self.connections = 0
+        self.paths = []
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(8)
+        self.host, self.port = self._sock.getsockname()[:2]
+        self._stop = threading.Event()
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    @classmethod
+    def from_file(cls, path, **kw):
+        with open(path) as f:
+            return cls([line.rstrip("\n") for line in f if line.strip()], **kw)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self._sock.close()
+        except Exception:
+            pass
+
+    def serve_forever(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                request += chunk
+            lines = request.decode().split("\r\n")
+            path = lines[0].split()[1]
+            headers = dict(l.split(": ", 1) for l in lines[1:] if ": " in l)
+            key = headers.get("Sec-WebSocket-Key", "")
+            accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+            conn.sendall(("HTTP/1.1 101 Switching Protocols\r\n"
+                          "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+            self.connections += 1
+            self.paths.append(path)
+            wanted = set(path.split("streams=", 1)[1].split("/")) if "streams=" in path else None
+            for frame in self.frames:
+                if self._stop.is_set():
+                    break
+                if wanted is not None:
+                    stream = json.loads(frame).get("stream")
+                    if stream is not None and stream not in wanted:
+                        continue
+                conn.sendall(_ws_frame(frame))
+                if self.delay:
+                    time.sleep(self.delay)
+            conn.sendall(b"\x88\x00")  # close frame
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+def record_frames(path, symbols, interval, count, base_url=BINANCE_WS_URL):
+    """Save ``count`` raw combined-stream frames to a JSONL file."""
+    streams = "/".join(stream_name(s, interval) for s in symbols)
+    ws = websocket.create_connection(f"{base_url.rstrip('/')}/stream?streams={streams}", timeout=60)
+    try:
+        with open(path, "w") as f:
+            for _ in range(count):
+                f.write(ws.recv() + "\n")
+    finally:
+        ws.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 5 and sys.argv[1] == "record":
+        count = int(sys.argv[5]) if len(sys.argv) > 5 else 100
+        record_frames(sys.argv[2], sys.argv[3].split(","), sys.argv[4], count)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "replay":
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else 8765
+        server = ReplayServer.from_file(sys.argv[2], port=port, delay=0.05)
+        print("replaying on", server.url)
+        server.serve_forever()
+    else:
+        print("usage: kline_stream.py record <file> <sym,sym> <interval> [count]\n"
+              "       kline_stream.py replay <file> [port]")
@@ -0,0 +1,113 @@
+"""Leader election between the worker processes of one host (SQLite lease).
+
+With several gunicorn workers each one imports main.py, but the scheduled
+loops (auto_loop, the kline stream, setWebhook) must run in exactly one of
+them or every alert goes out once per worker. Workers compete for a named
+lease row: the holder renews it every ``ttl / 3`` seconds, the others retry
+on the same beat and take over once it has not been renewed for ``ttl``
+seconds, i.e. when the leader died or hung. A worker that exits cleanly
+releases the lease so a successor starts at once.
+
+``held`` only trusts the lease until the last successful renewal plus ttl
+(monotonic clock), so a leader that stalls stops acting before a successor
+can have taken over.
+"""
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+
+LEADER_DB = os.getenv("LEADER_DB", "")  # "" = single process, always leader
+LEADER_TTL = float(os.getenv("LEADER_TTL", 30))
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+
+
+class Lease:
+    def __init__(self, path, name="loops", ttl=LEADER_TTL, owner=None):
+        self.path = path
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = None
+        self._lock = threading.Lock()
+        self._valid_until = 0.0  # monotonic
+        self._stop = threading.Event()
+        self._thread = None
+        self.elections = 0
+        self.errors = 0
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=self.ttl / 3, isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.execute(_SCHEMA)
+        return self._conn
+
+    @property
+    def held(self):
+        return time.monotonic() < self._valid_until
+
+    def acquire(self):
+        """Take or renew the lease; True while this process holds it."""
+        with self._lock:
+            started = time.monotonic()
+            try:
+                db = self._db()
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    now = time.time()
+                    row = db.execute("SELECT owner, expires FROM lease WHERE name = ?", (self.name,)).fetchone()
+                    won = row is None or row[0] == self.owner or row[1] < now
+                    if won:
+                        db.execute("INSERT OR REPLACE INTO lease VALUES (?, ?, ?)",
+                                   (self.name, self.owner, now + self.ttl))
+                    db.execute("COMMIT")
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                self.errors += 1
+                print("leader lease error:", e)
+                return self.held
+            if won:
+                if not self.held:
+                    self.elections += 1
+                self._valid_until = started + self.ttl
+            else:
+                self._valid_until = 0.0
+            return won
+
+    def release(self):
+        self._stop.set()
+        with self._lock:
+            if not self.held:
+                return
+            self._valid_until = 0.0
+            try:
+                self._db().execute("DELETE FROM lease WHERE name = ? AND owner = ?", (self.name, self.owner))
+            except sqlite3.Error as e:
+                print("leader lease error:", e)
+
+    def run(self, on_elected):
+        """Keep competing in a background thread; ``on_elected()`` runs once,
+        the first time this process becomes leader."""
+        def loop():
+            started = False
+            while not self._stop.is_set():
+                if self.acquire() and not started:
+                    started = True
+                    print(f"leader: {self.owner} holds {self.name!r}")
+                    try:
+                        on_elected()
+                    except Exception as e:
+                        print("leader on_elected error:", e)
+                self._stop.wait(self.ttl / 3)
+        self._thread = threading.Thread(target=loop, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stats(self):
+        return {"owner": self.owner, "held": self.held, "elections": self.elections, "errors": self.errors}
@@ -1,17 +1,17 @@
 # main.py
 import os
-import io
-import time
-import threading
 import traceback
-import requests
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use("Agg")
-import mplfinance as mpf
-import matplotlib.pyplot as plt
-from flask import Flask, request
+import http_client
+import binance_client
+import metrics
+from flask import Flask, request, jsonify
+from kline_cache import cached_klines
+from price_book import price_book, format_age
+from chart_cache import cached_chart
+from render_pool import render_chart
+from warmup import start_warmup  # numpy/pandas/charting load lazily, warmed up in the background
+from update_queue import UpdateQueue, FULL
+from telegram_outbox import Outbox
 
 # ------------- CONFIG -------------
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -27,173 +27,103 @@ BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
 # limits / defaults
 MAX_LIMIT = 1000
 DEFAULT_LIMIT = 500
+HISTORY_MAX_BARS = int(os.environ.get("HISTORY_MAX_BARS", 20000))  # beyond MAX_LIMIT: served from kline_history
+CHART_ENGINES = {"fast", "mpf"}  # optional last /chart argument
 VALID_TFS = {"1m","3m","5m","15m","30m","1h","2h","4h","6h","8h","12h","1d","3d","1w","1M"}
+UPDATE_WORKERS = int(os.environ.get("UPDATE_WORKERS", 4))
+UPDATE_QUEUE_SIZE = int(os.environ.get("UPDATE_QUEUE_SIZE", 100))
 
 app = Flask(__name__)
 
 # ------------- UTIL TELEGRAM -------------
+# queued and rate limited; returns at once, delivery happens on the outbox threads
+outbox = Outbox(TELEGRAM_API)
+
 def tg_send_text(chat_id, text):
-    try:
-        r = requests.post(f"{TELEGRAM_API}/sendMessage", json={"chat_id": chat_id, "text": text}, timeout=15)
-        print("tg_send_text:", r.status_code, r.text)
-    except Exception as e:
-        print("tg_send_text error:", e)
+    outbox.send_text(chat_id, text)
 
 def tg_send_photo_bytes(chat_id, png_bytes, caption=None):
-    try:
-        files = {"photo": ("chart.png", png_bytes)}
-        data = {"chat_id": chat_id}
-        if caption:
-            data["caption"] = caption
-        r = requests.post(f"{TELEGRAM_API}/sendPhoto", data=data, files=files, timeout=60)
-        print("tg_send_photo:", r.status_code, r.text)
-    except Exception as e:
-        print("tg_send_photo error:", e)
+    outbox.send_photo(chat_id, png_bytes, caption=caption)
 
 # ------------- BINANCE DATA (REST) -------------
+def known_symbol(symbol):
+    """Listed on Binance (price book); checked before anything keyed by the symbol
+    touches the disk or starts a backfill. Offline: a stored history is enough."""
+    from kline_history import valid_symbol, stored, HISTORY_OFFLINE
+    if not valid_symbol(symbol):
+        return False
+    if HISTORY_OFFLINE:
+        return stored(symbol)
+    return symbol in price_book
+
 def binance_get_klines(symbol="BTCUSDT", interval="4h", limit=500):
     symbol = symbol.upper()
     interval = interval.lower()
     if interval not in VALID_TFS:
         raise ValueError(f"Invalid timeframe: {interval}")
-    limit = min(int(limit), MAX_LIMIT)
+    if not known_symbol(symbol):
+        raise ValueError(f"Unknown symbol: {symbol}")
+    limit = min(int(limit), HISTORY_MAX_BARS)
+    from resample import timeframes
+    df = timeframes.frame(symbol, interval, limit)  # derived from the stored base interval, no request
+    if df is not None:
+        return df
+    from kline_history import kline_history, HISTORY_OFFLINE
+    if limit > MAX_LIMIT or HISTORY_OFFLINE:
+        # long or offline windows come from the on-disk history (paged backfill, then incremental)
+        hist = kline_history(symbol, interval)
+        hist.sync(limit)
+        return hist.frame(tail=limit)
+    return cached_klines(symbol, interval, limit, _binance_fetch_klines)
+
+def _binance_fetch_klines(symbol, interval, limit):
     params = {"symbol": symbol, "interval": interval, "limit": limit}
-    r = requests.get(BINANCE_KLINES_URL, params=params, timeout=20)
+    r = binance_client.get(BINANCE_KLINES_URL, params=params, timeout=20)
     r.raise_for_status()
-    data = r.json()
-    df = pd.DataFrame(data, columns=[
-        "open_time","open","high","low","close","volume",
-        "close_time","qav","num_trades","tb_base","tb_quote","ignore"
-    ])
-    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
-    df.set_index("open_time", inplace=True)
-    for c in ["open","high","low","close","volume"]:
-        df[c] = df[c].astype(float)
-    return df[["open","high","low","close","volume"]]
+    from kline_parse import parse_klines, klines_frame
+    return klines_frame(parse_klines(r.content))  # body parsed straight into numpy arrays
 
 def get_price_simple(symbol="BTCUSDT"):
-    r = requests.get("https://api.binance.com/api/v3/ticker/price", params={"symbol": symbol}, timeout=10)
-    r.raise_for_status()
-    return float(r.json()["price"])
-
-# ------------- S/R and Fibonacci -------------
-def find_swings(highs, lows, window=5):
-    highs_idx = []
-    lows_idx = []
-    n = len(highs)
-    for i in range(window, n-window):
-        if highs[i] == max(highs[i-window:i+window+1]):
-            highs_idx.append(i)
-        if lows[i] == min(lows[i-window:i+window+1]):
-            lows_idx.append(i)
-    highs_vals = [highs[i] for i in highs_idx]
-    lows_vals = [lows[i] for i in lows_idx]
-    return sorted(set(highs_vals)), sorted(set(lows_vals))
-
-def pick_sr_from_swings(highs_vals, lows_vals):
-    support = min(lows_vals) if lows_vals else None
-    resistance = max(highs_vals) if highs_vals else None
-    return support, resistance
-
-def fib_levels(support, resistance):
-    low = support
-    high = resistance
-    diff = high - low
-    retr = {
-        "0.0": high,
-        "0.236": high - diff * 0.236,
-        "0.382": high - diff * 0.382,
-        "0.5": high - diff * 0.5,
-        "0.618": high - diff * 0.618,
-        "1.0": low
-    }
-    ext = {
-        "1.272": high + diff * 0.272,
-        "1.618": high + diff * 0.618
-    }
-    return retr, ext
+    price, _age = price_book.get(symbol)  # all-symbols ticker, refreshed at most every few seconds
+    return price
 
 # ------------- Chart builder -------------
-def make_chart_png_bytes(df, title=None, sma_fast=50, sma_slow=200, swing_win=5):
+def make_chart_png_bytes(df, title=None, sma_fast=50, sma_slow=200, swing_win=5, engine=None,
+                         chart_engine=None):
     """
     returns: PNG bytes
+    engine: optional IndicatorEngine for this symbol/timeframe; only candles
+    newer than its last update are computed, the rest comes from its history.
+    chart_engine: "fast" / "mpf" renderer (None: CHART_ENGINE env).
+    Indicators are computed here, S/R + Fib + plotting run in the render pool.
     """
+    from indicators import sma, rsi_wilder, macd
     try:
-        plot_df = df.copy().rename(columns={"open":"Open","high":"High","low":"Low","close":"Close","volume":"Volume"})
-        close = plot_df["Close"]
-        ma_fast = close.rolling(sma_fast).mean()
-        ma_slow = close.rolling(sma_slow).mean()
-
-        # RSI (standard)
-        delta = close.diff()
-        up = delta.clip(lower=0)
-        down = -delta.clip(upper=0)
-        ma_up = up.ewm(alpha=1/14, adjust=False).mean()
-        ma_down = down.ewm(alpha=1/14, adjust=False).mean()
-        rs = ma_up / ma_down.replace(0, np.nan)
-        rsi_series = 100 - (100 / (1 + rs))
-
-        # MACD
-        macd_line = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
-        macd_sig = macd_line.ewm(span=9, adjust=False).mean()
-        macd_hist = macd_line - macd_sig
-
-        highs = plot_df["High"].to_numpy()
-        lows = plot_df["Low"].to_numpy()
-        highs_sw, lows_sw = find_swings(highs, lows, window=swing_win)
-        support, resistance = pick_sr_from_swings(highs_sw, lows_sw)
-
-        retr, ext = {}, {}
-        if support is not None and resistance is not None and support < resistance:
-            retr, ext = fib_levels(support, resistance)
-
-        addplots = [
-            mpf.make_addplot(ma_fast, color='tab:blue'),
-            mpf.make_addplot(ma_slow, color='tab:red'),
-            mpf.make_addplot(rsi_series, panel=1, ylabel='RSI'),
-            mpf.make_addplot(macd_line, panel=2, color='fuchsia'),
-            mpf.make_addplot(macd_sig, panel=2, color='green'),
-            mpf.make_addplot(macd_hist, type='bar', panel=2, color='dimgray', width=0.7)
-        ]
-
-        fig, axes = mpf.plot(plot_df, type='candle', style='binance',
-                             addplot=addplots, volume=False, returnfig=True,
-                             figsize=(12,9), tight_layout=True, panel_ratios=(6,2,2))
-
-        ax_main = axes[0]
-
-        # draw S/R lines
-        if support is not None:
-            ax_main.hlines(support, plot_df.index[0], plot_df.index[-1], colors='green', linestyles='--', linewidth=1.2, alpha=0.9)
-            ax_main.text(plot_df.index[-1], support, f"  S {support:.6f}", color='green', fontsize=8, va='bottom')
-        if resistance is not None:
-            ax_main.hlines(resistance, plot_df.index[0], plot_df.index[-1], colors='red', linestyles='--', linewidth=1.2, alpha=0.9)
-            ax_main.text(plot_df.index[-1], resistance, f"  R {resistance:.6f}", color='red', fontsize=8, va='bottom')
-
-        # draw fib retracement lines
-        if retr:
-            colors = {'0.236':'#cc9900','0.382':'#cc6600','0.5':'#888888','0.618':'#009900'}
-            for k,v in retr.items():
-                ax_main.hlines(v, plot_df.index[0], plot_df.index[-1], colors=colors.get(k,'#999999'), linestyles=':', linewidth=1)
-                ax_main.text(plot_df.index[-1], v, f" {k} {v:.6f}", color=colors.get(k,'#999999'), fontsize=7, va='bottom')
-
-        # fib extension (sell zone)
-        if ext and "1.618" in ext:
-            ax_main.hlines(ext["1.618"], plot_df.index[0], plot_df.index[-1], colors='purple', linestyles='-.', linewidth=1.2)
-            ax_main.text(plot_df.index[-1], ext["1.618"], f"  EXT 1.618 {ext['1.618']:.6f}", color='purple', fontsize=8, va='bottom')
-
-        if title:
-            ax_main.set_title(title)
-
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', dpi=150)
-        buf.seek(0)
-        try:
-            import matplotlib.pyplot as plt
-            plt.close(fig)
-        except:
-            pass
-        return buf.read()
+        close = df["close"]
+        with metrics.timer("compute"):
+            if engine is not None and len(df) <= engine.capacity:
+                engine.feed(df.index.asi8, close.to_numpy())
+                n = len(df)
+                indicators = {
+                    "ma_fast": engine.history(f"sma{sma_fast}", n),
+                    "ma_slow": engine.history(f"sma{sma_slow}", n),
+                    "rsi": engine.history("rsi", n),
+                    "macd": engine.history("macd", n),
+                    "macd_signal": engine.history("macd_signal", n),
+                    "macd_hist": engine.history("macd_hist", n),
+                }
+            else:
+                macd_line, macd_sig, macd_hist = macd(close, 12, 26, 9)
+                indicators = {
+                    "ma_fast": sma(close, sma_fast).to_numpy(),
+                    "ma_slow": sma(close, sma_slow).to_numpy(),
+                    "rsi": rsi_wilder(close, 14).to_numpy(),  # RSI (standard)
+                    "macd": macd_line.to_numpy(),
+                    "macd_signal": macd_sig.to_numpy(),
+                    "macd_hist": macd_hist.to_numpy(),
+                }
+        return render_chart("sr_fib", df, title=title, swing_win=swing_win, indicators=indicators,
+                            engine=chart_engine)
     except Exception:
         traceback.print_exc()
         raise
@@ -201,7 +131,7 @@ def make_chart_png_bytes(df, title=None, sma_fast=50, sma_slow=200, swing_win=5)
 # ------------- Background worker (process heavy commands) -------------
 def process_update_async(update):
     try:
-        if not update or "message" not in update:
+        if not isinstance(update, dict) or "message" not in update:
             return
         msg = update["message"]
         chat_id = msg["chat"]["id"]
@@ -215,17 +145,23 @@ def process_update_async(update):
 
         if cmd == "/price":
             if len(parts) >= 2:
-                coin = parts[1].upper()
-                symbol = coin if coin.endswith("USDT") else f"{coin}USDT"
+                coins = [p.upper() for p in parts[1:]]
+                symbols = [c if c.endswith("USDT") else f"{c}USDT" for c in coins]
                 try:
-                    price = get_price_simple(symbol)
-                    tg_send_text(chat_id, f"💰 {symbol} = {price:.6f} USDT")
+                    lines = []
+                    for symbol, hit in price_book.get_many(symbols).items():
+                        if hit is None:
+                            lines.append(f"❌ {symbol}: unknown symbol")
+                        else:
+                            lines.append(f"💰 {symbol} = {hit[0]:.6f} USDT ({format_age(hit[1])} ago)")
+                    tg_send_text(chat_id, "\n".join(lines))
                 except Exception as e:
                     tg_send_text(chat_id, f"❌ Failed to fetch price: {e}")
             else:
-                tg_send_text(chat_id, "Usage: /price BTC")
+                tg_send_text(chat_id, "Usage: /price BTC [ETH LTC ...]")
 
         elif cmd == "/chart":
+            chart_engine = parts.pop().lower() if len(parts) >= 4 and parts[-1].lower() in CHART_ENGINES else None
             if len(parts) >= 3:
                 coin = parts[1].upper()
                 tf = parts[2].lower()
@@ -233,50 +169,95 @@ def process_update_async(update):
                     tg_send_text(chat_id, "Timeframe invalid. Examples: 15m, 1h, 4h, 1d")
                     return
                 symbol = coin if coin.endswith("USDT") else f"{coin}USDT"
+                bars = int(parts[3]) if len(parts) >= 4 and parts[3].isdigit() else 300
+                bars = max(50, min(bars, HISTORY_MAX_BARS))
                 try:
+                    from indicators import indicator_engine
                     tg_send_text(chat_id, f"🔎 Generating {symbol} {tf} chart...")
-                    df = binance_get_klines(symbol, tf, limit=300)
-                    png = make_chart_png_bytes(df.tail(300), title=f"{symbol} {tf.upper()}")
+                    df = binance_get_klines(symbol, tf, limit=bars)
+                    if df.empty:
+                        tg_send_text(chat_id, f"❌ No candle data for {symbol} {tf}")
+                        return
+                    png = cached_chart("sr_fib", symbol, tf, df,
+                                       lambda: make_chart_png_bytes(df.tail(bars), title=f"{symbol} {tf.upper()}",
+                                                                    engine=indicator_engine(symbol, tf),
+                                                                    chart_engine=chart_engine),
+                                       bars=bars, engine=chart_engine)
                     tg_send_photo_bytes(chat_id, png, caption=f"📈 {symbol} {tf.upper()} (MA50/200 + RSI + MACD + S/R + Fib)")
                 except Exception as e:
                     tg_send_text(chat_id, f"❌ Chart error: {e}")
                     traceback.print_exc()
             else:
-                tg_send_text(chat_id, "Usage: /chart BTC 4h")
+                tg_send_text(chat_id, "Usage: /chart BTC 4h [bars] [fast]")
 
         else:
-            tg_send_text(chat_id, "Commands:\n/price <coin>\n/chart <coin> <timeframe>\nExample: /chart BNB 4h")
+            tg_send_text(chat_id, "Commands:\n/price <coin>\n/chart <coin> <timeframe> [bars] [fast]\nExample: /chart BNB 4h")
     except Exception:
         traceback.print_exc()
 
+# ------------- Update queue (bounded worker pool) -------------
+def update_priority(update):
+    """Lower runs first: /price is cheap, charts wait behind it."""
+    text = ((update if isinstance(update, dict) else {}).get("message") or {}).get("text") or ""
+    return 0 if text.strip().lower().startswith("/price") else 1
+
+def handle_update(update):
+    """Queue worker entry: process_update_async with per-command metrics."""
+    with metrics.track_command(((update if isinstance(update, dict) else {}).get("message") or {}).get("text")):
+        process_update_async(update)
+
+updates = UpdateQueue(handle_update, workers=UPDATE_WORKERS,
+                      maxsize=UPDATE_QUEUE_SIZE, priority=update_priority)
+
 # ------------- Webhook route (fast response) -------------
 @app.route(f"/{TELEGRAM_TOKEN}", methods=["POST"])
 def webhook():
     try:
         update = request.get_json(force=True)
         print("Received update:", update)
-        # spawn background worker
-        t = threading.Thread(target=process_update_async, args=(update,), daemon=True)
-        t.start()
+        if updates.submit(update) == FULL:
+            chat_id = ((update if isinstance(update, dict) else {}).get("message") or {}).get("chat", {}).get("id")
+            if chat_id is not None:
+                # reply inside the webhook response, no extra API call
+                return jsonify(method="sendMessage", chat_id=chat_id,
+                               text="⏳ Bot is busy, please try again in a moment.")
     except Exception as e:
         print("Webhook handler exception:", e)
         traceback.print_exc()
     # return OK immediately so Telegram won't mark webhook failed
     return "ok", 200
 
+@app.route("/queue", methods=["GET"])
+def queue_stats():
+    return jsonify(updates.stats())
+
+@app.route("/outbox", methods=["GET"])
+def outbox_stats():
+    return jsonify(outbox.stats())
+
+@app.route("/timeframes", methods=["GET"])
+def timeframe_stats():
+    from resample import timeframes
+    return jsonify(timeframes.stats())
+
 @app.route("/", methods=["GET"])
 def home():
     return "Bot (SR + Fib) running", 200
 
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    # Prometheus text format: per-stage latency histograms by command and symbol
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
 # ------------- Ensure webhook is set -------------
 def ensure_set_webhook():
     try:
-        requests.get(f"{TELEGRAM_API}/deleteWebhook", timeout=10)
+        http_client.get(f"{TELEGRAM_API}/deleteWebhook", timeout=10)
     except Exception:
         pass
     expected = f"{RAILWAY_URL.rstrip('/')}/{TELEGRAM_TOKEN}"
     try:
-        r = requests.post(f"{TELEGRAM_API}/setWebhook", data={"url": expected}, timeout=20)
+        r = http_client.post(f"{TELEGRAM_API}/setWebhook", data={"url": expected}, timeout=20)
         print("setWebhook resp:", r.status_code, r.text)
     except Exception as e:
         print("ensure_set_webhook error:", e)
@@ -285,6 +266,9 @@ def ensure_set_webhook():
 # ------------- Start -------------
 if __name__ == "__main__":
     print("Starting app, ensuring webhook...")
+    start_warmup()
+    price_book.start()  # /price and symbol checks read from memory
+    updates.start()
     ensure_set_webhook()
     app.run(host="0.0.0.0", port=PORT)
 if __name__ == '__main__':
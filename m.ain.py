@@ -1,8 +1,11 @@
 import os
 import time
-import requests
-import pandas as pd
+import http_client
+import binance_client
+import metrics
 from flask import Flask, request
+from price_book import price_book, format_age
+from telegram_outbox import Outbox
 
 # ===== CONFIG =====
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -16,36 +19,24 @@ ALERT_INTERVAL = 300  # 5 menit
 app = Flask(__name__)
 
 # ===== FUNCTIONS =====
+outbox = Outbox(f"https://api.telegram.org/bot{TELEGRAM_TOKEN}")  # antrian kirim, rate limit Telegram
+
 def send_telegram(chat_id, msg):
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    data = {"chat_id": chat_id, "text": msg}
-    try:
-        requests.post(url, data=data)
-    except Exception as e:
-        print("Error send_telegram:", e)
+    outbox.send_text(chat_id, msg)
 
 def get_binance_price(symbol="LTCUSDT"):
-    url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol.upper()}"
-    r = requests.get(url)
-    return float(r.json()["price"])
+    price, _age = price_book.get(symbol)
+    return price
 
 def get_candle_data(symbol="LTCUSDT", interval="5m", limit=50):
     url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}"
-    data = requests.get(url).json()
-    df = pd.DataFrame(data, columns=[
-        "time", "open", "high", "low", "close", "volume",
-        "_", "_", "_", "_", "_", "_"
-    ])
-    df["open"] = df["open"].astype(float)
-    df["high"] = df["high"].astype(float)
-    df["low"] = df["low"].astype(float)
-    df["close"] = df["close"].astype(float)
-    return df
+    from kline_parse import parse_klines  # numpy cuma dimuat kalau perlu candle
+    return parse_klines(binance_client.get(url, timeout=20).content)  # dict array numpy
 
 def check_support_resistance():
-    df = get_candle_data(PAIR, TIMEFRAME, 50)
-    support = df["low"].min()
-    resistance = df["high"].max()
+    k = get_candle_data(PAIR, TIMEFRAME, 50)
+    support = k["low"].min()
+    resistance = k["high"].max()
     price = get_binance_price(PAIR)
 
     msg = f"📊 {PAIR} Update\nHarga: {price:.2f} USDT\nSupport: {support:.2f}\nResistance: {resistance:.2f}"
@@ -55,7 +46,14 @@ def check_support_resistance():
 @app.route(f"/{TELEGRAM_TOKEN}", methods=["POST"])
 def telegram_webhook():
     update = request.get_json()
+    with metrics.track_command(((update or {}).get("message") or {}).get("text")):
+        return handle_update(update)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
 
+def handle_update(update):
     if "message" in update:
         chat_id = update["message"]["chat"]["id"]
         text = update["message"].get("text", "").strip().lower()
@@ -65,12 +63,16 @@ def telegram_webhook():
 
         if text.startswith("/price"):
             parts = text.split()
-            if len(parts) == 2:
-                coin = parts[1].upper()
-                symbol = f"{coin}USDT"
+            if len(parts) >= 2:
+                symbols = [f"{coin.upper()}USDT" for coin in parts[1:]]
                 try:
-                    price = get_binance_price(symbol)
-                    send_telegram(chat_id, f"💰 Harga {symbol}: {price:.2f} USDT")
+                    lines = []
+                    for symbol, hit in price_book.get_many(symbols).items():
+                        if hit is None:
+                            lines.append(f"❌ {symbol} tidak ditemukan")
+                        else:
+                            lines.append(f"💰 Harga {symbol}: {hit[0]:.2f} USDT ({format_age(hit[1])} lalu)")
+                    send_telegram(chat_id, "\n".join(lines))
                 except:
                     send_telegram(chat_id, "❌ Gagal mengambil harga.")
             else:
@@ -82,12 +84,13 @@ def telegram_webhook():
 def set_webhook():
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/setWebhook"
     data = {"url": f"{WEBHOOK_URL}/{TELEGRAM_TOKEN}"}
-    r = requests.post(url, data=data)
+    r = http_client.post(url, data=data, timeout=20)
     print(r.json())
 
 # ===== AUTO ALERT LOOP =====
 def start_auto_alert():
     def run_job():
+        metrics.set_labels("auto", PAIR)
         while True:
             try:
                 check_support_resistance()
@@ -100,6 +103,7 @@ def start_auto_alert():
     thread.start()
 
 if __name__ == "__main__":
+    price_book.start()  # /price dari memori, di-refresh di background
     set_webhook()
     start_auto_alert()
-    app.run(host="0.0.0.0", port=5000)
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
@@ -1,13 +1,18 @@
 import os
-import io
 import time
-import requests
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use("Agg")  # penting untuk server tanpa display
-import mplfinance as mpf
+import threading
+import http_client
+import binance_client
+import metrics
 from flask import Flask, request
+from kline_cache import cached_klines
+from price_book import price_book, format_age
+from candle_store import CandleStore
+from chart_cache import cached_chart
+from telegram_outbox import Outbox
+from alert_state import AlertState
+from render_pool import render_chart
+from warmup import start_warmup  # numpy/pandas/matplotlib dimuat lazy, lalu di-warmup di background
 
 # ===== CONFIG =====
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -19,188 +24,195 @@ PAIR = "LTCUSDT"            # pasangan utama untuk S/R & crossover alert
 TIMEFRAME = "5m"            # 1m,3m,5m,15m,1h,4h,1d
 ALERT_INTERVAL = 300        # 5 menit
 NEAR_TOL = 0.003            # 0.3% dari level S/R
+REARM_TOL = 2 * NEAR_TOL    # level boleh alert lagi setelah harga menjauh >0.6%
+ALERT_TTL = int(os.getenv("ALERT_TTL", 24 * 3600))  # atau setelah sekian detik
 SMA_FAST = 50
 SMA_SLOW = 200
+CHART_ENGINES = ("fast", "mpf")  # /chart eth fast: renderer tanpa mplfinance
 KLIMIT = 300                # jumlah candle diambil (cukup untuk MA200 di 5m)
+STREAM_MODE = os.getenv("STREAM_MODE", "0") == "1"  # WebSocket kline stream ganti polling REST
+
+FETCH_CONCURRENCY = 16      # maks request klines paralel per siklus
+# scanner watchlist: "BNBUSDT,SOLUSDT,..." atau "USDT" = semua pair USDT (maks SCAN_MAX)
+SCAN_SYMBOLS = [s.strip().upper() for s in os.getenv("SCAN_SYMBOLS", "").split(",") if s.strip()]
+SCAN_MAX = 300
+
+candles = CandleStore(capacity=KLIMIT, concurrency=FETCH_CONCURRENCY)  # ring buffer per simbol, sekali backfill lalu inkremental
+scan_candles = CandleStore(capacity=KLIMIT, max_series=SCAN_MAX, concurrency=FETCH_CONCURRENCY)
 
 app = Flask(__name__)
 
 # ===== TELEGRAM =====
+# pesan keluar lewat antrian: langsung return, dikirim worker outbox sesuai rate limit Telegram
+outbox = Outbox(f"https://api.telegram.org/bot{TELEGRAM_TOKEN}")
+
 def send_text(chat_id, msg, parse="Markdown"):
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        requests.post(url, data={"chat_id": chat_id, "text": msg, "parse_mode": parse})
-    except Exception as e:
-        print("send_text error:", e)
+    outbox.send_text(chat_id, msg, parse_mode=parse)
 
 def send_photo(chat_id, png_bytes, caption=None):
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendPhoto"
-        files = {"photo": ("chart.png", png_bytes)}
-        data = {"chat_id": chat_id}
-        if caption:
-            data["caption"] = caption
-        requests.post(url, data=data, files=files, timeout=30)
-    except Exception as e:
-        print("send_photo error:", e)
+    outbox.send_photo(chat_id, png_bytes, caption=caption)
 
 # ===== BINANCE DATA =====
 def get_binance_price(symbol="LTCUSDT"):
-    url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol.upper()}"
-    r = requests.get(url, timeout=15)
-    r.raise_for_status()
-    return float(r.json()["price"])
+    price, _age = price_book.get(symbol)  # dari price book (1 request untuk semua simbol)
+    return price
 
 def get_klines(symbol="LTCUSDT", interval="5m", limit=500):
+    return cached_klines(symbol, interval, min(limit, 1000), _fetch_klines)
+
+def _fetch_klines(symbol, interval, limit):
     url = "https://api.binance.com/api/v3/klines"
     params = {"symbol": symbol.upper(), "interval": interval, "limit": min(limit, 1000)}
-    r = requests.get(url, params=params, timeout=20)
+    r = binance_client.get(url, params=params, timeout=20)
     r.raise_for_status()
-    data = r.json()
-    df = pd.DataFrame(data, columns=[
-        "open_time","open","high","low","close","volume",
-        "close_time","qav","trades","tbbav","tbqav","ignore"
-    ])
-    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
-    df.set_index("open_time", inplace=True)
-    for col in ["open","high","low","close","volume"]:
-        df[col] = df[col].astype(float)
-    return df[["open","high","low","close","volume"]]
-
-# ===== S/R =====
-def pivot_levels(h, l, c):
-    H1, L1, C1 = h[-2], l[-2], c[-2]
-    pp = (H1 + L1 + C1)/3
-    r1 = 2*pp - L1
-    s1 = 2*pp - H1
-    r2 = pp + (H1 - L1)
-    s2 = pp - (H1 - L1)
-    return [s1, s2], [r1, r2]
-
-def swing_levels(h, l, window=5):
-    highs, lows = [], []
-    for i in range(window, len(h)-window):
-        if h[i] == max(h[i-window:i+window+1]): highs.append(h[i])
-        if l[i] == min(l[i-window:i+window+1]): lows.append(l[i])
-    return sorted(set(highs)), sorted(set(lows))
-
-def pct_diff(a, b):
-    return abs(a - b) / b if b != 0 else 0
+    from kline_parse import parse_klines, klines_frame
+    return klines_frame(parse_klines(r.content))  # langsung ke numpy, tanpa DataFrame object
 
 # ===== CHARTING =====
-def make_chart_png(df, title="", mav=(SMA_FAST, SMA_SLOW)):
-    """Return PNG bytes of a candlestick chart with MAs."""
-    # mpf butuh kolom: Open, High, Low, Close, Volume (capitalized)
-    data = df.copy()
-    data.columns = ["Open","High","Low","Close","Volume"]
-
-    fig, ax = mpf.plot(
-        data,
-        type="candle",
-        mav=mav,
-        volume=False,
-        style="binance",
-        title=title,
-        returnfig=True,
-        figsize=(10, 5),
-        tight_layout=True,
-    )
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", dpi=160)
-    buf.seek(0)
-    try:
-        import matplotlib.pyplot as plt
-        plt.close(fig)
-    except:
-        pass
-    return buf.read()
+def make_chart_png(df, title="", mav=(SMA_FAST, SMA_SLOW), engine=None):
+    """Return PNG bytes of a candlestick chart with MAs (dirender di worker pool)."""
+    return render_chart("ma", df, title=title, mav=tuple(mav), engine=engine)
+
+def chart_args(text):
+    """Split a chart command; a trailing "fast"/"mpf" picks the chart engine."""
+    parts = text.split()
+    if len(parts) > 2 and parts[-1].lower() in CHART_ENGINES:
+        return parts[:-1], parts[-1].lower()
+    return parts, None
 
 # ===== STATE UNTUK CROSSOVER =====
 last_cross_state = None  # "bull", "bear", atau None
+alert_state = AlertState(ttl=ALERT_TTL, rearm_tol=REARM_TOL)  # anti-spam S/R, terbatas + re-arm
+pair_swings = None       # SwingTracker PAIR, cuma cek ulang bar terakhir tiap update
+scan_cross_state = {}    # simbol -> "bull"/"bear" untuk scanner
+
+# ===== LOGIKA ALERT =====
+def ma_engine(sym, ring):
+    """MA50/200 inkremental per simbol (revisi candle terbuka O(1); ring yang bergeser dihitung ulang)."""
+    from indicators import indicator_engine
+    eng = indicator_engine(sym, TIMEFRAME, sma_periods=(SMA_FAST, SMA_SLOW))
+    return eng.feed(ring.open_time, ring.close)
+
+def send_live_summary(rings):
+    live_msg = ["💹 *Live Price Update*"]
+    for sym in SYMBOLS:
+        if sym not in rings or not len(rings[sym]):
+            continue
+        eng = ma_engine(sym, rings[sym])
+        price = rings[sym].close[-1]
+        ma50  = eng.latest(f"sma{SMA_FAST}")
+        ma200 = eng.latest(f"sma{SMA_SLOW}")
+        t_icon = "📈" if ma50 > ma200 else ("📉" if ma50 < ma200 else "⚪")
+        live_msg.append(f"{t_icon} {sym}: {price:.2f} | MA{SMA_FAST}:{ma50:.2f} | MA{SMA_SLOW}:{ma200:.2f}")
+    send_text(TELEGRAM_CHAT_ID, "\n".join(live_msg))
+
+def check_pair_alerts(ring_p):
+    """S/R + crossover khusus PAIR."""
+    global last_cross_state, pair_swings
+    from alert_rules import sr_levels, cross_event  # aturan alert, dipakai juga oleh replay.py (numpy: lazy)
+    if pair_swings is None:
+        from swings import SwingTracker
+        pair_swings = SwingTracker(window=5)
+    cp = ring_p.close
+    hp = ring_p.high
+    lp = ring_p.low
+    price_p = cp[-1]
+
+    with metrics.timer("compute"):
+        # S/R
+        swing_res, swing_sup = pair_swings.update(ring_p.open_time, hp, lp)
+        supports, resistances = sr_levels(hp, lp, cp, swing_res, swing_sup)
+
+        # Tren
+        eng = ma_engine(PAIR, ring_p)
+        ma50_p  = eng.history(f"sma{SMA_FAST}", 2)
+        ma200_p = eng.history(f"sma{SMA_SLOW}", 2)
+        trend_up = ma50_p[-1] > ma200_p[-1]
+        trend_down = ma50_p[-1] < ma200_p[-1]
+
+    # Alert S/R (tanpa gambar agar tidak spam)
+    for s in alert_state.check(PAIR, "SUP", supports, price_p, NEAR_TOL):
+        send_text(TELEGRAM_CHAT_ID,
+                  f"🟢 SUPPORT TEST {PAIR}: {price_p:.2f} dekat {s:.2f} "
+                  f"({'tren naik' if trend_up else 'netral/bear'})")
+    for r in alert_state.check(PAIR, "RES", resistances, price_p, NEAR_TOL):
+        send_text(TELEGRAM_CHAT_ID,
+                  f"🔴 RESISTANCE TEST {PAIR}: {price_p:.2f} dekat {r:.2f} "
+                  f"({'tren turun' if trend_down else 'netral/bull'})")
+
+    # Crossover MA50/200 (dengan chart)
+    if eng.count - SMA_SLOW + 1 > 2:
+        cross, last_cross_state = cross_event(ma50_p[-2], ma200_p[-2], ma50_p[-1], ma200_p[-1], last_cross_state)
+
+        if cross == "golden":
+            png = make_chart_png(ring_p.to_frame(tail=200), title=f"{PAIR} {TIMEFRAME} — Golden Cross")
+            caption = (f"🟢 *GOLDEN CROSS* {PAIR}\n"
+                       f"MA{SMA_FAST} potong MA{SMA_SLOW} naik\n"
+                       f"Harga: {price_p:.2f}")
+            send_photo(TELEGRAM_CHAT_ID, png, caption)
+
+        if cross == "death":
+            png = make_chart_png(ring_p.to_frame(tail=200), title=f"{PAIR} {TIMEFRAME} — Death Cross")
+            caption = (f"🔴 *DEATH CROSS* {PAIR}\n"
+                       f"MA{SMA_FAST} potong MA{SMA_SLOW} turun\n"
+                       f"Harga: {price_p:.2f}")
+            send_photo(TELEGRAM_CHAT_ID, png, caption)
+
+# ===== SCANNER WATCHLIST =====
+def scan_watchlist_symbols():
+    if SCAN_SYMBOLS == ["USDT"]:
+        return price_book.symbols(quote="USDT")[:SCAN_MAX]
+    return SCAN_SYMBOLS[:SCAN_MAX]
+
+def run_watchlist_scan():
+    """S/R + crossover untuk semua simbol watchlist sekaligus (numpy 2D), 1 pesan ringkasan."""
+    syms = scan_watchlist_symbols()
+    if not syms:
+        return
+    from scanner import stack_rings, scan, hits
+    rings, errors = scan_candles.refresh_many(syms, TIMEFRAME)
+    rings = {s: r for s, r in rings.items() if len(r)}
+    if not rings:
+        return
+    symbols, c, h, l = stack_rings(rings, KLIMIT)
+    with metrics.timer("compute"):
+        res = scan(symbols, c, h, l, fast=SMA_FAST, slow=SMA_SLOW, near_tol=NEAR_TOL)
+
+    for sym, price in zip(res["symbols"], res["price"]):
+        alert_state.observe(sym, price)  # re-arm level yang sudah ditinggal harga
+    prices = dict(zip(res["symbols"], res["price"]))
+
+    lines = []
+    for sym, kind, val in hits(res):
+        if kind == "golden_cross" and scan_cross_state.get(sym) != "bull":
+            scan_cross_state[sym] = "bull"
+            lines.append(f"🟢 GOLDEN CROSS {sym} @ {val:.6g}")
+        elif kind == "death_cross" and scan_cross_state.get(sym) != "bear":
+            scan_cross_state[sym] = "bear"
+            lines.append(f"🔴 DEATH CROSS {sym} @ {val:.6g}")
+        elif kind in ("support", "resistance"):
+            if alert_state.check(sym, "SUP" if kind == "support" else "RES", [val], prices[sym], NEAR_TOL):
+                icon = "🟢 SUPPORT" if kind == "support" else "🔴 RESISTANCE"
+                lines.append(f"{icon} TEST {sym} dekat {val:.6g}")
+    if lines:
+        send_text(TELEGRAM_CHAT_ID, "🔎 *Scanner*\n" + "\n".join(lines))
 
 # ===== LOOP OTOMATIS =====
 def auto_loop():
-    global last_cross_state
+    metrics.set_labels("auto", PAIR)
     send_text(TELEGRAM_CHAT_ID, "🤖 Bot aktif: Live Price + S/R tiap 5 menit + MA50/200 crossover alert dengan chart.")
 
-    last_alerts = set()  # anti-spam untuk S/R
     while True:
         try:
-            # ---------- Live price agregat ----------
-            live_msg = ["💹 *Live Price Update*"]
-            for sym in SYMBOLS:
-                df = get_klines(sym, TIMEFRAME, KLIMIT)
-                c = df["close"].to_numpy()
-                price = c[-1]
-                ma50  = pd.Series(c).rolling(SMA_FAST).mean().iloc[-1]
-                ma200 = pd.Series(c).rolling(SMA_SLOW).mean().iloc[-1]
-                t_icon = "📈" if ma50 > ma200 else ("📉" if ma50 < ma200 else "⚪")
-                live_msg.append(f"{t_icon} {sym}: {price:.2f} | MA{SMA_FAST}:{ma50:.2f} | MA{SMA_SLOW}:{ma200:.2f}")
-            send_text(TELEGRAM_CHAT_ID, "\n".join(live_msg))
-
-            # ---------- S/R + Crossover khusus PAIR ----------
-            dfp = get_klines(PAIR, TIMEFRAME, KLIMIT)
-            cp = dfp["close"].to_numpy()
-            hp = dfp["high"].to_numpy()
-            lp = dfp["low"].to_numpy()
-            price_p = cp[-1]
-
-            # S/R
-            sup_piv, res_piv = pivot_levels(hp, lp, cp)
-            swing_res, swing_sup = swing_levels(hp, lp)
-            supports = sorted(set(sup_piv + swing_sup))
-            resistances = sorted(set(res_piv + swing_res))
-
-            # Tren
-            ma50_p  = pd.Series(cp).rolling(SMA_FAST).mean()
-            ma200_p = pd.Series(cp).rolling(SMA_SLOW).mean()
-            trend_up = ma50_p.iloc[-1] > ma200_p.iloc[-1]
-            trend_down = ma50_p.iloc[-1] < ma200_p.iloc[-1]
-
-            # Alert S/R (tanpa gambar agar tidak spam)
-            for s in supports:
-                if pct_diff(price_p, s) <= NEAR_TOL:
-                    aid = f"{PAIR}-SUP-{s:.2f}"
-                    if aid not in last_alerts:
-                        last_alerts.add(aid)
-                        send_text(TELEGRAM_CHAT_ID,
-                                  f"🟢 SUPPORT TEST {PAIR}: {price_p:.2f} dekat {s:.2f} "
-                                  f"({'tren naik' if trend_up else 'netral/bear'})")
-            for r in resistances:
-                if pct_diff(price_p, r) <= NEAR_TOL:
-                    aid = f"{PAIR}-RES-{r:.2f}"
-                    if aid not in last_alerts:
-                        last_alerts.add(aid)
-                        send_text(TELEGRAM_CHAT_ID,
-                                  f"🔴 RESISTANCE TEST {PAIR}: {price_p:.2f} dekat {r:.2f} "
-                                  f"({'tren turun' if trend_down else 'netral/bull'})")
-
-            # Crossover MA50/200 (dengan chart)
-            if len(ma200_p.dropna()) > 2:
-                prev_fast = ma50_p.iloc[-2]
-                prev_slow = ma200_p.iloc[-2]
-                curr_fast = ma50_p.iloc[-1]
-                curr_slow = ma200_p.iloc[-1]
-
-                cross_up = prev_fast <= prev_slow and curr_fast > curr_slow  # Golden Cross
-                cross_dn = prev_fast >= prev_slow and curr_fast < curr_slow  # Death Cross
-
-                if cross_up and last_cross_state != "bull":
-                    last_cross_state = "bull"
-                    png = make_chart_png(dfp.tail(200), title=f"{PAIR} {TIMEFRAME} — Golden Cross")
-                    caption = (f"🟢 *GOLDEN CROSS* {PAIR}\n"
-                               f"MA{SMA_FAST} potong MA{SMA_SLOW} naik\n"
-                               f"Harga: {price_p:.2f}")
-                    send_photo(TELEGRAM_CHAT_ID, png, caption)
-
-                if cross_dn and last_cross_state != "bear":
-                    last_cross_state = "bear"
-                    png = make_chart_png(dfp.tail(200), title=f"{PAIR} {TIMEFRAME} — Death Cross")
-                    caption = (f"🔴 *DEATH CROSS* {PAIR}\n"
-                               f"MA{SMA_FAST} potong MA{SMA_SLOW} turun\n"
-                               f"Harga: {price_p:.2f}")
-                    send_photo(TELEGRAM_CHAT_ID, png, caption)
-
+            # semua simbol diambil paralel: 1 siklus ~ 1 round trip
+            rings, errors = candles.refresh_many(SYMBOLS + [PAIR], TIMEFRAME)
+            for sym, err in errors.items():
+                print("fetch error:", sym, err)
+            send_live_summary(rings)
+            if PAIR in errors:
+                raise errors[PAIR]
+            check_pair_alerts(rings[PAIR])
+            run_watchlist_scan()
             time.sleep(ALERT_INTERVAL)
 
         except Exception as e:
@@ -212,11 +224,61 @@ def auto_loop():
                 pass
             time.sleep(30)
 
+# ===== MODE STREAMING (WebSocket) =====
+# thread WebSocket cuma mencatat event terbaru per simbol; scan/REST/chart jalan di stream_worker,
+# jadi socket tetap dibaca (ping tidak timeout, tidak reconnect + backfill gap)
+stream_events = {}  # sym -> (snapshot ring, closed) terbaru yang belum diproses
+stream_cond = threading.Condition()
+
+def on_stream_update(sym, ring, closed):
+    """Dipanggil tiap pesan kline di thread WebSocket: catat lalu langsung return."""
+    if sym != PAIR or not len(ring):
+        return
+    snap = ring.snapshot()
+    with stream_cond:
+        prev = stream_events.get(sym)
+        # event lama ditimpa, tapi candle yang sudah tutup jangan sampai hilang
+        stream_events[sym] = (snap, closed or (prev is not None and prev[1]))
+        stream_cond.notify()
+
+def stream_worker():
+    """S/R & crossover per event, ringkasan + scan saat candle PAIR tutup."""
+    metrics.set_labels("stream", PAIR)
+    while True:
+        with stream_cond:
+            while not stream_events:
+                stream_cond.wait()
+            events = dict(stream_events)
+            stream_events.clear()
+        for sym, (ring, closed) in events.items():
+            try:
+                check_pair_alerts(ring)
+                if closed:
+                    send_live_summary({s: candles.get(s, TIMEFRAME) for s in SYMBOLS})
+                    run_watchlist_scan()
+            except Exception as e:
+                print("stream alert error:", e)
+
+def start_stream():
+    from kline_stream import KlineStream
+    send_text(TELEGRAM_CHAT_ID, "🤖 Bot aktif (streaming): Live Price + S/R realtime + MA50/200 crossover alert dengan chart.")
+    threading.Thread(target=stream_worker, name="stream-alerts", daemon=True).start()
+    watched = set(SYMBOLS) | {PAIR}
+    return KlineStream(candles, watched, TIMEFRAME, on_update=on_stream_update).start()
+
 # ===== TELEGRAM COMMANDS =====
 @app.route(f"/{TELEGRAM_TOKEN}", methods=["POST"])
 def telegram_webhook():
+    update = request.get_json(silent=True)
+    with metrics.track_command(((update or {}).get("message") or {}).get("text")):
+        return handle_update(update)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+def handle_update(update):
     try:
-        update = request.get_json()
         if not update or "message" not in update:
             return "ok", 200
 
@@ -227,34 +289,41 @@ def telegram_webhook():
         # /price <coin>  -> contoh: /price eth
         if text.startswith("/price"):
             parts = text.split()
-            if len(parts) == 2:
-                coin = parts[1].upper()
-                symbol = f"{coin}USDT"
+            if len(parts) >= 2:
+                symbols = [f"{coin.upper()}USDT" for coin in parts[1:]]
                 try:
-                    p = get_binance_price(symbol)
-                    send_text(chat_id, f"💰 Harga {symbol}: {p:.4f} USDT", parse=None)
+                    lines = []
+                    for symbol, hit in price_book.get_many(symbols).items():
+                        if hit is None:
+                            lines.append(f"❌ {symbol} tidak ditemukan")
+                        else:
+                            lines.append(f"💰 Harga {symbol}: {hit[0]:.4f} USDT ({format_age(hit[1])} lalu)")
+                    send_text(chat_id, "\n".join(lines), parse=None)
                 except Exception as e:
                     send_text(chat_id, f"❌ Gagal ambil harga: {e}", parse=None)
             else:
-                send_text(chat_id, "⚠️ Format: /price eth", parse=None)
+                send_text(chat_id, "⚠️ Format: /price eth (bisa banyak: /price btc eth ltc)", parse=None)
 
         # /chart <coin>  -> kirim chart candle + MA50/200
         elif text.startswith("/chart"):
-            parts = text.split()
+            parts, engine = chart_args(text)
             if len(parts) == 2:
                 coin = parts[1].upper()
                 symbol = f"{coin}USDT"
                 try:
                     df = get_klines(symbol, TIMEFRAME, 220)
-                    png = make_chart_png(df.tail(200), title=f"{symbol} {TIMEFRAME}")
+                    png = cached_chart("ma", symbol, TIMEFRAME, df,
+                                       lambda: make_chart_png(df.tail(200), title=f"{symbol} {TIMEFRAME}",
+                                                              engine=engine),
+                                       engine=engine)
                     send_photo(chat_id, png, caption=f"📈 {symbol} {TIMEFRAME} (MA{SMA_FAST}/{SMA_SLOW})")
                 except Exception as e:
                     send_text(chat_id, f"❌ Gagal buat chart: {e}", parse=None)
             else:
-                send_text(chat_id, "⚠️ Format: /chart eth", parse=None)
+                send_text(chat_id, "⚠️ Format: /chart eth [fast]", parse=None)
 
         else:
-            send_text(chat_id, "Perintah tersedia:\n/price <coin>\n/chart <coin>", parse=None)
+            send_text(chat_id, "Perintah tersedia:\n/price <coin>\n/chart <coin> [fast]", parse=None)
 
         return "ok", 200
     except Exception as e:
@@ -265,16 +334,20 @@ def telegram_webhook():
 def set_webhook():
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/setWebhook"
     data = {"url": f"{WEBHOOK_URL}/{TELEGRAM_TOKEN}"}
-    r = requests.post(url, data=data, timeout=20)
+    r = http_client.post(url, data=data, timeout=20)
     print(r.json())
 
 # ===== START =====
 def start_threads():
-    import threading
+    if STREAM_MODE:
+        start_stream()
+        return
     t = threading.Thread(target=auto_loop, daemon=True)
     t.start()
 
 if __name__ == "__main__":
+    start_warmup()
+    price_book.start()  # /price & scanner baca dari memori
     set_webhook()
     start_threads()
-    app.run(host="0.0.0.0", port=5000)
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
@@ -1,14 +1,17 @@
 import os
-import io
-import requests
-import pandas as pd
-import mplfinance as mpf
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import http_client
+import binance_client
+import metrics
 from flask import Flask, request
 import time
 import threading
+from kline_cache import cached_klines
+from price_book import price_book, format_age
+from chart_cache import cached_chart
+from telegram_outbox import Outbox
+from render_pool import render_chart
+from warmup import start_warmup  # stack chart/analytics dimuat lazy, warmup di background
+from leader import Lease, LEADER_DB  # gunicorn multi-worker: cuma 1 proses jalankan loop terjadwal
 
 # ===== CONFIG =====
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -18,116 +21,67 @@ WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # contoh: https://yourapp-production.up.
 TIMEFRAME = "1h"   # timeframe default
 SMA_FAST = 50
 SMA_SLOW = 200
+CHART_ENGINES = ("fast", "mpf")  # /chart eth fast: renderer tanpa mplfinance
+STREAM_MODE = os.getenv("STREAM_MODE", "0") == "1"  # candle auto_loop dari WebSocket, bukan REST
+AUTO_PAIR = "LTCUSDT"
 
 app = Flask(__name__)
 
 # ===== TELEGRAM =====
+# pesan keluar lewat antrian: langsung return, dikirim worker outbox sesuai rate limit Telegram
+outbox = Outbox(f"https://api.telegram.org/bot{TELEGRAM_TOKEN}")
+
 def send_text(chat_id, msg, parse="Markdown"):
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        requests.post(url, data={"chat_id": chat_id, "text": msg, "parse_mode": parse})
-    except Exception as e:
-        print("send_text error:", e)
+    outbox.send_text(chat_id, msg, parse_mode=parse)
 
 def send_photo(chat_id, png_bytes, caption=None):
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendPhoto"
-        files = {"photo": ("chart.png", png_bytes)}
-        data = {"chat_id": chat_id}
-        if caption:
-            data["caption"] = caption
-        requests.post(url, data=data, files=files, timeout=30)
-    except Exception as e:
-        print("send_photo error:", e)
+    outbox.send_photo(chat_id, png_bytes, caption=caption)
 
 # ===== BINANCE DATA =====
 def get_binance_price(symbol="BTCUSDT"):
-    url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol.upper()}"
-    r = requests.get(url, timeout=15)
-    r.raise_for_status()
-    return float(r.json()["price"])
+    price, _age = price_book.get(symbol)  # dari price book (1 request untuk semua simbol)
+    return price
 
 def get_klines(symbol="BTCUSDT", interval="1h", limit=200):
+    return cached_klines(symbol, interval, limit, _fetch_klines)
+
+def _fetch_klines(symbol, interval, limit):
     url = "https://api.binance.com/api/v3/klines"
     params = {"symbol": symbol.upper(), "interval": interval, "limit": limit}
-    r = requests.get(url, params=params, timeout=20)
-    data = r.json()
-    df = pd.DataFrame(data, columns=[
-        "open_time","open","high","low","close","volume",
-        "close_time","qav","trades","tbbav","tbqav","ignore"
-    ])
-    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
-    df.set_index("open_time", inplace=True)
-    for col in ["open","high","low","close","volume"]:
-        df[col] = df[col].astype(float)
-    return df[["open","high","low","close","volume"]]
+    r = binance_client.get(url, params=params, timeout=20)
+    from kline_parse import parse_klines, klines_frame
+    return klines_frame(parse_klines(r.content))  # langsung ke numpy, tanpa DataFrame object
 
 # ===== CHART MA =====
-def make_chart_png(df, title="", mav=(SMA_FAST, SMA_SLOW)):
-    data = df.copy()
-    data.columns = ["Open","High","Low","Close","Volume"]
-
-    fig, ax = mpf.plot(
-        data,
-        type="candle",
-        mav=mav,
-        volume=False,
-        style="binance",
-        title=title,
-        returnfig=True,
-        figsize=(10, 5),
-        tight_layout=True,
-    )
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", dpi=160)
-    buf.seek(0)
-    plt.close(fig)
-    return buf.read()
+def make_chart_png(df, title="", mav=(SMA_FAST, SMA_SLOW), engine=None):
+    return render_chart("ma", df, title=title, mav=tuple(mav), engine=engine)
 
 # ===== FIBONACCI CHART =====
-def fibonacci_levels(df):
-    high = df["high"].max()
-    low = df["low"].min()
-    diff = high - low
-    levels = {
-        "0.236": high - diff * 0.236,
-        "0.382": high - diff * 0.382,
-        "0.5":   high - diff * 0.5,
-        "0.618": high - diff * 0.618,
-        "0.786": high - diff * 0.786,
-    }
-    return high, low, levels
-
-def make_fibo_chart(symbol="BTCUSDT", interval="1h", limit=200):
-    df = get_klines(symbol, interval, limit)
-    high, low, levels = fibonacci_levels(df)
-
-    mc = mpf.make_marketcolors(up="g", down="r", inherit=True)
-    s  = mpf.make_mpf_style(marketcolors=mc)
-    fig, ax = mpf.plot(
-        df, type="candle", style=s, figsize=(10,5),
-        returnfig=True, title=f"{symbol} {interval} — Fibonacci Retracement"
-    )
-
-    for label, lvl in levels.items():
-        if lvl < (high + low)/2:  # support (buy)
-            ax[0].axhline(lvl, color="green", linestyle="--", alpha=0.8)
-            ax[0].text(df.index[-1], lvl, f" BUY {label}", color="green")
-        else:  # resistance (sell)
-            ax[0].axhline(lvl, color="red", linestyle="--", alpha=0.8)
-            ax[0].text(df.index[-1], lvl, f" SELL {label}", color="red")
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=150)
-    buf.seek(0)
-    plt.close(fig)
-    return buf.read()
+def make_fibo_chart(symbol="BTCUSDT", interval="1h", limit=200, df=None, engine=None):
+    if df is None:
+        df = get_klines(symbol, interval, limit)
+    return render_chart("fibo", df, title=f"{symbol} {interval} — Fibonacci Retracement", engine=engine)
+
+def chart_args(text):
+    """Split a chart command; a trailing "fast"/"mpf" picks the chart engine."""
+    parts = text.split()
+    if len(parts) > 2 and parts[-1].lower() in CHART_ENGINES:
+        return parts[:-1], parts[-1].lower()
+    return parts, None
 
 # ===== TELEGRAM COMMANDS =====
 @app.route(f"/{TELEGRAM_TOKEN}", methods=["POST"])
 def telegram_webhook():
+    update = request.get_json(silent=True)
+    with metrics.track_command(((update or {}).get("message") or {}).get("text")):
+        return handle_update(update)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+def handle_update(update):
     try:
-        update = request.get_json()
         if not update or "message" not in update:
             return "ok", 200
 
@@ -136,46 +90,56 @@ def telegram_webhook():
 
         if text.startswith("/price"):
             parts = text.split()
-            if len(parts) == 2:
-                coin = parts[1].upper()
-                symbol = f"{coin}USDT"
+            if len(parts) >= 2:
+                symbols = [f"{coin.upper()}USDT" for coin in parts[1:]]
                 try:
-                    p = get_binance_price(symbol)
-                    send_text(chat_id, f"💰 Harga {symbol}: {p:.4f} USDT", parse=None)
+                    lines = []
+                    for symbol, hit in price_book.get_many(symbols).items():
+                        if hit is None:
+                            lines.append(f"❌ {symbol} tidak ditemukan")
+                        else:
+                            lines.append(f"💰 Harga {symbol}: {hit[0]:.4f} USDT ({format_age(hit[1])} lalu)")
+                    send_text(chat_id, "\n".join(lines), parse=None)
                 except Exception as e:
                     send_text(chat_id, f"❌ Gagal ambil harga: {e}", parse=None)
             else:
-                send_text(chat_id, "⚠️ Format: /price eth", parse=None)
+                send_text(chat_id, "⚠️ Format: /price eth (bisa banyak: /price btc eth ltc)", parse=None)
 
         elif text.startswith("/chart"):
-            parts = text.split()
+            parts, engine = chart_args(text)
             if len(parts) == 2:
                 coin = parts[1].upper()
                 symbol = f"{coin}USDT"
                 try:
                     df = get_klines(symbol, TIMEFRAME, 220)
-                    png = make_chart_png(df.tail(200), title=f"{symbol} {TIMEFRAME}")
+                    png = cached_chart("ma", symbol, TIMEFRAME, df,
+                                       lambda: make_chart_png(df.tail(200), title=f"{symbol} {TIMEFRAME}",
+                                                              engine=engine),
+                                       engine=engine)
                     send_photo(chat_id, png, caption=f"📈 {symbol} {TIMEFRAME} (MA{SMA_FAST}/{SMA_SLOW})")
                 except Exception as e:
                     send_text(chat_id, f"❌ Gagal buat chart: {e}", parse=None)
             else:
-                send_text(chat_id, "⚠️ Format: /chart eth", parse=None)
+                send_text(chat_id, "⚠️ Format: /chart eth [fast]", parse=None)
 
         elif text.startswith("/now"):
-            parts = text.split()
+            parts, engine = chart_args(text)
             if len(parts) == 2:
                 coin = parts[1].upper()
                 symbol = f"{coin}USDT"
                 try:
-                    png = make_fibo_chart(symbol, TIMEFRAME, 200)
+                    df = get_klines(symbol, TIMEFRAME, 200)
+                    png = cached_chart("fibo", symbol, TIMEFRAME, df,
+                                       lambda: make_fibo_chart(symbol, TIMEFRAME, 200, df=df, engine=engine),
+                                       engine=engine)
                     send_photo(chat_id, png, caption=f"📊 {symbol} {TIMEFRAME}\nFibonacci Support/Resistance")
                 except Exception as e:
                     send_text(chat_id, f"❌ Gagal buat chart: {e}", parse=None)
             else:
-                send_text(chat_id, "⚠️ Format: /now eth", parse=None)
+                send_text(chat_id, "⚠️ Format: /now eth [fast]", parse=None)
 
         else:
-            send_text(chat_id, "Perintah:\n/price <coin>\n/chart <coin>\n/now <coin>", parse=None)
+            send_text(chat_id, "Perintah:\n/price <coin>\n/chart <coin> [fast]\n/now <coin> [fast]", parse=None)
 
         return "ok", 200
     except Exception as e:
@@ -183,10 +147,27 @@ def telegram_webhook():
         return "ok", 200
 
 # ===== AUTO LOOP LTCUSDT =====
+stream_candles = None  # CandleStore yang diisi KlineStream kalau STREAM_MODE
+lease = None           # Lease kalau LEADER_DB di-set (lihat gunicorn.conf.py)
+
+def is_leader():
+    return lease is None or lease.held
+
 def auto_loop():
+    metrics.set_labels("auto", AUTO_PAIR)
     while True:
+        if not is_leader():  # lease hilang (proses macet?): worker lain yang kirim
+            time.sleep(5)
+            continue
         try:
-            png = make_fibo_chart("LTCUSDT", TIMEFRAME, 200)
+            df = None
+            if stream_candles is not None:
+                ring = stream_candles.get(AUTO_PAIR, TIMEFRAME)
+                df = ring.to_frame() if len(ring) else None
+            if df is None:
+                df = get_klines(AUTO_PAIR, TIMEFRAME, 200)
+            png = cached_chart("fibo", AUTO_PAIR, TIMEFRAME, df,
+                               lambda: make_fibo_chart(AUTO_PAIR, TIMEFRAME, 200, df=df))
             send_photo(
                 TELEGRAM_CHAT_ID,
                 png,
@@ -204,11 +185,37 @@ def auto_loop():
 def set_webhook():
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/setWebhook"
     data = {"url": f"{WEBHOOK_URL}/webhook/{TELEGRAM_TOKEN}"}
-    r = requests.post(url, data=data, timeout=20)
+    r = http_client.post(url, data=data, timeout=20)
     print(r.json())
 
+def start_stream():
+    global stream_candles
+    from candle_store import CandleStore
+    from kline_stream import KlineStream
+    stream_candles = CandleStore(capacity=200)
+    return KlineStream(stream_candles, [AUTO_PAIR], TIMEFRAME).start()
+
+def start_loops():
+    """Kerja terjadwal yang harus jalan di tepat 1 proses."""
+    if STREAM_MODE:
+        start_stream()
+    threading.Thread(target=auto_loop, daemon=True).start()
+    try:
+        set_webhook()
+    except Exception as e:
+        print("set_webhook error:", e)
+
+def start_background():
+    """Dipanggil sekali per proses: python main.py, atau tiap worker gunicorn."""
+    global lease
+    start_warmup()
+    price_book.start()  # tiap worker: /price dari memori, bukan request ke Binance
+    metrics.share()     # METRICS_DB: /metrics menjumlah semua worker
+    if LEADER_DB:
+        lease = Lease(LEADER_DB).run(on_elected=start_loops)  # failover kalau leader mati
+    else:
+        start_loops()
+
 if __name__ == "__main__":
-    set_webhook()
-    t = threading.Thread(target=auto_loop, daemon=True)
-    t.start()
-    app.run(host="0.0.0.0", port=5000)
+    start_background()
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
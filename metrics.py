@@ -0,0 +1,290 @@
+"""Per-stage latency histograms and counters in Prometheus text format.
+
+Handlers set the ``command``/``symbol`` labels once with ``labels(...)``;
+every ``timer(stage)`` inside (fetch, parse, compute, render, encode,
+upload, total) picks them up from a thread-local, so library code does not
+need to know which command it is serving. ``render()`` produces the body of
+the ``/metrics`` route. Observing costs a perf_counter pair, a dict lookup
+and a bisect under a lock.
+
+Under gunicorn each worker counts for itself; with METRICS_DB set every
+worker publishes its raw series to that SQLite file every METRICS_FLUSH
+seconds (``share()``), and ``render()`` in any worker sums all of them, so
+a scrape sees the whole service whichever worker answers it.
+"""
+import os
+import json
+import time
+import uuid
+import bisect
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LABELS = ("stage", "command", "symbol")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+MAX_SERIES = 2000  # label sets per metric; beyond that symbol is folded into "other"
+METRICS_DB = os.getenv("METRICS_DB", "")
+METRICS_FLUSH = float(os.getenv("METRICS_FLUSH", 5))
+
+_ctx = threading.local()
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=LABELS, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def _row(self, key):
+        row = self._series.get(key)
+        if row is None:
+            if len(self._series) >= MAX_SERIES:
+                key = key[:-1] + ("other",)
+                row = self._series.get(key)
+            if row is None:
+                row = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        return row
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._row(label_values)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def state(self):
+        with self._lock:
+            return [[list(k), list(v)] for k, v in self._series.items()]
+
+    @staticmethod
+    def merge(states):
+        series = {}
+        for state in states:
+            for key, row in state:
+                key = tuple(key)
+                have = series.get(key)
+                series[key] = list(row) if have is None else [a + b for a, b in zip(have, row)]
+        return series
+
+    def samples(self, series=None):
+        if series is None:
+            with self._lock:
+                series = {k: list(v) for k, v in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, row in sorted(series.items()):
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            cumulative = 0
+            for le, n in zip(self.buckets, row):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {row[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {row[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {row[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=LABELS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            if label_values not in self._values and len(self._values) >= MAX_SERIES:
+                label_values = label_values[:-1] + ("other",)
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def state(self):
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    @staticmethod
+    def merge(states):
+        values = {}
+        for state in states:
+            for key, v in state:
+                key = tuple(key)
+                values[key] = values.get(key, 0) + v
+        return values
+
+    def samples(self, values=None):
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(values.items()):
+            labels = ",".join(f'{n}="{_escape(val)}"' for n, val in zip(self.labelnames, key))
+            lines.append(f"{self.name}{{{labels}}} {v}")
+        return lines
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_seconds = Histogram("autocut_stage_seconds", "Time spent per stage of a command.")
+stage_errors = Counter("autocut_stage_errors_total", "Stages that raised.")
+_registry = [stage_seconds, stage_errors]
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+# ===== LABEL CONTEXT =====
+def current_labels():
+    return getattr(_ctx, "command", "-"), getattr(_ctx, "symbol", "-")
+
+
+@contextmanager
+def labels(command="-", symbol="-"):
+    """Label every stage timed in this thread until the block exits."""
+    prev = current_labels()
+    _ctx.command, _ctx.symbol = command, (symbol or "-").upper()
+    try:
+        yield
+    finally:
+        _ctx.command, _ctx.symbol = prev
+
+
+def set_labels(command="-", symbol="-"):
+    """Labels for a long-lived thread (alert loops)."""
+    _ctx.command, _ctx.symbol = command, (symbol or "-").upper()
+
+
+def observe(stage, seconds):
+    stage_seconds.observe(seconds, stage, *current_labels())
+
+
+class timer:
+    """``with timer(stage):`` times the block under the current labels.
+
+    A plain class rather than @contextmanager: this sits on every HTTP call
+    and parse, so the generator overhead is worth avoiding.
+    """
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.t0)
+        if exc_type is not None:
+            stage_errors.inc(self.stage, *current_labels())
+        return False
+
+
+def render():
+    """Prometheus text exposition of every registered metric (all workers when shared)."""
+    states = None
+    if _shared is not None:
+        try:
+            states = _shared.collect()
+        except sqlite3.Error as e:
+            print("metrics collect error, serving this worker only:", e)
+    lines = []
+    for metric in _registry:
+        if states is None:
+            lines.extend(metric.samples())
+        else:
+            lines.extend(metric.samples(metric.merge(st.get(metric.name, []) for st in states)))
+    return "\n".join(lines) + "\n"
+
+
+# ===== MULTI-PROCESS =====
+class _Shared:
+    """One row per process in METRICS_DB with its raw series. Rows of exited
+    workers stay (their counts are part of the totals) until ``keep`` s old."""
+
+    def __init__(self, path, keep=24 * 3600):
+        self.path = path
+        self.keep = keep
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=2, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS metrics "
+                               "(owner TEXT PRIMARY KEY, updated REAL NOT NULL, state TEXT NOT NULL)")
+        return self._conn
+
+    def publish(self):
+        state = json.dumps({m.name: m.state() for m in _registry})
+        with self._lock:
+            self._db().execute("INSERT OR REPLACE INTO metrics VALUES (?, ?, ?)", (self.owner, time.time(), state))
+
+    def collect(self):
+        self.publish()
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM metrics WHERE updated < ?", (time.time() - self.keep,))
+            return [json.loads(row[0]) for row in db.execute("SELECT state FROM metrics")]
+
+
+_shared = None
+
+
+def share(path=METRICS_DB, every=METRICS_FLUSH):
+    """Publish this process's metrics to ``path`` every ``every`` seconds."""
+    global _shared
+    if not path or _shared is not None:
+        return
+    _shared = _Shared(path)
+
+    def run():
+        while True:
+            time.sleep(every)
+            flush()
+    threading.Thread(target=run, name="metrics-share", daemon=True).start()
+
+
+def flush():
+    if _shared is not None:
+        try:
+            _shared.publish()
+        except sqlite3.Error as e:
+            print("metrics publish error:", e)
+
+
+# ===== TELEGRAM COMMANDS =====
+COMMANDS = ("/price", "/chart", "/now", "/start", "/help")
+
+
+def command_labels(text):
+    """("/chart", "BTCUSDT") from a command text; unknown commands -> "other"."""
+    parts = (text or "").split()
+    if not parts or not parts[0].startswith("/"):
+        return "-", "-"
+    command = parts[0].lower().split("@")[0]
+    if command not in COMMANDS:
+        return "other", "-"
+    symbol = parts[1].upper() if len(parts) > 1 else "-"
+    if symbol != "-" and not symbol.endswith("USDT"):
+        symbol += "USDT"
+    return command, symbol
+
+
+@contextmanager
+def track_command(text):
+    """Label and time (stage "total") the handling of one command."""
+    command, symbol = command_labels(text)
+    with labels(command, symbol), timer("total"):
+        yield
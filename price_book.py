@@ -0,0 +1,110 @@
+"""In-memory last-price book for every Binance symbol.
+
+One request to the all-symbols ticker endpoint refreshes every price, so
+``/price`` is a dictionary lookup and ``/price btc eth ltc`` costs nothing
+extra. The entry points ``start()`` a background refresher at startup; the
+book still refreshes on demand once older than ``max_age``. When a refresh
+fails the last prices are served with their real age (retried after
+``max_age``); only an empty book raises.
+"""
+import os
+import time
+import threading
+
+import binance_client
+
+BINANCE_TICKER_URL = "https://api.binance.com/api/v3/ticker/price"
+
+
+class PriceBook:
+    def __init__(self, max_age=5.0, url=BINANCE_TICKER_URL):
+        self.max_age = max_age
+        self.url = url
+        self._prices = {}
+        self._updated = 0.0
+        self._retry_at = 0.0  # after a failed refresh: serve stale prices until then
+        self._lock = threading.Lock()
+        self._thread = None
+        self.refreshes = 0
+        self.lookups = 0
+
+    def refresh(self):
+        r = binance_client.get(self.url, timeout=10)
+        r.raise_for_status()
+        prices = {row["symbol"]: float(row["price"]) for row in r.json()}
+        self._prices, self._updated = prices, time.time()
+        self.refreshes += 1
+
+    def _ensure_fresh(self):
+        now = time.time()
+        if now - self._updated <= self.max_age or (self._prices and now < self._retry_at):
+            return
+        with self._lock:
+            # another thread may have refreshed while we waited for the lock
+            now = time.time()
+            if now - self._updated <= self.max_age or (self._prices and now < self._retry_at):
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                self._retry_at = now + self.max_age
+                if not self._prices:
+                    raise
+                print("price_book refresh error, serving stale prices:", e)
+
+    def get(self, symbol):
+        """(price, age_seconds); KeyError if Binance has no such symbol."""
+        self._ensure_fresh()
+        self.lookups += 1
+        return self._prices[symbol.upper()], time.time() - self._updated
+
+    def get_many(self, symbols):
+        """{symbol: (price, age) or None} after at most one refresh."""
+        self._ensure_fresh()
+        age = time.time() - self._updated
+        self.lookups += len(symbols)
+        out = {}
+        for s in symbols:
+            p = self._prices.get(s.upper())
+            out[s.upper()] = (p, age) if p is not None else None
+        return out
+
+    def __contains__(self, symbol):
+        """Listed on Binance; a dict lookup, unlike ``symbols()``."""
+        self._ensure_fresh()
+        return symbol.upper() in self._prices
+
+    def symbols(self, quote=None):
+        """All listed symbols, optionally only those quoted in ``quote``."""
+        self._ensure_fresh()
+        return sorted(s for s in self._prices if quote is None or s.endswith(quote))
+
+    def start(self, interval=None):
+        """Keep the book warm from a daemon thread (once per process)."""
+        if self._thread is not None:
+            return self
+        interval = interval or self.max_age / 2
+
+        def run():
+            while True:
+                try:
+                    with self._lock:
+                        self.refresh()
+                except Exception as e:
+                    print("price_book refresh error:", e)
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=run, name="price-book", daemon=True)
+        self._thread.start()
+        return self
+
+    def stats(self):
+        return {"symbols": len(self._prices), "age_s": time.time() - self._updated if self._updated else None,
+                "refreshes": self.refreshes, "lookups": self.lookups}
+
+
+price_book = PriceBook(max_age=float(os.getenv("PRICE_BOOK_MAX_AGE", 5)))
+
+
+def format_age(seconds):
+    return f"{seconds:.0f}s" if seconds < 90 else f"{seconds / 60:.0f}m"
@@ -0,0 +1,53 @@
+"""Token bucket shared by the outbound Binance and Telegram clients."""
+import time
+import threading
+
+
+class TokenBucket:
+    """``capacity`` tokens refilled evenly over ``period`` seconds (or at ``rate``/s)."""
+
+    def __init__(self, capacity, period=60.0, rate=None):
+        self.capacity = float(capacity)
+        self.rate = rate if rate is not None else self.capacity / period
+        self.tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def delay(self, n=1):
+        """Seconds until ``n`` tokens are there, without taking them."""
+        n = min(float(n), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (n - self.tokens) / self.rate)
+
+    def reserve(self, n=1):
+        """Take ``n`` tokens; seconds to wait before they are really there."""
+        n = min(float(n), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= n
+            return max(0.0, -self.tokens / self.rate)
+
+    def release(self, n=1):
+        """Give back a reservation that will not be used."""
+        n = min(float(n), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + n)
+
+    def pause(self, seconds):
+        """Nothing available for ``seconds`` (server asked us to back off)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def sync(self, used, limit):
+        """Server says ``used`` of ``limit`` is spent this period."""
+        left = self.capacity - used * self.capacity / limit
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, left)
@@ -0,0 +1,143 @@
+"""Process pool for CPU-bound chart rendering.
+
+matplotlib/mplfinance hold the GIL, so a burst of /chart commands rendered
+on threads runs on one core. Here renders go to worker processes that have
+the charting stack imported and warmed up already. Jobs carry compact numpy
+OHLC arrays (charts.pack_ohlc) plus plain options and return PNG bytes.
+
+RENDER_WORKERS=0 renders in-process (no pool).
+"""
+import os
+import sys
+import time
+import threading
+import multiprocessing as mp
+
+import metrics
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 2))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", 30))
+RENDER_MAX_JOBS = int(os.getenv("RENDER_MAX_JOBS", 50))  # recycle worker after N jobs
+
+
+def _init_worker():
+    import charts
+    charts.prewarm()
+
+
+def _mp_context():
+    # forkserver: workers fork from a clean server with charts preloaded, so
+    # recycling is cheap and the Flask threads of the parent are not forked
+    if sys.platform.startswith("linux"):
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload(["charts"])
+        return ctx
+    return mp.get_context("spawn")
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+class RenderPool:
+    def __init__(self, workers=RENDER_WORKERS, timeout=RENDER_TIMEOUT, max_jobs=RENDER_MAX_JOBS):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self._pool = None
+        self._lock = threading.Lock()
+        self._waiting = set()  # done-events of the renders in flight on self._pool
+        self.jobs = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = _mp_context().Pool(
+                    self.workers, initializer=_init_worker, maxtasksperchild=self.max_jobs)
+            return self._pool
+
+    def start(self):
+        """Create the pool now so workers warm up before the first request."""
+        self._get_pool()
+        return self
+
+    def _restart(self, pool):
+        # a hung render can only be stopped by killing its worker, and Pool
+        # cannot kill a single one: replace the whole pool
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self.restarts += 1
+                waiting, self._waiting = self._waiting, set()
+            else:
+                waiting = ()
+        pool.terminate()
+        # their workers are gone too: wake the other renders so they fail now
+        # instead of each waiting out its own timeout
+        for done in waiting:
+            done.set()
+
+    def render(self, kind, df, **options):
+        import charts
+        t0 = time.perf_counter()
+        pool = self._get_pool()
+        done = threading.Event()
+        job = pool.apply_async(charts.render_packed, (kind, charts.pack_ohlc(df), options),
+                               callback=lambda _: done.set(), error_callback=lambda _: done.set())
+        with self._lock:
+            self.jobs += 1
+            recycled = self._pool is not pool
+            if not recycled:
+                self._waiting.add(done)
+        finished = recycled or done.wait(self.timeout)
+        with self._lock:
+            self._waiting.discard(done)
+        if not finished:
+            metrics.stage_errors.inc("render", *metrics.current_labels())
+            with self._lock:
+                self.timeouts += 1
+            self._restart(pool)
+            raise RenderTimeout(f"chart render exceeded {self.timeout}s")
+        if not job.ready():
+            metrics.stage_errors.inc("render", *metrics.current_labels())
+            raise RenderTimeout("chart render aborted: the pool was restarted after another render timed out")
+        png, render_s, encode_s = job.get()
+        metrics.observe("render", render_s)
+        metrics.observe("encode", encode_s)
+        # packing, IPC and waiting for a free worker
+        metrics.observe("render_queue", max(time.perf_counter() - t0 - render_s - encode_s, 0.0))
+        return png
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "jobs": self.jobs,
+                    "timeouts": self.timeouts, "restarts": self.restarts}
+
+
+render_pool = RenderPool() if RENDER_WORKERS > 0 else None
+
+
+def start_render_pool():
+    """Pre-warm workers at startup (no-op when RENDER_WORKERS=0)."""
+    if render_pool is not None:
+        render_pool.start()
+
+
+def render_chart(kind, df, **options):
+    """Render ``charts.RENDERERS[kind]`` in the pool, or inline if disabled."""
+    if render_pool is None:
+        import charts
+        png, render_s, encode_s = charts.render_timed(kind, df, **options)
+        metrics.observe("render", render_s)
+        metrics.observe("encode", encode_s)
+        return png
+    return render_pool.render(kind, df, **options)
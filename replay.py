@@ -0,0 +1,226 @@
+"""Replay m1ain.py's pair alert rules over stored candle history.
+
+Answers "how noisy would the S/R-test and cross alerts have been" from
+history instead of by waiting. For every symbol the rules of
+``alert_rules`` run as if the auto_loop had checked once per bar, with the
+ring window ending at that bar and its close as the price:
+
+* MA crosses, pivot and swing levels and the NEAR_TOL test are evaluated
+  for all bars at once with numpy (``cross_events``, ``level_hits``);
+* the AlertState de-duplication is exact but event driven: a fired level
+  stays fired until the price leaves its re-arm window or the TTL runs out,
+  which depends on the price path only. So each fire marks every later hit
+  it suppresses in one vectorized step, and Python only loops over fires,
+  not over bars.
+
+    python replay.py                          # every symbol under HISTORY_DIR, 5m, last 365 days
+    python replay.py BTCUSDT ETHUSDT --days 90 --out alerts.csv
+    python replay.py --json klines_BTCUSDT_5m.json   # recorded /api/v3/klines bodies
+
+Symbols are independent, so ``--workers`` (default: one per CPU) replays
+them in parallel processes, each loading its own candles.
+
+Defaults are m1ain.py's settings (NEAR_TOL 0.3%, re-arm 0.6%, TTL 24h,
+MA50/200, 300-candle window, swing window 5). Unlike the live bot, the
+replay keeps each symbol's fired levels apart, so the AlertState
+``max_entries`` cap does not apply.
+"""
+import os
+import re
+import sys
+import csv
+import time
+import argparse
+import multiprocessing as mp
+
+import numpy as np
+
+from alert_rules import sma, cross_events, level_hits
+from alert_state import level_key
+from kline_cache import INTERVAL_MS
+
+NEAR_TOL = 0.003
+REARM_TOL = 2 * NEAR_TOL
+ALERT_TTL = 24 * 3600
+SMA_FAST = 50
+SMA_SLOW = 200
+LOOKBACK = 300   # m1ain KLIMIT
+SWING_WINDOW = 5
+_CHUNK = 256
+
+
+def _key6(x):
+    """level_key for arrays (6 significant digits)."""
+    e = np.floor(np.log10(np.abs(np.where(x == 0, 1.0, x)))) - 5
+    up = e < 0
+    scale = 10.0 ** np.abs(e)
+    return np.where(up, np.round(x * scale) / scale, np.round(x / scale) * scale)
+
+
+def _window(x, tol):
+    # alert_state._window for arrays
+    return x / (1 + tol) * (1 - 1e-12), x / (1 - tol) * (1 + 1e-12)
+
+
+def dedupe(times, close, bars, levels, tol=NEAR_TOL, rearm_tol=REARM_TOL, ttl=ALERT_TTL):
+    """Which hits AlertState.check would let through, for one symbol and side.
+
+    ``times`` (seconds) and ``close`` are per bar; ``bars``/``levels`` are the
+    hits sorted by bar then level. Returns a boolean mask over the hits.
+    """
+    n, nbars = len(bars), len(close)
+    fired = np.zeros(n, dtype=bool)
+    done = np.zeros(n, dtype=bool)   # fired or suppressed
+    near_lo, near_hi = _window(_key6(levels), tol)
+    keep_lo, keep_hi = _window(close, rearm_tol)
+    expiry = np.searchsorted(times, times + ttl, side="right")  # first bar past each bar's TTL
+    j = 0
+    while j < n:
+        j += int(done[j:j + _CHUNK].argmin())
+        if done[j]:
+            j += 1  # the whole chunk was suppressed
+            continue
+        fired[j] = done[j] = True
+        k, t0 = level_key(levels[j]), int(bars[j])
+        # the key is dropped at the first later bar whose price leaves its
+        # re-arm window, or once it is older than the TTL
+        death, end = t0 + 1, min(int(expiry[t0]), nbars)
+        step = 16
+        while death < end:
+            seg = slice(death, min(death + step, end))
+            gone = (keep_lo[seg] > k) | (keep_hi[seg] < k)
+            if gone.any():
+                death += int(gone.argmax())
+                break
+            death, step = seg.stop, step * 4
+        stop = int(bars.searchsorted(death, side="left"))
+        span = slice(j + 1, stop)
+        done[span] |= (near_lo[span] <= k) & (k <= near_hi[span])
+        j += 1
+    return fired
+
+
+def replay_symbol(symbol, arrays, near_tol=NEAR_TOL, rearm_tol=REARM_TOL, ttl=ALERT_TTL,
+                  fast=SMA_FAST, slow=SMA_SLOW, lookback=LOOKBACK, window=SWING_WINDOW):
+    """Alerts for one symbol's candles (parse_klines arrays): (alerts, stats)."""
+    t = np.asarray(arrays["open_time"], dtype=np.int64)
+    c, h, l = (np.asarray(arrays[f], dtype=np.float64) for f in ("close", "high", "low"))
+    times = t // 1000
+    ma_fast, ma_slow = sma(c, fast), sma(c, slow)
+    trend_up, trend_down = ma_fast > ma_slow, ma_fast < ma_slow
+
+    alerts = []
+    stats = {"symbol": symbol, "bars": len(t)}
+    for side, (bars, levels) in level_hits(h, l, c, near_tol, lookback, window).items():
+        keep = dedupe(times, c, bars, levels, near_tol, rearm_tol, ttl)
+        stats[f"{side.lower()}_hits"] = len(bars)
+        stats[f"{side.lower()}_alerts"] = int(keep.sum())
+        trend = trend_up if side == "SUP" else trend_down
+        for b, v in zip(bars[keep], levels[keep]):
+            alerts.append((int(t[b]), symbol, "support" if side == "SUP" else "resistance",
+                           float(v), float(c[b]), bool(trend[b])))
+    cross_bars, kinds = cross_events(ma_fast, ma_slow, min_bar=slow + 1)
+    stats["crosses"] = len(cross_bars)
+    for b, kind in zip(cross_bars, kinds):
+        alerts.append((int(t[b]), symbol, f"{kind}_cross", float(c[b]), float(c[b]), kind == "golden"))
+    alerts.sort()
+    days = (t[-1] - t[0]) / 86_400_000 if len(t) > 1 else 0
+    stats["alerts_per_day"] = round(len(alerts) / float(days), 2) if days else 0.0
+    return alerts, stats
+
+
+# ===== INPUT =====
+def history_symbols(interval, root=None):
+    from kline_history import HISTORY_DIR
+    root = root or HISTORY_DIR
+    if not os.path.isdir(root):
+        return []
+    return sorted(s for s in os.listdir(root) if os.path.isdir(os.path.join(root, s, interval)))
+
+
+def load_history(symbol, interval, days):
+    from kline_history import KlineHistory
+    hist = KlineHistory(symbol, interval, offline=True)
+    last = hist.last_open_time
+    if last is None:
+        return None
+    # LOOKBACK + slow MA worth of warm-up before the replayed period
+    start = last - days * 86_400_000 - (LOOKBACK + SMA_SLOW) * INTERVAL_MS[interval]
+    return {k: np.asarray(v) for k, v in hist.read(start=start).items()}
+
+
+def load_json(path):
+    from kline_parse import parse_klines
+    with open(path, "rb") as fh:
+        arrays = parse_klines(fh.read())
+    m = re.search(r"klines_([A-Z0-9]+)_", os.path.basename(path))
+    return (m.group(1) if m else os.path.basename(path)), arrays
+
+
+def _replay_job(job):
+    source, symbol, interval, days, kwargs = job
+    if source == "json":
+        symbol, arrays = load_json(symbol)
+    else:
+        arrays = load_history(symbol, interval, days)
+    if arrays is None or len(arrays["open_time"]) < LOOKBACK:
+        return symbol, None, None
+    return (symbol,) + replay_symbol(symbol, arrays, **kwargs)
+
+
+# ===== CLI =====
+def main(argv):
+    ap = argparse.ArgumentParser(description="Replay the m1ain.py alert rules over stored candles.")
+    ap.add_argument("symbols", nargs="*", help="default: every symbol with history for --interval")
+    ap.add_argument("--interval", default="5m")
+    ap.add_argument("--days", type=float, default=365)
+    ap.add_argument("--json", nargs="+", default=[], help="recorded /api/v3/klines files instead")
+    ap.add_argument("--out", help="write the alert log as CSV here")
+    ap.add_argument("--near-tol", type=float, default=NEAR_TOL)
+    ap.add_argument("--rearm-tol", type=float, default=None, help="default 2 x near-tol")
+    ap.add_argument("--ttl", type=float, default=ALERT_TTL)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args(argv)
+    kwargs = {"near_tol": args.near_tol, "ttl": args.ttl,
+              "rearm_tol": args.rearm_tol if args.rearm_tol is not None else 2 * args.near_tol}
+
+    if args.json:
+        jobs = [("json", p, None, None, kwargs) for p in args.json]
+    else:
+        symbols = [s.upper() for s in args.symbols] or history_symbols(args.interval)
+        jobs = [("history", s, args.interval, args.days, kwargs) for s in symbols]
+
+    t0 = time.perf_counter()
+    workers = max(1, min(args.workers, len(jobs)))
+    if workers > 1:
+        with mp.get_context("spawn" if sys.platform == "win32" else "fork").Pool(workers) as pool:
+            results = pool.map(_replay_job, jobs, chunksize=1)
+    else:
+        results = [_replay_job(job) for job in jobs]
+    log, rows = [], []
+    for symbol, alerts, stats in results:
+        if stats is None:
+            print(f"{symbol}: not enough candles, skipped")
+            continue
+        log.extend(alerts)
+        rows.append(stats)
+    elapsed = time.perf_counter() - t0
+
+    if args.out:
+        with open(args.out, "w", newline="") as fh:
+            w = csv.writer(fh)
+            w.writerow(("time", "symbol", "kind", "level", "price", "with_trend"))
+            for ts, symbol, kind, level, price, trend in sorted(log):
+                w.writerow((time.strftime("%Y-%m-%d %H:%M", time.gmtime(ts / 1000)), symbol, kind,
+                            f"{level:.8g}", f"{price:.8g}", int(trend)))
+    cols = ("symbol", "bars", "sup_hits", "sup_alerts", "res_hits", "res_alerts", "crosses", "alerts_per_day")
+    print(" ".join(f"{c:>14s}" for c in cols))
+    for r in rows:
+        print(" ".join(f"{r[c]!s:>14s}" for c in cols))
+    bars = sum(r["bars"] for r in rows)
+    print(f"{len(rows)} symbols, {bars} candles, {len(log)} alerts in {elapsed:.2f}s ({workers} workers)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
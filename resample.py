@@ -0,0 +1,270 @@
+"""Higher timeframes derived locally from one stored base interval.
+
+Every timeframe used to be its own Binance request and its own cache entry.
+Here 15m ... 1d, 1w and 1M candles are aggregated from the base series in
+``kline_history`` (RESAMPLE_BASE, e.g. 5m), so one small incremental
+sync of the base serves every timeframe of a symbol:
+
+* buckets follow Binance's alignment: UTC multiples of the interval, weeks
+  from Monday 00:00, months from the 1st (3d is left to Binance);
+* each ``Resampler`` keeps its finished bars and aggregates only base
+  candles it has not seen; the bar in progress is rebuilt from the few
+  closed base candles of its bucket plus the live one on every read;
+* the base is synced on a background thread (at most every
+  RESAMPLE_SYNC_EVERY seconds per symbol), never on the request path; when
+  the stored base is too short (first request for a symbol) or stale,
+  ``frame`` returns None and the caller fetches from Binance meanwhile.
+
+Callers pass only symbols known to be listed: every symbol seen here gets
+a history directory and a backfill. Off by default (RESAMPLE_BASE=""), as
+turning it on adds disk writes and background requests per symbol.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from kline_cache import INTERVAL_MS, _WEEK_OFFSET_MS
+from kline_parse import FIELDS, klines_frame
+
+RESAMPLE_BASE = os.getenv("RESAMPLE_BASE", "")  # e.g. "5m" turns local resampling on
+RESAMPLE_MAX_BASE_BARS = int(os.getenv("RESAMPLE_MAX_BASE_BARS", 20000))
+RESAMPLE_SYNC_EVERY = float(os.getenv("RESAMPLE_SYNC_EVERY", 10))  # s between base syncs per symbol
+TARGETS = ("15m", "30m", "1h", "2h", "4h", "6h", "8h", "12h", "1d", "1w", "1M")
+COLUMNS = ("open_time",) + FIELDS
+_DAY_MS = 1440 * 60_000
+
+
+# ===== BUCKETS =====
+def bucket_open(open_time, interval):
+    """Open time (ms) of the ``interval`` candle containing each ``open_time``."""
+    t = np.asarray(open_time, dtype=np.int64)
+    if interval == "1M":
+        return t.astype("datetime64[ms]").astype("datetime64[M]").astype("datetime64[ms]").astype(np.int64)
+    step = INTERVAL_MS[interval]
+    offset = _WEEK_OFFSET_MS if interval == "1w" else 0
+    return (t - offset) // step * step + offset
+
+
+def bucket_close(bucket, interval):
+    """Open time of the following bucket."""
+    b = np.asarray(bucket, dtype=np.int64)
+    if interval == "1M":
+        month = b.astype("datetime64[ms]").astype("datetime64[M]") + 1
+        return month.astype("datetime64[ms]").astype(np.int64)
+    return b + INTERVAL_MS[interval]
+
+
+def can_resample(base, interval):
+    if interval not in TARGETS or base not in INTERVAL_MS or base == interval:
+        return False
+    if interval in ("1w", "1M"):
+        return _DAY_MS % INTERVAL_MS[base] == 0
+    return INTERVAL_MS[interval] > INTERVAL_MS[base] and INTERVAL_MS[interval] % INTERVAL_MS[base] == 0
+
+
+def base_bars(base, interval, bars):
+    """Base candles needed for ``bars`` candles of ``interval`` (one bucket of slack)."""
+    span = 31 * _DAY_MS if interval == "1M" else INTERVAL_MS[interval]
+    return (bars + 1) * span // INTERVAL_MS[base]
+
+
+def _empty():
+    return {name: np.empty(0, np.int64 if name == "open_time" else np.float64) for name in COLUMNS}
+
+
+def _take(arrays, index):
+    return {name: arrays[name][index] for name in COLUMNS}
+
+
+def _concat(*parts):
+    return {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+
+
+def resample(arrays, interval):
+    """Aggregate ascending base candles into one ``interval`` bar per bucket present."""
+    arrays = {name: np.asarray(arrays[name]) for name in COLUMNS}
+    t = arrays["open_time"]
+    if not len(t):
+        return _empty()
+    b = bucket_open(t, interval)
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    ends = np.r_[starts[1:], len(t)] - 1
+    return {
+        "open_time": b[starts],
+        "open": arrays["open"][starts],
+        "high": np.maximum.reduceat(arrays["high"], starts),
+        "low": np.minimum.reduceat(arrays["low"], starts),
+        "close": arrays["close"][ends],
+        "volume": np.add.reduceat(arrays["volume"], starts),
+    }
+
+
+# ===== INCREMENTAL =====
+class Resampler:
+    """One derived series, fed base candles as they close.
+
+    Finished bars are kept (newest ``capacity``); closed base candles of the
+    bucket in progress wait in ``_pending`` until its last base candle closes.
+    """
+
+    def __init__(self, base, interval, capacity=1000):
+        if not can_resample(base, interval):
+            raise ValueError(f"cannot derive {interval} from {base}")
+        self.base = base
+        self.interval = interval
+        self.capacity = capacity
+        self._base_step = INTERVAL_MS[base]
+        self._bars = _empty()
+        self._pending = _empty()
+        self._live = _empty()
+        self._aligned = False
+        self.last_base = None  # open_time of the newest closed base candle consumed
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._bars["open_time"])
+
+    @property
+    def first_open_time(self):
+        t = self._bars["open_time"]
+        return int(t[0]) if len(t) else None
+
+    def update(self, closed, live=None):
+        """Feed closed base candles (ascending; ones already seen are skipped)
+        and the still-open base candle, if known. Returns bars finished."""
+        closed = {name: np.asarray(closed[name]) for name in COLUMNS}
+        t = closed["open_time"]
+        if self.last_base is not None:
+            closed = _take(closed, slice(int(np.searchsorted(t, self.last_base, side="right")), None))
+            t = closed["open_time"]
+        if not self._aligned and len(t):
+            # the base history may start mid-bucket: skip to the first bucket boundary
+            at_start = np.flatnonzero(bucket_open(t, self.interval) == t)
+            self._aligned = len(at_start) > 0
+            self.last_base = int(t[-1])
+            closed = _take(closed, slice(int(at_start[0]) if self._aligned else len(t), None))
+            t = closed["open_time"]
+        finished = 0
+        if len(t):
+            self.last_base = int(t[-1])
+            data = _concat(self._pending, closed)
+            b = bucket_open(data["open_time"], self.interval)
+            if bucket_close(b[-1], self.interval) <= self.last_base + self._base_step:
+                cut = len(b)  # the last base candle of the newest bucket has closed too
+            else:
+                cut = int(np.searchsorted(b, b[-1], side="left"))
+            if cut:
+                bars = resample(_take(data, slice(0, cut)), self.interval)
+                finished = len(bars["open_time"])
+                self._bars = _take(_concat(self._bars, bars), slice(-self.capacity, None))
+            self._pending = _take(data, slice(cut, None))
+        if live is not None:
+            live = {name: np.asarray(live[name]) for name in COLUMNS}
+            keep = live["open_time"] > (self.last_base if self.last_base is not None else -1)
+            self._live = _take(live, keep) if self._aligned else _empty()
+        return finished
+
+    def arrays(self, tail=None):
+        """Finished bars followed by the bar in progress."""
+        partial = resample(_concat(self._pending, self._live), self.interval)
+        bars = self._bars if tail is None else _take(self._bars, slice(-tail, None))
+        out = _concat(bars, partial)
+        return out if tail is None else _take(out, slice(-tail, None))
+
+
+# ===== BOOK =====
+class TimeframeBook:
+    """Resampler per (symbol, interval), fed from ``history(symbol, base)``."""
+
+    def __init__(self, base=RESAMPLE_BASE, history=None, max_base_bars=RESAMPLE_MAX_BASE_BARS,
+                 sync_every=RESAMPLE_SYNC_EVERY, max_series=128):
+        if history is None:
+            from kline_history import kline_history as history
+        self.base = base
+        self.history = history
+        self.max_base_bars = max_base_bars
+        self.sync_every = sync_every
+        self.max_series = max_series
+        self._resamplers = OrderedDict()  # (symbol, interval) -> (Resampler, bars it was seeded for)
+        self._synced = OrderedDict()  # symbol -> monotonic time of the last base sync, LRU
+        self._syncing = set()         # symbols with a sync/backfill thread running
+        self._lock = threading.Lock()
+        self.served = 0
+        self.fallbacks = 0
+
+    def covers(self, interval, bars):
+        return bool(self.base) and can_resample(self.base, interval) and \
+            base_bars(self.base, interval, bars) <= self.max_base_bars
+
+    def _resampler(self, symbol, interval, bars):
+        key = (symbol, interval)
+        with self._lock:
+            r, depth = self._resamplers.get(key, (None, 0))
+            if depth < bars:  # new, or asked for more history than it was seeded with
+                r = Resampler(self.base, interval, capacity=max(bars, 1000))
+                self._resamplers[key] = (r, bars)
+                while len(self._resamplers) > self.max_series:
+                    self._resamplers.popitem(last=False)
+            self._resamplers.move_to_end(key)
+            return r
+
+    def _sync(self, symbol, hist, need=None):
+        """``hist.sync(need)`` on a background thread, one at a time per symbol;
+        plain syncs (need=None) at most every ``sync_every`` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if symbol in self._syncing:
+                return
+            if need is None and now - self._synced.get(symbol, -1e9) < self.sync_every:
+                return
+            self._syncing.add(symbol)
+            self._synced[symbol] = now
+            self._synced.move_to_end(symbol)
+            while len(self._synced) > self.max_series:
+                self._synced.popitem(last=False)
+
+        def run():
+            try:
+                hist.sync(need)
+            finally:
+                with self._lock:
+                    self._syncing.discard(symbol)
+                    if symbol in self._synced:
+                        self._synced[symbol] = time.monotonic()
+        threading.Thread(target=run, daemon=True, name=f"sync-{symbol}").start()
+
+    def frame(self, symbol, interval, bars):
+        """OHLCV DataFrame of the last ``bars`` candles, or None if Binance must be asked."""
+        symbol = symbol.upper()
+        if not self.covers(interval, bars):
+            return None
+        hist = self.history(symbol, self.base)
+        need = base_bars(self.base, interval, bars)
+        now_ms = int(time.time() * 1000)
+        first, last = hist.first_open_time, hist.last_open_time
+        if first is None or first > now_ms - need * INTERVAL_MS[self.base]:
+            self._sync(symbol, hist, need)  # backfill
+            self.fallbacks += 1
+            return None
+        self._sync(symbol, hist)
+        if last < now_ms - 3 * INTERVAL_MS[self.base]:
+            self.fallbacks += 1  # base not synced yet (idle symbol, Binance unreachable?): no stale bars
+            return None
+        r = self._resampler(symbol, interval, bars)
+        with r.lock:
+            start = now_ms - need * INTERVAL_MS[self.base] if r.last_base is None else r.last_base + 1
+            r.update(hist.read(start=start), hist.live())
+            arrays = r.arrays(tail=bars)
+        self.served += 1
+        return klines_frame(arrays)
+
+    def stats(self):
+        with self._lock:
+            return {"base": self.base, "series": len(self._resamplers), "served": self.served,
+                    "fallbacks": self.fallbacks, "syncing": sorted(self._syncing)}
+
+
+timeframes = TimeframeBook()
@@ -0,0 +1,106 @@
+"""Cross-sectional watchlist scanner.
+
+Stacks close/high/low of many symbols into 2-D arrays (symbols x bars) and
+evaluates the m1ain.py alert rules for all of them in one vectorized pass:
+MA fast/slow crossover, pivot levels (same formula as ``pivot_levels``),
+swing levels (same rule as ``swing_levels``) and the ``pct_diff <= NEAR_TOL``
+proximity test.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def stack_rings(rings, length):
+    """{symbol: CandleRing} -> (symbols, close, high, low) with shape (S, length).
+
+    Series shorter than ``length`` are left-padded with NaN.
+    """
+    symbols = list(rings)
+    out = {f: np.full((len(symbols), length), np.nan) for f in ("close", "high", "low")}
+    for i, sym in enumerate(symbols):
+        ring = rings[sym]
+        n = min(len(ring), length)
+        if not n:
+            continue
+        for f in out:
+            out[f][i, length - n:] = ring.column(f)[-n:]
+    return symbols, out["close"], out["high"], out["low"]
+
+
+def _ma_last2(close, n):
+    """MA(n) at the last and previous bar for every row: (prev, curr)."""
+    if close.shape[1] < n + 1:
+        nan = np.full(close.shape[0], np.nan)
+        return nan, nan
+    tail = close[:, -(n + 1):]
+    curr = tail[:, 1:].mean(axis=1)
+    prev = tail[:, :-1].mean(axis=1)
+    return prev, curr
+
+
+def _pct_diff(price, level):
+    # pct_diff(a, b) = |a - b| / b, 0 when b == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = np.abs(price - level) / level
+    return np.where(level != 0, d, 0.0)
+
+
+def _nearest_within(price, levels, tol):
+    """levels (S, K) with NaN for 'no level' -> nearest level within tol or NaN."""
+    d = _pct_diff(price[:, None], levels)
+    d = np.where(np.isnan(levels), np.inf, d)
+    j = d.argmin(axis=1)
+    best = d[np.arange(len(price)), j]
+    return np.where(best <= tol, levels[np.arange(len(price)), j], np.nan)
+
+
+def scan(symbols, close, high, low, fast=50, slow=200, near_tol=0.003, swing_window=5):
+    """Evaluate the alert rules for every row; returns a dict of arrays."""
+    price = close[:, -1]
+    prev_fast, curr_fast = _ma_last2(close, fast)
+    prev_slow, curr_slow = _ma_last2(close, slow)
+    cross_up = (prev_fast <= prev_slow) & (curr_fast > curr_slow)
+    cross_dn = (prev_fast >= prev_slow) & (curr_fast < curr_slow)
+
+    # pivot_levels on the previous (closed) bar
+    H1, L1, C1 = high[:, -2], low[:, -2], close[:, -2]
+    pp = (H1 + L1 + C1) / 3
+    r1, s1 = 2 * pp - L1, 2 * pp - H1
+    r2, s2 = pp + (H1 - L1), pp - (H1 - L1)
+
+    # swing highs/lows: bar equals the extreme of its 2w+1 window
+    w = swing_window
+    win_h = sliding_window_view(high, 2 * w + 1, axis=1)
+    win_l = sliding_window_view(low, 2 * w + 1, axis=1)
+    centre_h, centre_l = high[:, w:high.shape[1] - w], low[:, w:low.shape[1] - w]
+    swing_hi = np.where(centre_h == win_h.max(axis=2), centre_h, np.nan)
+    swing_lo = np.where(centre_l == win_l.min(axis=2), centre_l, np.nan)
+
+    supports = np.column_stack([s1, s2, swing_lo])
+    resistances = np.column_stack([r1, r2, swing_hi])
+    return {
+        "symbols": list(symbols),
+        "price": price,
+        "ma_fast": curr_fast,
+        "ma_slow": curr_slow,
+        "cross_up": cross_up,
+        "cross_dn": cross_dn,
+        "near_support": _nearest_within(price, supports, near_tol),
+        "near_resistance": _nearest_within(price, resistances, near_tol),
+    }
+
+
+def hits(result):
+    """Yield (symbol, kind, value) for rows that triggered a rule.
+
+    kind is one of "golden_cross", "death_cross", "support", "resistance".
+    """
+    for i, sym in enumerate(result["symbols"]):
+        if result["cross_up"][i]:
+            yield sym, "golden_cross", result["price"][i]
+        if result["cross_dn"][i]:
+            yield sym, "death_cross", result["price"][i]
+        if not np.isnan(result["near_support"][i]):
+            yield sym, "support", result["near_support"][i]
+        if not np.isnan(result["near_resistance"][i]):
+            yield sym, "resistance", result["near_resistance"][i]
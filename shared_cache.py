@@ -0,0 +1,114 @@
+"""Byte cache shared by the worker processes of one host (SQLite file).
+
+Under gunicorn every worker has its own KlineCache and ChartCache, so N
+workers would fetch and render the same klines and charts N times. This is
+a second tier behind them: a miss in a worker's own cache looks here before
+going to Binance or the renderer, and whatever a worker produces is stored
+here for the others. Values are bytes with an absolute expiry (ms);
+errors (locked or missing file, full disk) count as misses and never reach
+the request.
+
+SHARED_CACHE=path enables it (gunicorn.conf.py sets a default); unset, the
+``shared_cache`` object is None and the in-process caches work as before.
+"""
+import os
+import time
+import sqlite3
+import threading
+
+SHARED_CACHE = os.getenv("SHARED_CACHE", "")
+SHARED_CACHE_BYTES = int(os.getenv("SHARED_CACHE_BYTES", 128 * 1024 * 1024))
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY, value BLOB NOT NULL, expires INTEGER NOT NULL, size INTEGER NOT NULL)"""
+
+
+class SharedCache:
+    def __init__(self, path, max_bytes=SHARED_CACHE_BYTES, prune_every=64, timeout=2.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self.timeout = timeout
+        self._local = threading.local()  # sqlite connections are per thread
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.errors = 0
+        self.evictions = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # a cache: losing the tail on a crash is fine
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _error(self, op, e):
+        with self._lock:
+            self.errors += 1
+        print(f"shared_cache {op} error:", e)
+
+    def get(self, key):
+        """Bytes stored under ``key`` that have not expired, else None."""
+        try:
+            row = self._conn().execute("SELECT value FROM cache WHERE key = ? AND expires > ?",
+                                       (key, int(time.time() * 1000))).fetchone()
+        except sqlite3.Error as e:
+            self._error("get", e)
+            return None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if row is None else bytes(row[0])
+
+    def set(self, key, value, expires_ms):
+        if len(value) > self.max_bytes:
+            return
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                         (key, sqlite3.Binary(value), int(expires_ms), len(value)))
+            with self._lock:
+                self.sets += 1
+                prune = self.sets % self.prune_every == 0
+            if prune:
+                self._prune(conn)
+        except sqlite3.Error as e:
+            self._error("set", e)
+
+    def _prune(self, conn):
+        now_ms = int(time.time() * 1000)
+        dropped = conn.execute("DELETE FROM cache WHERE expires <= ?", (now_ms,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        while total > self.max_bytes:
+            # soonest to expire first, a batch at a time
+            rows = conn.execute("SELECT key, size FROM cache ORDER BY expires LIMIT 32").fetchall()
+            if not rows:
+                break
+            conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k, _ in rows])
+            dropped += len(rows)
+            total -= sum(size for _, size in rows)
+        with self._lock:
+            self.evictions += dropped
+
+    def clear(self):
+        try:
+            self._conn().execute("DELETE FROM cache")
+        except sqlite3.Error as e:
+            self._error("clear", e)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"path": self.path, "hits": self.hits, "misses": self.misses, "sets": self.sets,
+                    "evictions": self.evictions, "errors": self.errors,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+
+shared_cache = SharedCache(SHARED_CACHE) if SHARED_CACHE else None
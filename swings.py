@@ -0,0 +1,107 @@
+"""Swing high/low detection on numpy sliding windows.
+
+A bar ``i`` is a swing high when ``h[i]`` equals the max of
+``h[i-window : i+window+1]`` (swing low: ``l[i]`` equals the min), for
+``window <= i < n - window``; same rule as the old per-index Python loops.
+"""
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def swing_mask(x, window=5, mode="high"):
+    """Boolean mask over ``x[window:n-window]`` marking swing points."""
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) < 2 * window + 1:
+        return np.zeros(0, dtype=bool)
+    win = sliding_window_view(x, 2 * window + 1)
+    ext = win.max(axis=1) if mode == "high" else win.min(axis=1)
+    return x[window:len(x) - window] == ext
+
+
+def swing_indices(h, l, window=5):
+    """Indices of swing highs and swing lows."""
+    hi = np.flatnonzero(swing_mask(h, window, "high")) + window
+    lo = np.flatnonzero(swing_mask(l, window, "low")) + window
+    return hi, lo
+
+
+def swing_levels(h, l, window=5):
+    """Sorted unique swing-high and swing-low prices."""
+    hi, lo = swing_indices(h, l, window)
+    return np.unique(np.asarray(h, dtype=np.float64)[hi]).tolist(), \
+        np.unique(np.asarray(l, dtype=np.float64)[lo]).tolist()
+
+
+find_swings = swing_levels
+
+
+# ===== INCREMENTAL =====
+class SwingTracker:
+    """Swing levels kept up to date as candles are appended or revised.
+
+    ``update(keys, h, l)`` takes the current window (``keys`` are ascending
+    candle ids such as ``open_time``). Only centres whose window touches a
+    new or revised bar are re-checked; swings that slide out of the valid
+    range are dropped. Falls back to a full pass when the new window does not
+    overlap the previous one.
+    """
+
+    def __init__(self, window=5):
+        self.window = window
+        self._highs = OrderedDict()  # key -> price
+        self._lows = OrderedDict()
+        self._last_key = None
+
+    def reset(self):
+        self._highs.clear()
+        self._lows.clear()
+        self._last_key = None
+
+    def _recheck(self, keys, h, l, start, stop):
+        w = self.window
+        if stop <= start:
+            return
+        seg = slice(start - w, stop + w)
+        is_hi = swing_mask(h[seg], w, "high")
+        is_lo = swing_mask(l[seg], w, "low")
+        # pop then re-insert in order so both dicts stay sorted by key
+        for i in range(start, stop):
+            self._highs.pop(int(keys[i]), None)
+            self._lows.pop(int(keys[i]), None)
+        for j in np.flatnonzero(is_hi):
+            self._highs[int(keys[start + j])] = float(h[start + j])
+        for j in np.flatnonzero(is_lo):
+            self._lows[int(keys[start + j])] = float(l[start + j])
+
+    def update(self, keys, h, l):
+        keys = np.asarray(keys)
+        h = np.asarray(h, dtype=np.float64)
+        l = np.asarray(l, dtype=np.float64)
+        n, w = len(keys), self.window
+        if n < 2 * w + 1:
+            self.reset()
+            return [], []
+
+        p = -1
+        if self._last_key is not None:
+            p = int(np.searchsorted(keys, self._last_key))
+            if p >= n or keys[p] != self._last_key:
+                p = -1
+        if p < 0:
+            self.reset()
+            start = w
+        else:
+            # bar p may have been revised in place, bars after it are new
+            start = max(w, p - w)
+            for store in (self._highs, self._lows):
+                first = int(keys[w])
+                while store and next(iter(store)) < first:
+                    store.popitem(last=False)
+        self._recheck(keys, h, l, start, n - w)
+        self._last_key = keys[-1]
+        return self.levels()
+
+    def levels(self):
+        return sorted(set(self._highs.values())), sorted(set(self._lows.values()))
@@ -0,0 +1,313 @@
+"""Queued, rate-limited delivery of outgoing Telegram messages.
+
+``send_text``/``send_photo`` only enqueue and return, so a slow sendPhoto
+upload no longer holds up the alert loop or a webhook worker. A few sender
+threads drain per-chat FIFO queues:
+
+* a global bucket keeps the bot under Telegram's ~30 messages/s, and a
+  per-chat bucket under 1/s (20/min for groups, whose ids are negative);
+* one chat is served by one sender at a time, so its messages stay in order
+  while other chats go out in parallel;
+* a 429 pauses that chat for ``retry_after`` and the message is retried;
+  network errors are retried with backoff up to ``MAX_ATTEMPTS``;
+* text messages waiting for the same chat (same parse mode) are merged into
+  one, up to Telegram's 4096 characters;
+* a photo is uploaded once: the ``file_id`` Telegram returns is kept under
+  the image's digest, and the same image (another chat of a broadcast, a
+  cached chart sent again) goes out by reference. Sends of an image whose
+  upload is still in flight wait for it instead of uploading it again.
+
+Enqueue-to-delivery latency is observed as the "deliver" stage on /metrics
+under the labels of the command that produced the message.
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+import http_client
+import metrics
+from ratelimit import TokenBucket
+
+GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", 25))   # messages/s for the whole bot
+CHAT_RATE = float(os.getenv("TG_CHAT_RATE", 1))        # messages/s per private chat
+GROUP_RATE = float(os.getenv("TG_GROUP_RATE", 20 / 60))  # messages/s per group
+CHAT_BURST = 3
+SEND_WORKERS = int(os.getenv("TG_SEND_WORKERS", 4))
+OUTBOX_SIZE = int(os.getenv("TG_OUTBOX_SIZE", 1000))
+MAX_ATTEMPTS = 5
+MAX_TEXT = 4096
+FILE_IDS = int(os.getenv("TG_FILE_IDS", 512))           # uploaded images remembered by digest
+IMAGE_EXT = ((b"\x89PNG", "png"), (b"\xff\xd8", "jpg"), (b"RIFF", "webp"))
+
+
+def image_filename(data, stem="chart"):
+    for magic, ext in IMAGE_EXT:
+        if data.startswith(magic):
+            return f"{stem}.{ext}"
+    return f"{stem}.png"
+
+
+class _Message:
+    __slots__ = ("chat_id", "method", "data", "files", "digest", "by_ref", "enqueued", "labels",
+                 "attempts", "merged", "parts", "solo")
+
+    def __init__(self, chat_id, method, data, files=None, digest=None):
+        self.chat_id = chat_id
+        self.method = method
+        self.data = {k: v for k, v in data.items() if v is not None}
+        self.files = files
+        self.digest = digest
+        self.by_ref = False   # this attempt sends a cached file_id instead of the bytes
+        self.enqueued = time.monotonic()
+        self.labels = metrics.current_labels()
+        self.attempts = 0
+        self.merged = 1
+        self.parts = None     # the queued messages a merged one was built from
+        self.solo = False     # split out of a rejected merge: never merged again
+
+    def mergeable(self, other):
+        # plain text only: joining Markdown/HTML can produce entities Telegram rejects
+        return (self.method == other.method == "sendMessage"
+                and "parse_mode" not in self.data and "parse_mode" not in other.data
+                and not (self.solo or other.solo)
+                and len(self.data["text"]) + 2 + len(other.data["text"]) <= MAX_TEXT)
+
+
+class Outbox:
+    def __init__(self, api_url, workers=SEND_WORKERS, maxsize=OUTBOX_SIZE, global_rate=GLOBAL_RATE):
+        self.api_url = api_url.rstrip("/")
+        self.workers = workers
+        self.maxsize = maxsize
+        self.bucket = TokenBucket(max(1.0, global_rate), rate=global_rate)
+        self._chats = OrderedDict()   # chat_id -> deque of _Message, round-robin order
+        self._buckets = {}            # chat_id -> TokenBucket
+        self._busy = set()            # chats a sender is working on
+        self._file_ids = OrderedDict()  # image digest -> file_id, LRU
+        self._uploading = set()       # digests being uploaded right now
+        self._size = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self._latency = deque(maxlen=500)  # recent enqueue -> delivered (s)
+        self.submitted = 0
+        self.sent = 0
+        self.merged = 0
+        self.rejected = 0
+        self.retried = 0
+        self.failed = 0
+        self.uploads = 0
+        self.upload_bytes = 0
+        self.reused = 0
+
+    def start(self):
+        with self._cond:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._run, daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
+
+    # ----- producers -----
+    def send_text(self, chat_id, text, parse_mode=None):
+        return self._put(_Message(chat_id, "sendMessage",
+                                  {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}))
+
+    def send_photo(self, chat_id, image, caption=None, filename=None):
+        return self._put(_Message(chat_id, "sendPhoto", {"chat_id": chat_id, "caption": caption},
+                                  files={"photo": (filename or image_filename(image), image)},
+                                  digest=hashlib.blake2b(image, digest_size=16).digest()))
+
+    def _put(self, msg):
+        """Enqueue without blocking; False when the outbox is full."""
+        if not self._threads:
+            self.start()
+        with self._cond:
+            if self._size >= self.maxsize:
+                self.rejected += 1
+                print("telegram outbox full, dropped", msg.method, "to", msg.chat_id)
+                return False
+            self._chats.setdefault(msg.chat_id, deque()).append(msg)
+            self._size += 1
+            self.submitted += 1
+            self._cond.notify()
+        return True
+
+    # ----- senders -----
+    def _chat_bucket(self, chat_id):
+        b = self._buckets.get(chat_id)
+        if b is None:
+            rate = GROUP_RATE if str(chat_id).startswith("-") else CHAT_RATE
+            b = self._buckets[chat_id] = TokenBucket(CHAT_BURST, rate=rate)
+        return b
+
+    def _next(self):
+        # first idle chat (round robin) whose bucket has a token; else how long to sleep
+        wait = None
+        for chat_id, q in self._chats.items():
+            if chat_id in self._busy or q[0].digest in self._uploading:
+                continue
+            d = self._chat_bucket(chat_id).delay()
+            if d == 0:
+                self._chats.move_to_end(chat_id)
+                return chat_id, 0
+            wait = d if wait is None else min(wait, d)
+        return None, wait
+
+    def _take(self, chat_id):
+        q = self._chats[chat_id]
+        first = q.popleft()
+        if not (q and first.mergeable(q[0])):
+            return first
+        # a new message, so the parts stay intact for a resend one by one
+        msg = _Message(first.chat_id, first.method, first.data)
+        msg.labels, msg.enqueued, msg.merged, msg.parts = first.labels, first.enqueued, first.merged, [first]
+        while q and msg.mergeable(q[0]):
+            nxt = q.popleft()
+            msg.data["text"] += "\n\n" + nxt.data["text"]
+            msg.merged += nxt.merged
+            msg.enqueued = min(msg.enqueued, nxt.enqueued)
+            msg.parts.append(nxt)
+            self.merged += 1
+        return msg
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    chat_id, wait = self._next()
+                    if chat_id is not None:
+                        break
+                    self._cond.wait(timeout=wait)
+                q_before = len(self._chats[chat_id])
+                msg = self._take(chat_id)
+                self._size -= q_before - len(self._chats[chat_id])
+                if not self._chats[chat_id]:
+                    del self._chats[chat_id]
+                self._busy.add(chat_id)
+                self._chat_bucket(chat_id).reserve()
+                self._attach(msg)
+            try:
+                self._deliver(msg)
+            finally:
+                with self._cond:
+                    self._busy.discard(chat_id)
+                    if not msg.by_ref:
+                        self._uploading.discard(msg.digest)
+                    self._cond.notify_all()
+
+    def _attach(self, msg):
+        # under _cond: send a known image by file_id, else this sender uploads it
+        if msg.digest is None:
+            return
+        file_id = self._file_ids.get(msg.digest)
+        msg.by_ref = file_id is not None
+        if msg.by_ref:
+            self._file_ids.move_to_end(msg.digest)
+            msg.data["photo"] = file_id
+        else:
+            msg.data.pop("photo", None)
+            self._uploading.add(msg.digest)
+
+    def _remember(self, msg, r):
+        try:
+            file_id = r.json()["result"]["photo"][-1]["file_id"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            return
+        with self._cond:
+            self._file_ids[msg.digest] = file_id
+            self._file_ids.move_to_end(msg.digest)
+            while len(self._file_ids) > FILE_IDS:
+                self._file_ids.popitem(last=False)
+
+    def _requeue(self, msg):
+        with self._cond:
+            self._chats.setdefault(msg.chat_id, deque()).appendleft(msg)
+            self._size += 1
+            self._chats.move_to_end(msg.chat_id, last=False)
+            self._cond.notify()
+
+    def _deliver(self, msg):
+        wait = self.bucket.reserve()
+        if wait:
+            time.sleep(wait)
+        msg.attempts += 1
+        files = None if msg.by_ref else msg.files
+        try:
+            with metrics.labels(*msg.labels):
+                r = http_client.post(f"{self.api_url}/{msg.method}", data=msg.data, files=files,
+                                     timeout=60 if files else 15)
+            status = r.status_code
+        except Exception as e:
+            status, r = None, e
+        if files:
+            self.uploads += 1
+            self.upload_bytes += sum(len(f[1]) for f in files.values())
+        if status == 200:
+            self.sent += 1
+            if msg.by_ref:
+                self.reused += 1
+            elif msg.digest is not None:
+                self._remember(msg, r)
+            latency = time.monotonic() - msg.enqueued
+            self._latency.append(latency)
+            metrics.stage_seconds.observe(latency, "deliver", *msg.labels)
+            return
+        if status == 429:
+            try:
+                retry_after = r.json().get("parameters", {}).get("retry_after", 1)
+            except ValueError:
+                retry_after = 1
+            self._chat_bucket(msg.chat_id).pause(retry_after)
+        elif status == 400 and msg.by_ref:
+            with self._cond:  # file_id no longer accepted: forget it, upload the bytes again
+                self._file_ids.pop(msg.digest, None)
+        elif status is not None and 400 <= status < 500:
+            print(f"telegram {msg.method} {status}:", r.text[:200])
+            if msg.parts:
+                # the join may be what was rejected: send the parts on their own
+                for part in reversed(msg.parts):
+                    part.solo = True
+                    self._requeue(part)
+                return
+            self.failed += msg.merged  # bad request (chat not found, markdown error...): retrying will not help
+            return
+        if msg.attempts >= MAX_ATTEMPTS:
+            self.failed += msg.merged
+            print(f"telegram {msg.method} gave up after {msg.attempts} attempts:", status or r)
+            return
+        if status not in (429, 400):
+            self._chat_bucket(msg.chat_id).pause(min(2 ** msg.attempts, 30))
+        self.retried += 1
+        self._requeue(msg)
+
+    def flush(self, timeout=30.0):
+        """Wait until everything queued has been handed to Telegram (or given up)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._size or self._busy:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(timeout=min(left, 0.05))
+        return True
+
+    def stats(self):
+        lat = sorted(self._latency)
+        return {
+            "depth": self._size,
+            "chats": len(self._chats),
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "merged": self.merged,
+            "rejected": self.rejected,
+            "retried": self.retried,
+            "failed": self.failed,
+            "uploads": self.uploads,
+            "upload_bytes": self.upload_bytes,
+            "reused": self.reused,
+            "file_ids": len(self._file_ids),
+            "latency_avg_s": sum(lat) / len(lat) if lat else 0.0,
+            "latency_p95_s": lat[int(len(lat) * 0.95)] if lat else 0.0,
+            "latency_max_s": lat[-1] if lat else 0.0,
+        }
@@ -0,0 +1,109 @@
+"""Bounded, prioritised work queue for Telegram webhook updates.
+
+A fixed set of worker threads drains a bounded priority queue, so a spam
+burst or a Telegram redelivery storm cannot spawn unbounded threads.
+Updates are de-duplicated by ``update_id`` and cheap commands can be given a
+lower priority number so they overtake queued chart renders.
+"""
+import time
+import queue
+import itertools
+import threading
+import traceback
+from collections import OrderedDict, deque
+
+QUEUED, DUPLICATE, FULL = "queued", "duplicate", "full"
+
+
+class UpdateQueue:
+    def __init__(self, handler, workers=4, maxsize=100, priority=None, dedup_size=2048):
+        self.handler = handler
+        self.workers = workers
+        self.priority = priority or (lambda update: 0)
+        self._q = queue.PriorityQueue(maxsize=maxsize)
+        self._seq = itertools.count()
+        self._seen = OrderedDict()
+        self._dedup_size = dedup_size
+        self._lock = threading.Lock()
+        self._threads = []
+        self._waits = deque(maxlen=500)  # recent queue wait times (s)
+        self.submitted = 0
+        self.processed = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    def start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._run, daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
+
+    def _is_duplicate(self, update):
+        uid = update.get("update_id") if isinstance(update, dict) else None
+        if uid is None:
+            return False
+        with self._lock:
+            if uid in self._seen:
+                return True
+            self._seen[uid] = True
+            while len(self._seen) > self._dedup_size:
+                self._seen.popitem(last=False)
+        return False
+
+    def _forget(self, update):
+        if not isinstance(update, dict):
+            return  # never recorded by _is_duplicate
+        with self._lock:
+            self._seen.pop(update.get("update_id"), None)
+
+    def submit(self, update):
+        """Enqueue without blocking; returns QUEUED, DUPLICATE or FULL."""
+        if not self._threads:
+            self.start()
+        if self._is_duplicate(update):
+            with self._lock:
+                self.duplicates += 1
+            return DUPLICATE
+        try:
+            self._q.put_nowait((self.priority(update), next(self._seq), time.monotonic(), update))
+        except queue.Full:
+            self._forget(update)  # let a Telegram redelivery try again later
+            with self._lock:
+                self.rejected += 1
+            return FULL
+        with self._lock:
+            self.submitted += 1
+        return QUEUED
+
+    def _run(self):
+        while True:
+            _prio, _seq, enqueued, update = self._q.get()
+            self._waits.append(time.monotonic() - enqueued)
+            try:
+                self.handler(update)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                traceback.print_exc()
+            finally:
+                with self._lock:
+                    self.processed += 1
+                self._q.task_done()
+
+    def stats(self):
+        waits = sorted(self._waits)
+        with self._lock:
+            counts = {"submitted": self.submitted, "processed": self.processed, "rejected": self.rejected,
+                      "duplicates": self.duplicates, "errors": self.errors}
+        return {
+            "depth": self._q.qsize(),
+            "capacity": self._q.maxsize,
+            "workers": len(self._threads),
+            **counts,
+            "wait_avg_s": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95_s": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "wait_max_s": waits[-1] if waits else 0.0,
+        }
@@ -0,0 +1,38 @@
+"""Background pre-warm of the analytics/charting stack after startup.
+
+The entry points import numpy/pandas-backed modules lazily (inside the
+functions that need them), so Flask binds its port without paying for them
+and ``/price`` never does. ``start_warmup`` then imports them and starts the
+render pool from a daemon thread, so the first ``/chart`` is not slow either.
+
+WARMUP=0 disables it (everything then loads on first use).
+"""
+import os
+import time
+import threading
+import importlib
+
+WARMUP = os.getenv("WARMUP", "1") == "1"
+ANALYTICS = ("numpy", "pandas", "kline_parse", "indicators", "swings")
+
+
+def warmup(modules=ANALYTICS):
+    t0 = time.perf_counter()
+    for name in modules:
+        importlib.import_module(name)
+    from render_pool import render_pool, start_render_pool
+    if render_pool is None:
+        import charts  # inline rendering: matplotlib/mplfinance live in this process
+        charts.prewarm()
+    else:
+        start_render_pool()
+    print(f"warmup: ready in {time.perf_counter() - t0:.2f}s")
+
+
+def start_warmup(modules=ANALYTICS):
+    """Run ``warmup`` in a daemon thread (no-op when WARMUP=0)."""
+    if not WARMUP:
+        return None
+    t = threading.Thread(target=warmup, args=(modules,), name="warmup", daemon=True)
+    t.start()
+    return t